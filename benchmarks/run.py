@@ -0,0 +1,753 @@
+#!/usr/bin/env python
+"""
+Benchmarks of the hot paths of the hocr package and of every tool in
+setup.py.
+
+The benchmark documents are made by repeating the pages of the (character
+based) sim_english-illustrated-magazine test document until they have the
+requested amount of pages. A word based version is made with hocr-fold-chars,
+and both are benchmarked as plain and as gzip compressed files.
+
+Every benchmark runs in a separate process, so that the peak memory use
+(maximum resident set size) of every benchmark can be measured, which the
+benchmark processes report themselves (see tool_runner.py). For the
+library benchmarks, only the benchmarked code is timed, for the tools the
+time includes starting Python. The results are written as JSON, which can be
+compared to the results of another commit with --compare.
+
+Usage::
+
+    python benchmarks/run.py --output benchmark.json
+    python benchmarks/run.py --pages 1000 10000 --output benchmark.json
+    python benchmarks/run.py --compare before.json after.json
+"""
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from glob import glob
+
+from tool_runner import peak_rss
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+TEST_FILES_DIR = os.path.join(REPO_DIR, 'test-files')
+
+# Benchmark the hocr package of this checkout
+sys.path.insert(0, REPO_DIR)
+
+#: Format of the results, increased on incompatible changes
+RESULTS_VERSION = 1
+
+DEFAULT_FIXTURE = os.path.join(
+        TEST_FILES_DIR,
+        'sim_english-illustrated-magazine_1884-12_2_15_chocr.html.gz')
+ABBYY_FIXTURE = os.path.join(
+        TEST_FILES_DIR, 'sim_english-illustrated-magazine_1884-12_2_15_abbyy')
+PDF_FIXTURE = os.path.join(TEST_FILES_DIR,
+                           'test_arlington_heights_daily_herald-19760903.pdf')
+PDF_METADATA_FIXTURE = os.path.join(
+        TEST_FILES_DIR, 'test_arlington_heights_daily_herald-19760903_pdfmeta.json')
+
+#: Word that is highlighted for the search benchmarks
+SEARCH_PATTERN = 'the'
+
+#: Amount of pages of the document that hocr-batch runs hocr-text on, one
+#: job per page
+BATCH_PAGES = 100
+
+
+def is_lfs_pointer(path):
+    # Test files that were not fetched from git-lfs
+    with open(path, 'rb') as fp:
+        return fp.read(40).startswith(b'version https://git-lfs')
+
+
+def have_fixture(path):
+    return os.path.exists(path) and not is_lfs_pointer(path)
+
+
+def run_tool(tool, args, stdout=subprocess.DEVNULL):
+    """
+    Runs a tool of this checkout, returns the exit code, the time it took,
+    its peak memory use (bytes) and its standard error.
+    """
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+            [REPO_DIR] + [p for p in [env.get('PYTHONPATH')] if p])
+
+    with tempfile.TemporaryFile() as stderr, \
+            tempfile.NamedTemporaryFile('r') as rss_file:
+        # The tool is run by tool_runner, which reports its peak memory use
+        start = time.perf_counter()
+        p = subprocess.Popen([sys.executable,
+                              os.path.join(BENCHMARK_DIR, 'tool_runner.py'),
+                              rss_file.name,
+                              os.path.join(REPO_DIR, 'bin', tool)] + args,
+                             stdout=stdout, stderr=stderr, env=env)
+        returncode, peak_rss = wait_for(p)
+        elapsed = time.perf_counter() - start
+
+        reported = rss_file.read().strip()
+        if reported.isdigit():
+            peak_rss = int(reported)
+
+        stderr.seek(0)
+        return returncode, elapsed, peak_rss, \
+                stderr.read().decode('utf-8', 'replace')
+
+
+def wait_for(p):
+    # Returns the exit code and peak memory use of subprocess.Popen `p`. On
+    # Linux, the peak memory use is at least that of this process, see
+    # tool_runner.peak_rss, which the benchmark processes report instead.
+    _, status, rusage = os.wait4(p.pid, 0)
+    if os.WIFSIGNALED(status):
+        p.returncode = -os.WTERMSIG(status)
+    else:
+        p.returncode = os.WEXITSTATUS(status)
+
+    # Kilobytes on Linux, bytes on macOS
+    peak_rss = rusage.ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+
+    return p.returncode, peak_rss
+
+
+def check_tool(tool, args, stdout=subprocess.DEVNULL):
+    returncode, _, _, stderr = run_tool(tool, args, stdout)
+    if returncode:
+        raise RuntimeError('%s failed:\n%s' % (tool, stderr))
+
+
+def scale_document(fixture, outpath, pages):
+    """
+    Writes a document of `pages` pages to `outpath`, by repeating the pages
+    of `fixture`.
+    """
+    from hocr.text import hocr_get_xml_page_offsets
+    from hocr.util import open_if_required, get_header_footer
+
+    fp = open_if_required(fixture)
+    data = fp.read()
+    fp.seek(0)
+    top, bottom = get_header_footer(fp)
+    page_ranges = hocr_get_xml_page_offsets(fixture)
+
+    with open(outpath, 'wb') as out:
+        out.write(top)
+        for idx in range(pages):
+            start, end = page_ranges[idx % len(page_ranges)]
+            out.write(b' ' + data[start:end])
+        out.write(bottom)
+
+
+def count_words(path):
+    from hocr.parse import hocr_word_data_iterator
+
+    words = 0
+    for page in hocr_word_data_iterator(path):
+        for par in page:
+            for line in par['lines']:
+                words += len(line['words'])
+    return words
+
+
+def prepare_inputs(fixture, page_counts, data_dir):
+    """
+    Creates the benchmark documents (and their text, lookup tables, etc.) in
+    `data_dir`, unless they already exist there.
+
+    Returns a list of dicts describing the inputs.
+    """
+    inputs = []
+    for pages in page_counts:
+        for kind in ('chocr', 'hocr'):
+            name = '%s-%d' % (kind, pages)
+            base = os.path.join(data_dir, name)
+            meta_path = base + '.json'
+
+            if not os.path.exists(meta_path):
+                print('Preparing %s' % name, file=sys.stderr)
+                path = base + '.html'
+                if kind == 'chocr':
+                    scale_document(fixture, path, pages)
+                else:
+                    with open(path, 'wb') as out:
+                        check_tool('hocr-fold-chars',
+                                   ['-f', base.replace('hocr', 'chocr', 1) +
+                                    '.html'], out)
+
+                with open(path, 'rb') as src, \
+                        gzip.open(path + '.gz', 'wb') as dst:
+                    shutil.copyfileobj(src, dst)
+
+                with open(base + '.txt', 'wb') as out:
+                    check_tool('hocr-text', ['-f', path], out)
+                with open(base + '_lookup.json', 'wb') as out:
+                    check_tool('hocr-lookup-create', ['-f', path], out)
+                with open(base + '_hl.txt', 'wb') as out:
+                    check_tool('fts-text-annotate', ['-f', base + '.txt',
+                                                     '-p', SEARCH_PATTERN],
+                               out)
+
+                split_dir = base + '_pages'
+                os.makedirs(split_dir, exist_ok=True)
+                check_tool('hocr-split-pages',
+                           ['-f', path, '-o',
+                            os.path.join(split_dir, 'page-%06d.html'),
+                            '--raw'])
+
+                with open(meta_path, 'w') as fp:
+                    json.dump({'pages': pages, 'words': count_words(path)},
+                              fp)
+
+            with open(meta_path) as fp:
+                meta = json.load(fp)
+
+            for compressed in (False, True):
+                path = base + ('.html.gz' if compressed else '.html')
+                inputs.append({
+                    'name': os.path.basename(path),
+                    'path': path,
+                    'kind': kind,
+                    'gzip': compressed,
+                    'pages': meta['pages'],
+                    'words': meta['words'],
+                    'text': base + '.txt',
+                    'lookup': base + '_lookup.json',
+                    'annotated': base + '_hl.txt',
+                    'split_glob': os.path.join(base + '_pages',
+                                               'page-*.html'),
+                })
+
+    return inputs
+
+
+# Library benchmarks. Every benchmark gets the input, does its preparation
+# and returns the function that is timed.
+
+def bench_page_iterator(inp):
+    from hocr.parse import hocr_page_iterator
+
+    def run():
+        for page in hocr_page_iterator(inp['path']):
+            pass
+    return run
+
+
+def bench_page_to_word_data(inp):
+    from hocr.parse import hocr_page_iterator, hocr_page_to_word_data
+
+    def run():
+        for page in hocr_page_iterator(inp['path']):
+            hocr_page_to_word_data(page)
+    return run
+
+
+def bench_page_to_word_data_fast(inp):
+    from hocr.parse import hocr_page_iterator, hocr_page_to_word_data_fast
+
+    def run():
+        for page in hocr_page_iterator(inp['path']):
+            hocr_page_to_word_data_fast(page)
+    return run
+
+
+def bench_word_data_iterator(inp):
+    from hocr.parse import hocr_word_data_iterator
+
+    def run():
+        for word_data in hocr_word_data_iterator(inp['path']):
+            pass
+    return run
+
+
+def bench_page_text(inp):
+    from hocr.parse import hocr_page_iterator
+    from hocr.text import hocr_page_text
+
+    def run():
+        for page in hocr_page_iterator(inp['path']):
+            hocr_page_text(page)
+    return run
+
+
+def bench_page_text_iterator(inp):
+    from hocr.text import hocr_page_text_iterator
+
+    def run():
+        for text in hocr_page_text_iterator(inp['path']):
+            pass
+    return run
+
+
+def bench_get_page_lookup_table(inp):
+    from hocr.searching import hocr_get_page_lookup_table
+
+    def run():
+        hocr_get_page_lookup_table(inp['path'])
+    return run
+
+
+def bench_find_matches(inp):
+    from hocr.fts import find_matches
+    from hocr.searching import hocr_load_lookup_table
+    from hocr.util import open_if_required
+
+    lookup_table = hocr_load_lookup_table(inp['lookup'])
+    with open(inp['annotated'], 'rb') as fp:
+        text = fp.read().decode('utf-8')
+
+    def run():
+        for match in find_matches(lookup_table, open_if_required(inp['path']),
+                                  text):
+            pass
+    return run
+
+
+def bench_highlight(inp):
+    # Highlights every distinct word of the text, in a single pass
+    import re
+    from hocr.highlight import Highlighter
+
+    with open(inp['text'], 'rb') as fp:
+        patterns = sorted(set(re.findall(r'\w+', fp.read().decode('utf-8'))))
+    highlighter = Highlighter(patterns, whole_words=True)
+
+    def run():
+        with open(inp['text'], 'rb') as fp, open(os.devnull, 'w') as out:
+            highlighter.highlight_file(fp, out)
+    return run
+
+
+def _bench_instrumented_word_data(inp, unwrap):
+    # The overhead of hocr.stats when it is disabled: the same calls of the
+    # instrumented functions, or of the undecorated functions (`__wrapped__`)
+    from hocr import stats
+    from hocr.parse import hocr_page_iterator, hocr_page_to_word_data, \
+            hocr_page_to_word_data_fast
+
+    stats.reset()
+    pages = list(hocr_page_iterator(inp['path']))
+    funcs = [hocr_page_to_word_data, hocr_page_to_word_data_fast]
+    if unwrap:
+        funcs = [func.__wrapped__ for func in funcs]
+
+    def run():
+        for func in funcs:
+            for page in pages:
+                func(page)
+    return run
+
+
+def bench_instrumented_stats_disabled(inp):
+    return _bench_instrumented_word_data(inp, False)
+
+
+def bench_instrumented_unwrapped(inp):
+    return _bench_instrumented_word_data(inp, True)
+
+
+def _detached_pages(path):
+    # Copies of the pages, which stay valid after the next page is parsed
+    from xml.etree import ElementTree
+    from hocr.parse import hocr_page_iterator
+    from hocr.util import elem_tostring, register_and_nuke_xhtml_namespace
+
+    register_and_nuke_xhtml_namespace()
+    return [ElementTree.fromstring(elem_tostring(page))
+            for page in hocr_page_iterator(path)]
+
+
+def bench_serialize_triple_copy(inp):
+    # How pages were serialised before hocr.writer
+    from hocr.util import elem_tostring
+
+    pages = _detached_pages(inp['path'])
+
+    def run():
+        for page in pages:
+            s = elem_tostring(page).decode('utf-8')
+            s = s.replace(' xmlns="http://www.w3.org/1999/xhtml"', '')
+            s.encode('utf-8')
+    return run
+
+
+def bench_page_to_bytes(inp):
+    from hocr.writer import hocr_page_to_bytes
+
+    pages = _detached_pages(inp['path'])
+
+    def run():
+        for page in pages:
+            hocr_page_to_bytes(page)
+    return run
+
+
+def bench_fold_chars(inp):
+    from hocr.transform import fold_chars
+
+    def run():
+        with open(os.devnull, 'wb') as out:
+            fold_chars(inp['path'], out)
+    return run
+
+
+LIBRARY_BENCHMARKS = OrderedDict([
+    ('hocr_page_iterator', bench_page_iterator),
+    ('hocr_page_to_word_data', bench_page_to_word_data),
+    ('hocr_page_to_word_data_fast', bench_page_to_word_data_fast),
+    ('hocr_word_data_iterator', bench_word_data_iterator),
+    ('hocr_page_text', bench_page_text),
+    ('hocr_page_text_iterator', bench_page_text_iterator),
+    ('hocr_get_page_lookup_table', bench_get_page_lookup_table),
+    ('fts.find_matches', bench_find_matches),
+    ('highlight', bench_highlight),
+    ('serialize_triple_copy', bench_serialize_triple_copy),
+    ('hocr_page_to_bytes', bench_page_to_bytes),
+    ('fold_chars', bench_fold_chars),
+    ('instrumented_stats_disabled', bench_instrumented_stats_disabled),
+    ('instrumented_unwrapped', bench_instrumented_unwrapped),
+])
+
+
+def run_library_benchmark(name, inp):
+    # Runs in the benchmark process, see --run-library-benchmark
+    run = LIBRARY_BENCHMARKS[name](inp)
+    start = time.perf_counter()
+    run()
+    return time.perf_counter() - start
+
+
+# Tool benchmarks. Every benchmark gets the input and a temporary directory,
+# and returns the arguments of the tool, or a str with the reason the tool is
+# not benchmarked with this input. The tools in FIXTURE_TOOL_BENCHMARKS do not
+# read hOCR, and are benchmarked once, with their own test file.
+
+def _plain_only(args):
+    def get_args(inp, tmpdir):
+        if inp['gzip']:
+            return 'only benchmarked with plain inputs'
+        return args(inp, tmpdir)
+    return get_args
+
+
+def _batch_args(inp, tmpdir):
+    manifest = os.path.join(tmpdir, 'jobs.jsonl')
+    pages = sorted(glob(inp['split_glob']))[:BATCH_PAGES]
+    with open(manifest, 'w') as fp:
+        for idx, path in enumerate(pages):
+            json.dump({'tool': 'hocr-text', 'args': ['-f', path],
+                       'stdout': os.path.join(tmpdir, '%d.txt' % idx)}, fp)
+            fp.write('\n')
+    return ['-f', manifest]
+
+
+def _abbyy_args(tmpdir):
+    if not have_fixture(ABBYY_FIXTURE):
+        return 'test file %s is not available' % ABBYY_FIXTURE
+    return ['-f', ABBYY_FIXTURE]
+
+
+def _pdf_args(tmpdir):
+    if not have_fixture(PDF_FIXTURE) or \
+            not have_fixture(PDF_METADATA_FIXTURE):
+        return 'test file %s is not available' % PDF_FIXTURE
+    return ['-f', PDF_FIXTURE, '-J', PDF_METADATA_FIXTURE]
+
+
+def _requires_item(tmpdir):
+    return 'requires a complete item (images and metadata)'
+
+
+TOOL_BENCHMARKS = OrderedDict([
+    ('hocr-combine-stream', _plain_only(
+        lambda inp, tmpdir: ['-g', inp['split_glob']])),
+    ('hocr-fold-chars', lambda inp, tmpdir:
+        ['-f', inp['path']] if inp['kind'] == 'chocr'
+        else 'only benchmarked with character based inputs'),
+    ('hocr-text', lambda inp, tmpdir: ['-f', inp['path']]),
+    ('fts-text-annotate', _plain_only(
+        lambda inp, tmpdir: ['-f', inp['text'], '-p', SEARCH_PATTERN])),
+    ('fts-text-match', lambda inp, tmpdir:
+        ['--hocr', inp['path'], '--annotated-text', inp['annotated'],
+         '--table', inp['lookup']]),
+    ('hocr-lookup-check', lambda inp, tmpdir:
+        ['--hocr', inp['path'], '--text', inp['text'],
+         '--table', inp['lookup']]),
+    ('hocr-lookup-create', lambda inp, tmpdir: ['-f', inp['path']]),
+    ('hocr-lookup-reconstruct', lambda inp, tmpdir:
+        ['-f', inp['path'], '-t', inp['lookup']]),
+    ('hocr-lookup-convert', _plain_only(
+        lambda inp, tmpdir: ['-f', inp['lookup'],
+                             '-o', os.path.join(tmpdir, 'lookup.bin')])),
+    ('hocr-text-paragraphs', lambda inp, tmpdir: ['-f', inp['path']]),
+    ('hocr-extract-page', lambda inp, tmpdir:
+        ['-f', inp['path'], '-t', inp['lookup'],
+         '--pages', '0-%d' % (max(inp['pages'] // 10, 1) - 1)]),
+    ('hocr-split-pages', lambda inp, tmpdir:
+        ['-f', inp['path'], '-o', os.path.join(tmpdir, 'page-%06d.html')]),
+    ('hocr-flatten-pages', lambda inp, tmpdir: ['-f', inp['path']]),
+    # hocr-confidence-filter cannot read the header of gzip files
+    ('hocr-confidence-filter', _plain_only(
+        lambda inp, tmpdir: ['-g', inp['path']])),
+    ('hocr-pagenumbers', lambda inp, tmpdir:
+        ['-f', inp['path'], '-o', os.path.join(tmpdir, 'pagenumbers.json')]),
+    ('hocr-batch', _plain_only(_batch_args)),
+])
+
+FIXTURE_TOOL_BENCHMARKS = OrderedDict([
+    ('abbyy-to-hocr', _abbyy_args),
+    ('pdf-to-hocr', _pdf_args),
+    ('hocr-to-epub', _requires_item),
+    ('hocr-to-daisy', _requires_item),
+    ('hocr-synth', lambda tmpdir: ['-n', '1000',
+                                   '-o', os.path.join(tmpdir, 'synth.html')]),
+])
+
+
+def get_tools():
+    with open(os.path.join(REPO_DIR, 'setup.py')) as fp:
+        return re.findall(r"'bin/([\w-]+)'", fp.read())
+
+
+def result_for(name, kind, inp):
+    result = OrderedDict([('benchmark', name), ('kind', kind)])
+    if inp is not None:
+        result['input'] = inp['name']
+        result['pages'] = inp['pages']
+        result['words'] = inp['words']
+    else:
+        result['input'] = 'test file'
+    return result
+
+
+def add_timing(result, elapsed, peak_rss):
+    result['status'] = 'ok'
+    result['time'] = elapsed
+    if 'pages' in result:
+        result['pages_per_second'] = result['pages'] / elapsed
+        result['words_per_second'] = result['words'] / elapsed
+    result['peak_rss'] = peak_rss
+
+
+def benchmark_library(name, inp, repeat):
+    result = result_for(name, 'library', inp)
+
+    times = []
+    peak_rss = 0
+    for _ in range(repeat):
+        p = subprocess.Popen([sys.executable, os.path.abspath(__file__),
+                              '--run-library-benchmark', name,
+                              '--input-json', json.dumps(inp)],
+                             stdout=subprocess.PIPE)
+        output = p.stdout.read()
+        returncode, rss = wait_for(p)
+        if returncode:
+            result['status'] = 'error'
+            return result
+
+        output = json.loads(output.decode('utf-8'))
+        times.append(output['time'])
+        if output['peak_rss'] is not None:
+            rss = output['peak_rss']
+        peak_rss = max(peak_rss, rss)
+
+    add_timing(result, min(times), peak_rss)
+    return result
+
+
+def benchmark_tool(tool, inp, repeat):
+    result = result_for(tool, 'tool', inp)
+
+    if inp is None:
+        get_args = FIXTURE_TOOL_BENCHMARKS.get(tool)
+    else:
+        get_args = TOOL_BENCHMARKS.get(tool)
+    if get_args is None:
+        result['status'] = 'skipped'
+        result['reason'] = 'no benchmark for this tool'
+        return result
+
+    times = []
+    peak_rss = 0
+    for _ in range(repeat):
+        tmpdir = tempfile.mkdtemp(prefix='hocr-benchmark-')
+        try:
+            if inp is None:
+                args = get_args(tmpdir)
+            else:
+                args = get_args(inp, tmpdir)
+            if isinstance(args, str):
+                result['status'] = 'skipped'
+                result['reason'] = args
+                return result
+
+            with open(os.path.join(tmpdir, 'stdout'), 'wb') as out:
+                returncode, elapsed, rss, stderr = run_tool(tool, args, out)
+        finally:
+            shutil.rmtree(tmpdir)
+
+        if returncode:
+            missing = re.search(r"ModuleNotFoundError: No module named '([^']+)'",
+                                stderr)
+            if missing:
+                result['status'] = 'skipped'
+                result['reason'] = 'missing dependency %s' % missing.group(1)
+            else:
+                result['status'] = 'error'
+                result['reason'] = stderr.strip().splitlines()[-1:]
+            return result
+
+        times.append(elapsed)
+        peak_rss = max(peak_rss, rss)
+
+    add_timing(result, min(times), peak_rss)
+    return result
+
+
+def get_environment():
+    from hocr.version import __version__
+
+    try:
+        commit = subprocess.check_output(
+                ['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR,
+                stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return OrderedDict([
+        ('version', RESULTS_VERSION),
+        ('commit', commit),
+        ('hocr_version', __version__),
+        ('python', platform.python_version()),
+        ('platform', platform.platform()),
+        ('cpu_count', os.cpu_count()),
+        ('date', datetime.now(timezone.utc).isoformat()),
+    ])
+
+
+def run_benchmarks(fixture, page_counts, data_dir, selected, repeat):
+    inputs = prepare_inputs(fixture, page_counts, data_dir)
+
+    results = []
+
+    def report(result):
+        results.append(result)
+        if result['status'] == 'ok':
+            print('%-30s %-22s %8.3fs %8.1f MiB' % (
+                      result['benchmark'], result['input'], result['time'],
+                      result['peak_rss'] / 1024 ** 2), file=sys.stderr)
+        else:
+            print('%-30s %-22s %s (%s)' % (
+                      result['benchmark'], result['input'], result['status'],
+                      result.get('reason')), file=sys.stderr)
+
+    for name in LIBRARY_BENCHMARKS:
+        if selected and not re.search(selected, name):
+            continue
+        for inp in inputs:
+            report(benchmark_library(name, inp, repeat))
+
+    for tool in get_tools():
+        if selected and not re.search(selected, tool):
+            continue
+        if tool in FIXTURE_TOOL_BENCHMARKS:
+            report(benchmark_tool(tool, None, repeat))
+            continue
+        for inp in inputs:
+            report(benchmark_tool(tool, inp, repeat))
+
+    output = get_environment()
+    output['results'] = results
+    return output
+
+
+def compare(before_path, after_path):
+    """
+    Prints the time and peak memory use of every benchmark in `after_path`
+    relative to `before_path`.
+    """
+    with open(before_path) as fp:
+        before = json.load(fp)
+    with open(after_path) as fp:
+        after = json.load(fp)
+
+    before_results = {(r['benchmark'], r['input']): r
+                      for r in before['results'] if r['status'] == 'ok'}
+
+    print('%-30s %-22s %9s %9s %7s %7s' % ('benchmark', 'input', 'before',
+                                           'after', 'time', 'memory'))
+    for r in after['results']:
+        old = before_results.get((r['benchmark'], r['input']))
+        if r['status'] != 'ok' or old is None:
+            continue
+        print('%-30s %-22s %8.3fs %8.3fs %6.2fx %6.2fx' % (
+                  r['benchmark'], r['input'], old['time'], r['time'],
+                  r['time'] / old['time'], r['peak_rss'] / old['peak_rss']))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark archive-hocr-tools')
+    parser.add_argument('--pages', help='Amount of pages of the benchmark '
+                        'documents. Default is 1000', type=int, nargs='+',
+                        default=[1000])
+    parser.add_argument('-o', '--output', help='File to write the results '
+                        'to (JSON), default is standard out', type=str,
+                        default=None)
+    parser.add_argument('--fixture', help='Character based hOCR document '
+                        'that the benchmark documents are made from',
+                        type=str, default=DEFAULT_FIXTURE)
+    parser.add_argument('--data-dir', help='Directory to keep the benchmark '
+                        'documents in', type=str,
+                        default=os.path.join(BENCHMARK_DIR, 'data'))
+    parser.add_argument('-b', '--benchmarks', help='Only run the benchmarks '
+                        'that match this regular expression', type=str,
+                        default=None)
+    parser.add_argument('--repeat', help='Run every benchmark this many '
+                        'times, and report the fastest run', type=int,
+                        default=1)
+    parser.add_argument('--compare', help='Compare the results in two files',
+                        type=str, nargs=2, default=None,
+                        metavar=('BEFORE', 'AFTER'))
+    parser.add_argument('--run-library-benchmark', help=argparse.SUPPRESS,
+                        type=str, default=None)
+    parser.add_argument('--input-json', help=argparse.SUPPRESS, type=str,
+                        default=None)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    if args.run_library_benchmark:
+        elapsed = run_library_benchmark(args.run_library_benchmark,
+                                        json.loads(args.input_json))
+        json.dump({'time': elapsed, 'peak_rss': peak_rss()}, sys.stdout)
+        sys.exit(0)
+
+    if not have_fixture(args.fixture):
+        parser.error('%s is not available (fetch it with git lfs pull)' %
+                     args.fixture)
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    output = run_benchmarks(args.fixture, args.pages, args.data_dir,
+                            args.benchmarks, args.repeat)
+
+    if args.output:
+        with open(args.output, 'w') as fp:
+            json.dump(output, fp, indent=2)
+    else:
+        json.dump(output, sys.stdout, indent=2)
@@ -0,0 +1,61 @@
+"""
+Runs a tool like `python TOOL ARGS...` would, and writes its peak memory use
+(see peak_rss) to OUTPUT when it exits. Used by run.py:
+
+    python tool_runner.py OUTPUT TOOL ARGS...
+
+Only the modules needed for that are imported, so that the peak memory use is
+that of the tool.
+"""
+
+import atexit
+import os
+import sys
+
+
+def peak_rss():
+    """
+    Returns the peak memory use (bytes) of this process, and of the child
+    processes it waited for, or None if it is not known.
+
+    ru_maxrss of a process that was just started is the memory use of the
+    process that started it, since Linux keeps the peak of a process over
+    exec. VmHWM is the peak of the program itself.
+    """
+    try:
+        with open('/proc/self/status') as fp:
+            for line in fp:
+                if line.startswith('VmHWM:'):
+                    # Kilobytes
+                    peak = int(line.split()[1]) * 1024
+                    break
+            else:
+                return None
+    except OSError:
+        return None
+
+    import resource
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * 1024
+    return max(peak, children)
+
+
+def run_tool(path):
+    with open(path, 'rb') as fp:
+        code = compile(fp.read(), path, 'exec')
+    exec(code, {'__name__': '__main__', '__file__': path,
+                '__builtins__': __builtins__})
+
+
+if __name__ == '__main__':
+    output = sys.argv[1]
+    path = sys.argv[2]
+
+    def write_peak_rss():
+        with open(output, 'w') as fp:
+            fp.write('%s\n' % peak_rss())
+
+    atexit.register(write_peak_rss)
+
+    sys.argv = sys.argv[2:]
+    sys.path[0] = os.path.dirname(os.path.abspath(path))
+    run_tool(path)
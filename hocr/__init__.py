@@ -1,2 +1,24 @@
-from . import parse, text, util, searching, fts, extutil
+import sys
+
 from .version import __version__
+
+# The submodules are imported when they are first used, so that tools that
+# only need a few of them start quickly
+_SUBMODULES = ('parse', 'text', 'util', 'searching', 'fts', 'extutil', 'view',
+               'document', 'gzindex', 'spatial', 'transform', 'writer',
+               'batch', 'synth', 'stats', 'highlight', 'combine')
+
+if sys.version_info >= (3, 7):
+    def __getattr__(name):
+        if name in _SUBMODULES:
+            import importlib
+            return importlib.import_module('.' + name, __name__)
+        raise AttributeError('module %r has no attribute %r' % (__name__,
+                                                                name))
+
+    def __dir__():
+        return sorted(list(globals()) + list(_SUBMODULES))
+else:
+    from . import parse, text, util, searching, fts, extutil, view, \
+            document, gzindex, spatial, transform, writer, batch, \
+            synth, stats, highlight, combine
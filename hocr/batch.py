@@ -0,0 +1,162 @@
+"""
+Running many invocations of the hOCR tools in a single (long running) Python
+process, see hocr-batch.
+
+The tools are run in-process, with the command line arguments of the job in
+`sys.argv` and standard out redirected to the output file of the job. Python
+and the hocr modules only have to be started and imported once per worker
+process, instead of once per job, which dominates the run time for small
+documents.
+
+A job is a dict, as read from a line of a JSON lines manifest:
+
+* tool: name of the tool to run, e.g. `hocr-text`
+* args: list of command line arguments for the tool
+* (optional) stdout: path of the file the standard out of the tool is written
+  to, by default it is discarded
+* (optional) id: identifier of the job, included in the report of the job
+"""
+
+import io
+import os
+import sys
+import time
+import traceback
+
+from . import stats
+from .util import process_map
+
+
+#: Tools that cannot be run as a batch job
+BATCH_EXCLUDED_TOOLS = {'hocr-batch'}
+
+# Compiled tools, per worker process
+_tool_code = {}
+
+
+def find_tool(tool, script_dir=None):
+    """
+    Find the script of a tool.
+
+    Args:
+
+    * tool: name of the tool, e.g. `hocr-text`
+    * script_dir: directory to look for the script in, by default the
+      directory of the running script (like hocr-batch).
+
+    Returns:
+
+    * Path to the script (`str`)
+    """
+    if os.path.basename(tool) != tool or tool in BATCH_EXCLUDED_TOOLS:
+        raise ValueError('Invalid tool: %r' % tool)
+
+    if script_dir is None:
+        script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+
+    path = os.path.join(script_dir, tool)
+    if not os.path.isfile(path):
+        raise ValueError('Unknown tool: %r' % tool)
+
+    return path
+
+
+def _compile_tool(path):
+    try:
+        return _tool_code[path]
+    except KeyError:
+        with open(path, 'rb') as fp:
+            code = compile(fp.read(), path, 'exec')
+        _tool_code[path] = code
+        return code
+
+
+def _run_tool(path, args, out):
+    code = _compile_tool(path)
+
+    old_argv = sys.argv
+    old_stdout = sys.stdout
+
+    # Text written by the tool goes straight to `out`, so that it ends up in
+    # the right order with data written to sys.stdout.buffer
+    stdout = io.TextIOWrapper(out, encoding='utf-8', write_through=True)
+    sys.argv = [path] + list(args)
+    sys.stdout = stdout
+    try:
+        with stats.tool_run():
+            exec(code, {'__name__': '__main__', '__file__': path,
+                        '__builtins__': __builtins__})
+    except SystemExit as e:
+        if e.code:
+            return e.code if isinstance(e.code, int) else 1
+    finally:
+        sys.argv = old_argv
+        sys.stdout = old_stdout
+        stdout.flush()
+        stdout.detach()
+
+    return 0
+
+
+def run_job(job, script_dir=None):
+    """
+    Run a single job.
+
+    Args:
+
+    * job: the job (`dict`), see above
+    * script_dir: see find_tool
+
+    Returns:
+
+    * Report of the job (`dict`), with the `id` of the job (if any), the
+      `tool`, the `status` (`ok` or `error`), the `exit_code`, the `time` the
+      job took (in seconds) and, if an exception occurred, the `error`.
+    """
+    start = time.perf_counter()
+    report = {'tool': job.get('tool')}
+    if 'id' in job:
+        report['id'] = job['id']
+
+    try:
+        path = find_tool(job['tool'], script_dir)
+        with open(job.get('stdout') or os.devnull, 'wb') as out:
+            report['exit_code'] = _run_tool(path, job.get('args', []), out)
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        report['exit_code'] = 1
+        report['error'] = '%s: %s' % (type(e).__name__, e)
+
+    report['status'] = 'ok' if report['exit_code'] == 0 else 'error'
+    report['time'] = time.perf_counter() - start
+    return report
+
+
+def run_jobs(jobs, workers=1, script_dir=None):
+    """
+    Run jobs, either in this process, or spread over worker processes. Worker
+    processes are reused for many jobs.
+
+    Args:
+
+    * jobs: iterable of jobs
+    * workers: amount of worker processes, if 1, the jobs are run in this
+      process.
+    * script_dir: see find_tool
+
+    Returns:
+
+    * Iterator over the reports of the jobs (see run_job), in the order of
+      `jobs`.
+    """
+    if script_dir is None:
+        script_dir = os.path.dirname(os.path.abspath(sys.argv[0]))
+
+    if workers <= 1:
+        for job in jobs:
+            yield run_job(job, script_dir)
+        return
+
+    for report in process_map(run_job, ((job, script_dir) for job in jobs),
+                              workers):
+        yield report
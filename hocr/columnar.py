@@ -0,0 +1,188 @@
+"""
+Columnar (NumPy based) representation of the words on a hOCR page.
+
+hocr_page_to_word_data returns a Python dict per word, line and paragraph,
+which is convenient but takes hundreds of bytes per word and makes aggregating
+over all the words on a page slow. PageWords stores the same information as a
+handful of contiguous arrays instead, so that consumers can vectorise their
+work.
+
+This module requires NumPy, which is not a hard dependency of
+archive-hocr-tools, and it is therefore not imported by the hocr package.
+"""
+
+import numpy as np
+
+from .parse import hocr_page_get_paragraphs, hocr_word_attributes, wdmap, \
+        WRITING_DIRECTION_UNSPECIFIED
+
+
+#: Value stored in PageWords.confidence for words without x_wconf
+CONFIDENCE_UNKNOWN = -1
+
+
+class PageWords(object):
+    """
+    All the words of a single hOCR page, stored column-wise.
+
+    Attributes (all NumPy arrays with one entry per word, unless noted):
+
+    * `bbox`: bounding boxes, float64 array of shape (n, 4)
+    * `confidence`: word confidence (0 - 100) as int32, or CONFIDENCE_UNKNOWN
+    * `fontsize`: fontsize as float64, or 0.
+    * `writing_direction`: See WRITING_DIRECTION_* constants in hocr.parse,
+      int8
+    * `paragraph`: index of the paragraph the word is part of, int32
+    * `line`: index of the line (counting over the entire page) the word is
+      part of, int32
+    * `text_data`: text of all the words, UTF-8 encoded (bytes)
+    * `text_offsets`: int64 array of n + 1 offsets into `text_data`, the text of
+      word i is `text_data[text_offsets[i]:text_offsets[i+1]]`
+    * `paragraph_count`, `line_count`: amount of paragraphs and lines (int)
+
+    The words are stored in the same order as hocr_page_to_word_data returns
+    them.
+    """
+    def __init__(self, bbox, confidence, fontsize, writing_direction,
+                 paragraph, line, text_data, text_offsets,
+                 paragraph_count, line_count):
+        self.bbox = bbox
+        self.confidence = confidence
+        self.fontsize = fontsize
+        self.writing_direction = writing_direction
+        self.paragraph = paragraph
+        self.line = line
+        self.text_data = text_data
+        self.text_offsets = text_offsets
+        self.paragraph_count = paragraph_count
+        self.line_count = line_count
+
+    def __len__(self):
+        return len(self.text_offsets) - 1
+
+    def text(self, idx):
+        """
+        Returns the text (`str`) of word `idx`.
+        """
+        start, end = self.text_offsets[idx], self.text_offsets[idx + 1]
+        return self.text_data[start:end].decode('utf-8')
+
+    def word(self, idx):
+        """
+        Returns word `idx` as a dict, in the same format as the words returned
+        by hocr_page_to_word_data.
+        """
+        conf = int(self.confidence[idx])
+        if conf == CONFIDENCE_UNKNOWN:
+            conf = None
+
+        return {'bbox': self.bbox[idx].tolist(), 'text': self.text(idx),
+                'fontsize': float(self.fontsize[idx]),
+                'writing_direction': int(self.writing_direction[idx]),
+                'confidence': conf}
+
+    def content_box(self):
+        """
+        Returns the box (x1, y1, x2, y2) that encompasses all the words on the
+        page, or None if there are no words on the page.
+        """
+        if not len(self):
+            return None
+
+        return (float(self.bbox[:, 0].min()), float(self.bbox[:, 1].min()),
+                float(self.bbox[:, 2].max()), float(self.bbox[:, 3].max()))
+
+    @classmethod
+    def from_lists(cls, bbox, confidence, fontsize, writing_direction,
+                   paragraph, line, texts, paragraph_count, line_count):
+        text_data = [t.encode('utf-8') for t in texts]
+        text_offsets = np.zeros(len(text_data) + 1, dtype=np.int64)
+        np.cumsum([len(t) for t in text_data], out=text_offsets[1:])
+
+        return cls(np.array(bbox, dtype=np.float64).reshape(-1, 4),
+                   np.array(confidence, dtype=np.int32),
+                   np.array(fontsize, dtype=np.float64),
+                   np.array(writing_direction, dtype=np.int8),
+                   np.array(paragraph, dtype=np.int32),
+                   np.array(line, dtype=np.int32),
+                   b''.join(text_data), text_offsets,
+                   paragraph_count, line_count)
+
+    @classmethod
+    def from_word_data(cls, word_data):
+        """
+        Create a PageWords from word data as returned by
+        hocr_page_to_word_data or hocr_page_to_word_data_fast. Attributes that
+        are not present in the word data are set to their defaults.
+        """
+        bbox, confidence, fontsize, writing_direction = [], [], [], []
+        paragraph, line, texts = [], [], []
+        line_count = 0
+
+        for par_idx, par in enumerate(word_data):
+            for line_data in par['lines']:
+                for word in line_data['words']:
+                    bbox.append(word['bbox'])
+                    conf = word['confidence']
+                    confidence.append(CONFIDENCE_UNKNOWN if conf is None else conf)
+                    fontsize.append(word.get('fontsize', 0.))
+                    writing_direction.append(word.get('writing_direction',
+                                             WRITING_DIRECTION_UNSPECIFIED))
+                    paragraph.append(par_idx)
+                    line.append(line_count)
+                    texts.append(word['text'])
+
+                line_count += 1
+
+        return cls.from_lists(bbox, confidence, fontsize, writing_direction,
+                              paragraph, line, texts, len(word_data),
+                              line_count)
+
+
+def hocr_page_to_page_words(hocr_page, scaler=1):
+    """
+    Parses a single hocr_page into a PageWords object. The result contains the
+    same words and attributes as hocr_page_to_word_data would return, but
+    without creating dicts for every word, line and paragraph.
+
+    Args:
+
+    * hocr_page: a single hocr_page as returned by hocr_page_iterator
+    * (optional) scaler: a scalar to scale font sizes by
+
+    Returns:
+
+    * PageWords
+    """
+    bbox, confidence, fontsize, writing_direction = [], [], [], []
+    paragraph, line, texts = [], [], []
+    line_count = 0
+
+    pars = hocr_page_get_paragraphs(hocr_page)
+
+    for par_idx, par in enumerate(pars):
+        paragraph_writing_direction = WRITING_DIRECTION_UNSPECIFIED
+        if 'dir' in par.attrib:
+            paragraph_writing_direction = wdmap[par.attrib['dir']]
+
+        # We assume that the direct children are all the lines
+        for line_elem in list(par):
+            for word in line_elem.findall('.//*[@class="ocrx_word"]'):
+                rawtext, box, conf, x_fsize, word_writing_direction = \
+                        hocr_word_attributes(word,
+                                             paragraph_writing_direction,
+                                             scaler)
+
+                bbox.append(box)
+                confidence.append(CONFIDENCE_UNKNOWN if conf is None
+                                  else conf)
+                fontsize.append(x_fsize)
+                writing_direction.append(word_writing_direction)
+                paragraph.append(par_idx)
+                line.append(line_count)
+                texts.append(rawtext)
+
+            line_count += 1
+
+    return PageWords.from_lists(bbox, confidence, fontsize, writing_direction,
+                                paragraph, line, texts, len(pars), line_count)
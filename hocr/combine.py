@@ -0,0 +1,124 @@
+"""
+Combining hOCR files into a single document, as done by
+hocr-combine-stream.
+
+The pages of the files are renumbered (the page, block, paragraph, line and
+word ids) so that the ids are unique in the combined document. With more than
+one job, the files are parsed and renumbered by worker processes. The page
+number of the first page of a file depends on the amount of pages in the
+files before it, so the workers number the pages with PAGE_NO_PLACEHOLDER,
+which is replaced by the page number in the main process.
+"""
+
+from .parse import hocr_page_iterator
+from .util import process_map, register_and_nuke_xhtml_namespace
+from .writer import hocr_page_to_bytes
+
+
+#: Page number used by the worker processes of hocr_combine_pages, which is
+#: replaced by the actual page number. XML can not contain NUL characters,
+#: so it can not occur anywhere else in a page.
+PAGE_NO_PLACEHOLDER = '\0'
+
+
+def hocr_page_renumber(page, page_no):
+    """
+    Renumber the ids of a page and of the blocks, paragraphs, lines and words
+    on it, and turn the page into a `div`.
+
+    Args:
+
+    * page: a single hOCR page as returned by hocr_page_iterator
+    * page_no: number of the page (`int`), or PAGE_NO_PLACEHOLDER
+    """
+    page.tag = 'div'
+
+    if page_no != PAGE_NO_PLACEHOLDER:
+        page_no = '%.06d' % page_no
+
+    page.attrib['id'] = 'page_%s' % page_no
+    block_no = 0
+    par_no = 0
+    line_no = 0
+    word_no = 0
+
+    blocks = page.findall("*[@class='ocr_carea']")
+    for block in blocks:
+        block.attrib['id'] = 'block_%s_%.06d' % (page_no, block_no)
+
+        paragraphs = block.findall("*[@class='ocr_par']")
+        for par in paragraphs:
+            par.attrib['id'] = 'par_%s_%.06d' % (page_no, par_no)
+
+            for line in list(par):
+                line.attrib['id'] = 'line_%s_%.06d' % (page_no, line_no)
+
+                words = line.findall("*[@class='ocrx_word']")
+                for word in words:
+                    word.attrib['id'] = 'word_%s_%.06d' % \
+                            (page_no, word_no)
+
+                    word_no += 1
+
+                line_no += 1
+
+            par_no += 1
+
+        block_no += 1
+
+
+def _page_to_bytes(page):
+    page.tail = None
+    # Start on a new line
+    return hocr_page_to_bytes(page) + b'\n'
+
+
+def _renumber_file(filename, page_no):
+    # Renumbers the pages of `filename`, the first page being page `page_no`,
+    # and returns them serialised (list of bytes). If `page_no` is
+    # PAGE_NO_PLACEHOLDER, every page is numbered with the placeholder.
+    register_and_nuke_xhtml_namespace()
+
+    pages = []
+    for page in hocr_page_iterator(filename):
+        hocr_page_renumber(page, page_no)
+        pages.append(_page_to_bytes(page))
+        if page_no != PAGE_NO_PLACEHOLDER:
+            page_no += 1
+
+    return pages
+
+
+def hocr_combine_pages(files, jobs=1):
+    """
+    Renumbers the pages of one or more hOCR files, so that they can be
+    written as a single document.
+
+    Args:
+
+    * files: list of paths to hOCR files
+    * (optional) jobs: amount of worker processes to parse and renumber the
+      files in
+
+    Returns:
+
+    * Iterator over the renumbered pages, serialised (`bytes`, without the
+      XHTML namespace declaration, followed by a newline), in the order of
+      the files. The output does not depend on `jobs`.
+    """
+    if jobs <= 1:
+        page_no = 0
+        for filename in files:
+            for page in _renumber_file(filename, page_no):
+                yield page
+                page_no += 1
+        return
+
+    placeholder = PAGE_NO_PLACEHOLDER.encode('utf-8')
+    page_no = 0
+
+    tasks = ((filename, PAGE_NO_PLACEHOLDER) for filename in files)
+    for pages in process_map(_renumber_file, tasks, jobs):
+        for page in pages:
+            yield page.replace(placeholder, b'%.06d' % page_no)
+            page_no += 1
@@ -5,8 +5,7 @@ from datetime import datetime
 from typing import Dict, List, Optional, Tuple, Union
 from xml.dom import minidom
 
-import pkg_resources
-
+from ..util import read_package_data
 from .util import roman_to_num
 
 # This becomes the dtb:generator meta in the generated book
@@ -74,10 +73,11 @@ class DaisyBook:
             'html.css',
             'resource.res',
         ]:
-            content_src = pkg_resources.resource_filename(
-                'hocr', f'daisy/daisy_files/{content}'
-            )
-            content_str = open(content_src).read()
+            content_str = read_package_data(
+                f'daisy/daisy_files/{content}'
+            ).decode('utf-8')
+            # Universal newlines, as when reading the files in text mode
+            content_str = content_str.replace('\r\n', '\n').replace('\r', '\n')
             self.add(self.content_dir + content, content_str)
 
         self.manifest_items = [
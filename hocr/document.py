@@ -0,0 +1,270 @@
+"""
+Random access to the pages of a hOCR document that has a lookup table.
+
+hocr_lookup_page_by_dat reads and parses a page every time it is called.
+HocrDocument keeps the file open (memory mapped where possible) and keeps the
+most recently used pages, and the data derived from them, in a size-bounded
+LRU cache, which pays off when the same pages are accessed repeatedly, like a
+search inside service does.
+"""
+
+from collections import OrderedDict, namedtuple
+from xml.etree import ElementTree
+
+from .util import open_if_required, mmap_if_possible
+from .searching import hocr_get_page_lookup_table, hocr_load_lookup_table, \
+        hocr_lookup_by_plaintext_offset, hocr_paragraph_bytes_to_word_data
+from .view import HocrPageView
+
+
+#: Default amount of pages kept in the cache of a HocrDocument
+DEFAULT_CACHE_SIZE = 64
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class HocrDocument(object):
+    """
+    Random access reader for a hOCR document.
+
+    Args:
+
+    * fd_or_path: hOCR file to operate on, or a path (str)
+    * (optional) lookup_table: lookup table as returned by
+      hocr_load_lookup_table, or a path to load it from. If not provided, it
+      is created with hocr_get_page_lookup_table.
+    * (optional) cache_size: maximum amount of pages (and separately parsed
+      paragraphs) kept in the cache
+
+    Page slices are taken from a memory map of the file (without copying)
+    when the file is a regular, uncompressed file, otherwise they are read
+    from the file. Parsed pages are cached together with their (lazily
+    parsed) word data and text; `hits` and `misses` count the cache lookups.
+
+    Word data is in the format of hocr_page_to_word_data_fast, the text is the
+    same as hocr_page_text returns.
+    """
+    def __init__(self, fd_or_path, lookup_table=None,
+                 cache_size=DEFAULT_CACHE_SIZE):
+        self.fp = open_if_required(fd_or_path)
+        # Files opened here are closed by close()
+        self._close_fp = self.fp is not fd_or_path
+
+        if lookup_table is None:
+            lookup_table = hocr_get_page_lookup_table(self.fp)
+        elif isinstance(lookup_table, str):
+            lookup_table = hocr_load_lookup_table(lookup_table)
+        self.lookup_table = lookup_table
+
+        self._mm = mmap_if_possible(self.fp)
+
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._leading_whitespace = None
+
+    def __len__(self):
+        return len(self.lookup_table)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """
+        Closes the memory map and drops the cache. The file is closed if the
+        document opened it (if it was given a path), otherwise it is left
+        open.
+
+        If memoryviews returned by page_bytes are still held, the memory map
+        is only unmapped once they are released (or garbage collected).
+        """
+        self._cache.clear()
+        try:
+            if self._mm is not None:
+                try:
+                    self._mm.close()
+                except BufferError:
+                    # Exported memoryviews are still held
+                    pass
+                self._mm = None
+        finally:
+            if self._close_fp:
+                self.fp.close()
+                self._close_fp = False
+
+    def _read(self, start, end):
+        if self._mm is not None:
+            return memoryview(self._mm)[start:end]
+
+        self.fp.seek(start)
+        return self.fp.read(end - start)
+
+    def page_bytes(self, idx):
+        """
+        Returns the XML of page `idx`, as a memoryview of the memory mapped
+        file if possible, else as `bytes`. The memoryview should be released
+        when it is no longer used, it keeps the memory map alive after close.
+        """
+        xstart, xend = self.lookup_table[idx][2:4]
+        return self._read(xstart, xend)
+
+    def page_view(self, idx):
+        """
+        Returns a HocrPageView (with `fast` set) on page `idx`, cached.
+        """
+        if idx < 0:
+            idx += len(self)
+
+        view = self._cache.get(idx)
+        if view is not None:
+            self.hits += 1
+            self._cache.move_to_end(idx)
+            return view
+
+        self.misses += 1
+
+        data = self.page_bytes(idx)
+        parser = ElementTree.XMLParser()
+        try:
+            parser.feed(data)
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+        view = HocrPageView(parser.close(), fast=True)
+
+        self._store(idx, view)
+        return view
+
+    def _store(self, key, value):
+        self._cache[key] = value
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def paragraph_word_data(self, page_idx, par_idx):
+        """
+        Returns the word data of paragraph `par_idx` of page `page_idx`, as
+        it would appear in word_data(page_idx). If the lookup table has
+        paragraph granularity (see hocr_get_page_lookup_table), and the page
+        is not cached, only the paragraph is parsed. Paragraphs are cached
+        like pages.
+        """
+        if page_idx < 0:
+            page_idx += len(self)
+
+        dat = self.lookup_table[page_idx]
+        if len(dat) < 5 or page_idx in self._cache:
+            return self.page_view(page_idx).paragraphs[par_idx]
+
+        key = (page_idx, par_idx)
+        paragraph = self._cache.get(key)
+        if paragraph is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return paragraph
+
+        self.misses += 1
+
+        par_dat = dat[4][par_idx]
+        data = self._read(par_dat[2], par_dat[3])
+        try:
+            paragraph = hocr_paragraph_bytes_to_word_data(data, par_dat[4])
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+
+        self._store(key, paragraph)
+        return paragraph
+
+    def page_header(self, idx):
+        """
+        Returns page `idx` as an element without any children (only the
+        attributes), for use with functions like hocr_page_get_dimensions.
+        Only the page start tag is parsed if the page is not cached.
+        """
+        if idx < 0:
+            idx += len(self)
+
+        if idx in self._cache:
+            return self.page(idx)
+
+        xstart, xend = self.lookup_table[idx][2:4]
+        size = 4096
+        while True:
+            data = bytes(self._read(xstart, min(xend, xstart + size)))
+            tag_end = data.find(b'>') + 1
+            if tag_end or xstart + size >= xend:
+                break
+            size *= 2
+
+        if data[tag_end - 2:tag_end] == b'/>':
+            return ElementTree.fromstring(data[:tag_end])
+
+        return ElementTree.fromstring(data[:tag_end] + b'</div>')
+
+    def page(self, idx):
+        """
+        Returns the page element of page `idx`. The element must not be
+        modified, since it is shared with other users of the cache.
+        """
+        return self.page_view(idx).page
+
+    def word_data(self, idx):
+        """
+        Returns the word data of page `idx`, as hocr_page_to_word_data_fast
+        would.
+        """
+        return list(self.page_view(idx).paragraphs)
+
+    def page_text(self, idx):
+        """
+        Returns the text of page `idx`, as hocr_page_text would.
+        """
+        return self.page_view(idx).text
+
+    def leading_whitespace(self):
+        """
+        Returns the amount of whitespace characters at the start of the text
+        of the document (the text of all pages, as hocr_page_text returns
+        it). Computed once, pages without text (according to the lookup
+        table) are not parsed.
+        """
+        if self._leading_whitespace is None:
+            count = 0
+            for idx, dat in enumerate(self.lookup_table):
+                if dat[0] == dat[1]:
+                    continue
+
+                page_text = self.page_text(idx)
+                stripped = page_text.lstrip()
+                count += len(page_text) - len(stripped)
+                if stripped:
+                    break
+
+            self._leading_whitespace = count
+
+        return self._leading_whitespace
+
+    def page_for_text_offset(self, pos_bytes_plain):
+        """
+        Get the index of the page that contains the plaintext offset
+        `pos_bytes_plain`, see hocr_lookup_by_plaintext_offset.
+
+        Returns:
+
+        * Page index (`int`), or None if no page contains the offset
+        """
+        idx, _ = hocr_lookup_by_plaintext_offset(self.lookup_table,
+                                                 pos_bytes_plain)
+        return idx
+
+    def cache_info(self):
+        """
+        Returns the cache statistics as a named tuple (hits, misses, maxsize,
+        currsize), like functools.lru_cache.
+        """
+        return CacheInfo(self.hits, self.misses, self.cache_size,
+                         len(self._cache))
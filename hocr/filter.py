@@ -0,0 +1,313 @@
+"""
+Filtering of low confidence words from hOCR pages, as done by
+hocr-confidence-filter.
+
+The confidences of the words (and characters) on a page are gathered into
+NumPy arrays, so that the line averages and the per word character statistics
+are computed for all lines and words of a page at once. The sums and products
+are computed in the same order as a plain Python loop would, so the decisions
+do not depend on the rounding of a different summation order.
+
+This module requires NumPy, which is not a hard dependency of
+archive-hocr-tools, and it is therefore not imported by the hocr package.
+NumPy is only imported once pages are filtered, so that the thresholds can be
+used without paying for the NumPy import (e.g. for hocr-confidence-filter
+--help).
+"""
+
+from .parse import hocr_page_iterator, hocr_page_get_scan_res, parse_title
+from .searching import hocr_page_by_xml_range
+from .text import hocr_scan_page_bytes, UnusualLayoutError
+from .util import open_if_required, process_map, \
+        register_and_nuke_xhtml_namespace
+from .writer import hocr_page_to_bytes
+
+
+# XXX: Fine tune these values
+AVERAGE_LINE_CONF_FILTER = 75
+SINGLE_WORD_CONF_FILTER = 75
+SINGLE_CHAR_CONF_THRESHOLD = 90
+AVERAGE_CHAR_CONF_THRESHOLD = 95
+CHAR_CONFIDENCE_MULTIPLIER_THRESHOLD = 60
+LOW_CONF_CHARS_FOR_WORD_PERCENTAGE_THRESHOLD = 0.2
+BIG_WORD_FONT_SIZE = None
+
+#: Amount of pages handed to a worker process at a time
+FILTER_PAGES_PER_TASK = 8
+
+
+def _segments_to_matrix(values, counts, fill):
+    # Puts segment i of `values` (of length counts[i]) in row i of a matrix,
+    # padded with `fill`
+    import numpy as np
+
+    matrix = np.full((len(counts), max(counts.max(initial=0), 1)), fill,
+                     dtype=np.float64)
+    rows = np.repeat(np.arange(len(counts)), counts)
+    starts = np.cumsum(counts) - counts
+    columns = np.arange(len(values)) - np.repeat(starts, counts)
+    matrix[rows, columns] = values
+    return matrix
+
+
+def _segment_sums(values, counts):
+    # Sum of every segment, added up in the same order as sum() would
+    import numpy as np
+
+    matrix = _segments_to_matrix(values, counts, 0.)
+    sums = np.zeros(len(counts))
+    for column in matrix.T:
+        sums += column
+    return sums
+
+
+def _segment_products(values, counts, start):
+    # start * the product of every segment, multiplied in the same order as a
+    # Python loop would
+    import numpy as np
+
+    matrix = _segments_to_matrix(values, counts, 1.)
+    products = np.full(len(counts), start, dtype=np.float64)
+    for column in matrix.T:
+        products *= column
+    return products
+
+
+def hocr_page_filter_confidence(page,
+        avg_line_thres=AVERAGE_LINE_CONF_FILTER,
+        single_word_thres=SINGLE_WORD_CONF_FILTER,
+        single_char_confidence=SINGLE_CHAR_CONF_THRESHOLD,
+        average_char_conf_thres=AVERAGE_CHAR_CONF_THRESHOLD,
+        char_conf_multiplier_thres=CHAR_CONFIDENCE_MULTIPLIER_THRESHOLD,
+        low_char_conf_perc_thres=LOW_CONF_CHARS_FOR_WORD_PERCENTAGE_THRESHOLD,
+        filter_big_text_fontsize=BIG_WORD_FONT_SIZE):
+    """
+    Removes low confidence words from a hOCR page (in place), and the lines,
+    paragraphs and blocks that end up (mostly) empty because of it.
+
+    Words are candidates for removal if the average word confidence of their
+    line is below `avg_line_thres` and their own confidence is below
+    `single_word_thres`. A candidate word is removed if more than
+    `low_char_conf_perc_thres` of its characters have a confidence below
+    `single_char_confidence`, if the average character confidence is below
+    `average_char_conf_thres`, or if 100 times the product of the character
+    confidences (as fractions) is below `char_conf_multiplier_thres`.
+
+    If `filter_big_text_fontsize` is set (and the page has a scan_res), lines
+    with big text (per the last word of the line) have all their words
+    considered for removal, and words bigger than `filter_big_text_fontsize`
+    are removed if they have a confidence below 85 or less than 3
+    characters.
+
+    A line is removed if all its words are removed, or if it has 5 or more
+    words and more than half of them are removed.
+
+    Args:
+
+    * page: a single hOCR page as returned by hocr_page_iterator
+    * the thresholds described above, see hocr-confidence-filter
+
+    Returns:
+
+    * The amount of words removed (`int`)
+    """
+    import numpy as np
+
+    hocr_page_dpi = hocr_page_get_scan_res(page)[1]
+    if hocr_page_dpi is not None:
+        page_scaler = 1.
+    else:
+        # Disable the font checks completely if we don't have a known
+        # dpi, as this metric is very unreliable in this case
+        # If we can get the dpi another way, set it to 72 / dpi, since
+        # we want to *decrease* the font size if Tesseract assumed 72
+        # when in reality the dpi was higher
+        page_scaler = None
+    check_big = bool(filter_big_text_fontsize and page_scaler)
+
+    # Gather the structure of the page and the word attributes
+    blocks = []
+    lines = []
+    words = []
+    word_confs = []
+    word_fsizes = []
+    line_word_counts = []
+
+    for block in page.findall("*[@class='ocr_carea']"):
+        paragraphs = block.findall("*[@class='ocr_par']")
+        blocks.append((block, paragraphs))
+
+        for par in paragraphs:
+            for line in list(par):
+                line_words = line.findall("*[@class='ocrx_word']")
+                lines.append((par, line, len(words), len(line_words)))
+                line_word_counts.append(len(line_words))
+
+                for word in line_words:
+                    attrs = parse_title(word.attrib['title'])
+                    words.append(word)
+                    word_confs.append(float(attrs.x_wconf))
+                    if check_big:
+                        word_fsizes.append(float(attrs.x_fsize) * page_scaler)
+
+    if not words:
+        return 0
+
+    word_confs = np.array(word_confs)
+    line_word_counts = np.array(line_word_counts, dtype=np.int64)
+    word_line = np.repeat(np.arange(len(lines)), line_word_counts)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        line_avg = _segment_sums(word_confs, line_word_counts) / \
+                line_word_counts
+    line_filtered = line_avg < avg_line_thres
+
+    if check_big:
+        word_big = np.array(word_fsizes) > filter_big_text_fontsize
+        # Lines are considered big text depending on their last word
+        line_big = np.zeros(len(lines), dtype=bool)
+        has_words = line_word_counts > 0
+        last_word = np.cumsum(line_word_counts) - 1
+        line_big[has_words] = word_big[last_word[has_words]]
+        line_filtered |= line_big
+    else:
+        word_big = np.zeros(len(words), dtype=bool)
+        line_big = np.zeros(len(lines), dtype=bool)
+
+    candidates = np.flatnonzero(line_filtered[word_line] &
+                                (line_big[word_line] |
+                                 (word_confs < single_word_thres)))
+
+    # Character confidences of the candidate words
+    char_confs = []
+    char_counts = np.zeros(len(candidates), dtype=np.int64)
+    for idx, word_idx in enumerate(candidates):
+        chars = words[word_idx].findall('.//*[@class="ocrx_cinfo"]')
+        for char in chars:
+            char_confs.append(parse_title(char.attrib['title']).x_confs[0])
+        char_counts[idx] = len(chars)
+
+    char_confs = np.array(char_confs, dtype=np.float64)
+    low_counts = _segment_sums(char_confs < single_char_confidence,
+                               char_counts)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        perc = low_counts / char_counts
+        avg_conf = _segment_sums(char_confs, char_counts) / char_counts
+    c = _segment_products(char_confs / 100, char_counts, 100.)
+
+    candidate_confs = word_confs[candidates]
+    candidate_big = word_big[candidates]
+    remove = (perc > low_char_conf_perc_thres) | \
+             (avg_conf < average_char_conf_thres) | \
+             (c < char_conf_multiplier_thres) | \
+             (candidate_big & (candidate_confs < 85)) | \
+             (candidate_big & (char_counts < 3))
+
+    removed_words = candidates[remove]
+    removed_per_line = np.bincount(word_line[removed_words],
+                                   minlength=len(lines))
+
+    for word_idx in removed_words:
+        word = words[word_idx]
+        lines[word_line[word_idx]][1].remove(word)
+
+    # Remove the lines, paragraphs and blocks that are (mostly) empty now
+    paragraphs_changed = set()
+    for line_idx in np.flatnonzero(removed_per_line):
+        par, line, _, word_count = lines[line_idx]
+        removed = removed_per_line[line_idx]
+        percremoved = removed / word_count
+
+        # TODO: turn these into parameters too?
+        if (word_count >= 5 and percremoved > 0.5) or removed == word_count:
+            par.remove(line)
+            paragraphs_changed.add(par)
+
+    for block, paragraphs in blocks:
+        paragraphs_removed = False
+        for par in paragraphs:
+            if par in paragraphs_changed and len(par) == 0:
+                block.remove(par)
+                paragraphs_removed = True
+
+        if paragraphs_removed and \
+                len(block.findall("*[@class='ocr_par']")) == 0:
+            page.remove(block)
+
+    return len(removed_words)
+
+
+def _filter_page_to_bytes(page, settings):
+    page.tag = 'div'
+    hocr_page_filter_confidence(page, **settings)
+
+    # Whether the whitespace after a page is parsed along with it depends on
+    # how the page was read, so it is replaced by a newline
+    page.tail = None
+    return hocr_page_to_bytes(page) + b'\n'
+
+
+def _filter_page_ranges(filename, page_ranges, settings):
+    # Runs in a worker process. Returns the filename and the filtered pages,
+    # or None for files that cannot be scanned for pages, which are filtered
+    # by the main process (so they are not kept in memory as a whole).
+    if page_ranges is None:
+        return filename, None
+
+    register_and_nuke_xhtml_namespace()
+
+    with open_if_required(filename) as fp:
+        return filename, [
+                _filter_page_to_bytes(hocr_page_by_xml_range(fp, start, end),
+                                      settings)
+                for start, end in page_ranges]
+
+
+def _filter_tasks(files):
+    # Yields (filename, page ranges) for every FILTER_PAGES_PER_TASK pages,
+    # or (filename, None) for files that cannot be scanned for pages
+    for filename in files:
+        try:
+            page_bytes = list(hocr_scan_page_bytes(filename))
+        except UnusualLayoutError:
+            yield filename, None
+            continue
+
+        page_ranges = list(zip(page_bytes[:-1], page_bytes[1:]))
+        for idx in range(0, len(page_ranges), FILTER_PAGES_PER_TASK):
+            yield filename, page_ranges[idx:idx + FILTER_PAGES_PER_TASK]
+
+
+def hocr_filter_pages(files, jobs=1, **settings):
+    """
+    Filters the pages of one or more hOCR files with
+    hocr_page_filter_confidence.
+
+    Args:
+
+    * files: list of paths to hOCR files
+    * (optional) jobs: amount of worker processes to filter the pages in. If
+      more than one, the page boundaries are found by scanning the files (see
+      hocr_scan_page_bytes) and batches of pages are filtered by the workers.
+    * settings: thresholds passed on to hocr_page_filter_confidence
+
+    Returns:
+
+    * Iterator over the filtered pages, serialised (`bytes`, without the
+      XHTML namespace declaration, followed by a newline), in the order of
+      the files. The output does not depend on `jobs`.
+    """
+    if jobs <= 1:
+        for filename in files:
+            for page in hocr_page_iterator(filename):
+                yield _filter_page_to_bytes(page, settings)
+        return
+
+    tasks = ((filename, page_ranges, settings)
+             for filename, page_ranges in _filter_tasks(files))
+    for filename, pages in process_map(_filter_page_ranges, tasks, jobs):
+        if pages is None:
+            pages = (_filter_page_to_bytes(page, settings)
+                     for page in hocr_page_iterator(filename))
+        for page in pages:
+            yield page
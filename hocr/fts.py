@@ -1,8 +1,10 @@
-from hocr.parse import hocr_page_to_word_data_fast, hocr_page_get_dimensions
-from hocr.searching import hocr_lookup_page_by_dat, \
-        hocr_lookup_by_plaintext_offset
+from bisect import bisect_right
+
+from hocr.parse import hocr_page_get_dimensions
+from hocr.document import HocrDocument
+from hocr.searching import hocr_lookup_by_plaintext_offset
 from hocr.text import get_paragraph_hocr_words, hocr_paragraph_text, \
-        get_paragraph_hocr_words, hocr_page_text_from_word_data
+        get_word_offsets
 
 """
 Highly experimental and unstable interface to retrieve page indexes and
@@ -21,48 +23,57 @@ get the text coordinates of the matches.
 FINAL_PRE_TAG = '{{{'
 FINAL_POST_TAG = '}}}'
 
-def match_words(hocr_words, match_indexes):
-    def intersects(match, word_start, word_end):
-        # XXX: There might be an off-by-one error here due to the use of '<'
-        # which would cause an error if the last word was exactly one character
-        return (match[0] < word_end) and (match[1] >= word_start)
+def match_words(hocr_words, match_indexes, word_offsets=None):
+    """
+    Find the words that every match (a (start, end) range in the paragraph
+    text) intersects with, in a single pass over the matches (which are in
+    order). The words are found with a binary search over the word offsets.
+
+    Args:
+
+    * hocr_words: words of the paragraph, see get_paragraph_hocr_words
+    * match_indexes: list of (start, end) of the matches
+    * (optional) word_offsets: (starts, ends) of the words, as returned by
+      get_word_offsets
 
+    Returns:
+
+    * List with a list of matching words for every match that matches words
+    """
+    if word_offsets is None:
+        word_offsets = get_word_offsets(hocr_words)
+    word_starts, word_ends = word_offsets
+
+    # A word intersects with match (start, end) if start < word_end and
+    # end >= word_start.
+    # XXX: There might be an off-by-one error here due to the use of '<'
+    # which would cause an error if the last word was exactly one character
     matching_words = []
-    str_idx = 0
     word_i = 0
     for match in match_indexes:
-        match_words = []
-        for i in range(word_i, len(hocr_words)):
-            word = hocr_words[i]
-            word_start = str_idx
-            word_end = str_idx + len(word['text'])
-
-            if intersects(match, word_start, word_end):
-                # Starting or continuing the match
-                match_words.append(word)
-                word_i = i + 1
-                # Add + 1 for the space after a word
-                str_idx += len(word['text']) + 1
-            elif match_words:
-                # No longer intersecting, so we can stop processing this match
-                # without incrementing
-                break
-            else:
-                # Haven't started matching yet, so we can continue to the next word
-                word_i = i + 1
-                # Add + 1 for the space after a word
-                str_idx += len(word['text']) + 1
-
-        if match_words:
-            matching_words.append(match_words)
-        
+        # Word offsets only increase, so the words that intersect with the
+        # match form a range: from the first word that ends after the start of
+        # the match, up to the first word that starts after its end
+        first = bisect_right(word_ends, match[0], word_i)
+        last = bisect_right(word_starts, match[1], word_i)
+
+        if first < last:
+            matching_words.append(hocr_words[first:last])
+            word_i = last
+        else:
+            # Nothing intersects, all remaining words are passed over
+            word_i = len(hocr_words)
+
         if word_i >= len(hocr_words):
             break
 
     return matching_words
 
 
-def find_word_boxes(solr_line, hocr_text, hocr_par, page, page_no, pre_tag, post_tag, replace_with_final_tags=False):
+def find_word_boxes(solr_line, hocr_text, hocr_par, page, page_no, pre_tag, post_tag, replace_with_final_tags=False,
+                    word_offsets=None):
+    # word_offsets: (words, starts, ends) of hocr_par, as returned by
+    # ParagraphTextIndex.word_offsets
     match_number = 0
     match_with = solr_line
     cur = {
@@ -115,8 +126,12 @@ def find_word_boxes(solr_line, hocr_text, hocr_par, page, page_no, pre_tag, post
     # Now we know where our matches are in the text (without the brackets), we
     # need to match that to the hocr words, because just knowing which text is
     # not relevant - we need to find the bounding boxes for the matching text.
-    hocr_words = get_paragraph_hocr_words(hocr_par)
-    word_matches = match_words(hocr_words, match_indexes)
+    if word_offsets is None:
+        hocr_words = get_paragraph_hocr_words(hocr_par)
+        word_matches = match_words(hocr_words, match_indexes)
+    else:
+        word_matches = match_words(word_offsets[0], match_indexes,
+                                   word_offsets[1:])
 
     # We have bounding boxes per word, but the current API doesn't permit us to
     # pass multiple bounding boxes for a single match, so let's find the
@@ -177,105 +192,19 @@ def find_word_boxes(solr_line, hocr_text, hocr_par, page, page_no, pre_tag, post
     return results
 
 
-def find_matches(lookup_table, hocrfp, text, es_whitespace_fixup_required=False,
-                 pre_tag='{{{', post_tag='}}}',
-                 replace_with_final_tags=False):
-    text_byte_count = 0
-    current_dat = None
-    page_number = 0
-
-    if es_whitespace_fixup_required:
-        if not text.endswith('\n'):
-            text += '\n'
-
-        # There might be faster ways of doing this (e.g. read the _searchtext
-        # file and count the amount of 'whitespace' bytes)
-        done = False
-        for dat in lookup_table:
-            page = hocr_lookup_page_by_dat(hocrfp, dat)
-            word_data = hocr_page_to_word_data_fast(page)
-            page_text = hocr_page_text_from_word_data(word_data)
-
-            for line in page_text:
-                if line.strip() == '':
-                    # Add counted bytes, one for newline
-                    text_byte_count += len(line)
-                    continue
-                else:
-                    done = True
-                    break
-            if done:
-                break
-
-
-    # For every line in the highlighted text, let's find matches...
+def _highlighted_lines(text, text_byte_count, pre_tag, post_tag):
+    # Yields the plaintext offset and the line, of every line in the
+    # highlighted text that contains a match. `text_byte_count` is the offset
+    # of the first line.
     for line in text[:-1].split('\n'):
         # Line should contain both pre_tag and post_tag
         contains_left_match = pre_tag in line
         contains_right_match = post_tag in line
 
-        contains_match = contains_left_match and contains_right_match
-
-        if contains_left_match or contains_right_match and not contains_match:
-            # Matches span multiple lines...
-            pass
-
-        if contains_match:
-            page_number, new_dat = \
-                    hocr_lookup_by_plaintext_offset(lookup_table,
-                                                    text_byte_count)
-
-            # Check if we need to change/reload our page and paragraphs
-            # variables
-            if new_dat != current_dat:
-                # Only do this if we're on a new page
-                current_dat = new_dat
-                page = hocr_lookup_page_by_dat(hocrfp, current_dat)
-                paragraphs = hocr_page_to_word_data_fast(page)
-
-            # Figure out what paragraph we are at, based on text length?
-            # Find paragraph that contains this line, we know where the line
-            # starts, so now we just need to find the paragraph, we can do this
-            # with getting the paragraph text on a page, and add the amount of
-            # characters, until we reach the line start.
-            page_start_at = current_dat[0]
-            match_at = text_byte_count
-            cnt = 0
-            match = None
-            for idx, paragraph in enumerate(paragraphs):
-                txt = hocr_paragraph_text(paragraph)
-                # Add + 1 for newline
-                cnt += len(txt) + 1
-
-                if page_start_at + cnt > match_at:
-                    match = idx
-                    break
-
-            if match is None:
-                # This should never happen
-                raise Exception('Could not find any match!')
-
-            paragraph_words = paragraphs[match]
-            paragraph_txt = hocr_paragraph_text(paragraph_words)
-
-            # TODO: We might want to remove this in the future, it's wasteful
-            # to do the replace again.
-            if paragraph_txt != line.replace(pre_tag, '').replace(post_tag, ''):
-                raise Exception('Reconstructed text does not match')
-
-            word_results = find_word_boxes(line, paragraph_txt,
-                                           paragraph_words, page, page_number,
-                                           pre_tag, post_tag,
-                                           replace_with_final_tags=replace_with_final_tags)
-
-            # We currently (rarely) allow word_results to be empty.
-            # This happens for example in a paragraph like this:
-            # " THE}}} CAMP OF {{{THE BRITISH MISSION AT ADOWA. From a Drawing by F. VILLIERs.  the}}}"
-            # where elastic finds very strange matches and also across
-            # paragraph, which we do not support. this is also special cased in
-            # find_word_boxes
-            if word_results is not None:
-                yield word_results
+        # Lines that contain only one of the tags have matches that span
+        # multiple lines, which are not supported
+        if contains_left_match and contains_right_match:
+            yield text_byte_count, line
 
         # Correct for any {{{ and }}}, which are not in our plaintext, but are
         # in the FTS text
@@ -287,3 +216,158 @@ def find_matches(lookup_table, hocrfp, text, es_whitespace_fixup_required=False,
 
         # Add counted bytes, plus one for the newline
         text_byte_count += len(line) - subtract + 1
+
+
+def _match_line(doc, page_number, text_byte_count, line, pre_tag, post_tag,
+                replace_with_final_tags):
+    # Finds the word boxes of the matches in highlighted line `line`, which
+    # starts at plaintext offset `text_byte_count`, on page `page_number`
+    dat = doc.lookup_table[page_number]
+
+    word_offsets = None
+    if len(dat) > 4:
+        # The lookup table has paragraph granularity, so we can find
+        # the paragraph in the table, and parse just that paragraph
+        match, _ = hocr_lookup_by_plaintext_offset(dat[4], text_byte_count)
+        if match is None:
+            # This should never happen
+            raise Exception('Could not find any match!')
+
+        page = doc.page_header(page_number)
+        paragraph_words = doc.paragraph_word_data(page_number, match)
+        paragraph_txt = hocr_paragraph_text(paragraph_words)
+    else:
+        # Paragraphs are parsed on demand, up to the one that contains the
+        # match, and their text offsets are kept with the (cached) page
+        view = doc.page_view(page_number)
+        page = view.page
+        text_index = view.text_index
+
+        # Find the paragraph that contains this line, we know where the line
+        # starts, and the text index knows where every paragraph (plus its
+        # newline) ends.
+        match = text_index.find(text_byte_count - dat[0])
+
+        if match is None:
+            # This should never happen
+            raise Exception('Could not find any match!')
+
+        paragraph_words = text_index.paragraphs[match]
+        paragraph_txt = text_index.text(match)
+        word_offsets = text_index.word_offsets(match)
+
+    # TODO: We might want to remove this in the future, it's wasteful
+    # to do the replace again.
+    if paragraph_txt != line.replace(pre_tag, '').replace(post_tag, ''):
+        raise Exception('Reconstructed text does not match')
+
+    # We currently (rarely) allow the result to be empty (None).
+    # This happens for example in a paragraph like this:
+    # " THE}}} CAMP OF {{{THE BRITISH MISSION AT ADOWA. From a Drawing by F. VILLIERs.  the}}}"
+    # where elastic finds very strange matches and also across
+    # paragraph, which we do not support. this is also special cased in
+    # find_word_boxes
+    return find_word_boxes(line, paragraph_txt, paragraph_words, page,
+                           page_number, pre_tag, post_tag,
+                           replace_with_final_tags=replace_with_final_tags,
+                           word_offsets=word_offsets)
+
+
+def find_matches(lookup_table, hocrfp, text, es_whitespace_fixup_required=False,
+                 pre_tag='{{{', post_tag='}}}',
+                 replace_with_final_tags=False):
+    # hocrfp can also be a HocrDocument, so that parsed pages are cached
+    # across calls
+    if isinstance(hocrfp, HocrDocument):
+        yield from _find_matches(hocrfp, text, es_whitespace_fixup_required,
+                                 pre_tag, post_tag, replace_with_final_tags)
+        return
+
+    with HocrDocument(hocrfp, lookup_table) as doc:
+        yield from _find_matches(doc, text, es_whitespace_fixup_required,
+                                 pre_tag, post_tag, replace_with_final_tags)
+
+
+def _find_matches(doc, text, es_whitespace_fixup_required, pre_tag, post_tag,
+                  replace_with_final_tags):
+    text_byte_count = 0
+
+    if es_whitespace_fixup_required:
+        if not text.endswith('\n'):
+            text += '\n'
+
+        text_byte_count += doc.leading_whitespace()
+
+    # For every line in the highlighted text, let's find matches...
+    for line_byte_count, line in _highlighted_lines(text, text_byte_count,
+                                                    pre_tag, post_tag):
+        page_number = doc.page_for_text_offset(line_byte_count)
+        word_results = _match_line(doc, page_number, line_byte_count, line,
+                                   pre_tag, post_tag, replace_with_final_tags)
+        if word_results is not None:
+            yield word_results
+
+
+def find_matches_batch(lookup_table, hocrfp, annotated_texts,
+                       es_whitespace_fixup_required=False, pre_tag='{{{',
+                       post_tag='}}}', replace_with_final_tags=False):
+    """
+    Find the matches of several highlighted texts (e.g. for several queries)
+    in one document. The highlighted lines of all texts are grouped by page,
+    so that every page is parsed only once.
+
+    Args:
+
+    * lookup_table: lookup table of the document
+    * hocrfp: hOCR file (or HocrDocument)
+    * annotated_texts: list of highlighted texts (`str`)
+    * The other arguments are the same as for find_matches
+
+    Returns:
+
+    * List with, for every text in `annotated_texts`, the list of results
+      find_matches would yield for it. If a line can not be matched, the
+      exception that find_matches would raise is raised.
+    """
+    if isinstance(hocrfp, HocrDocument):
+        return _find_matches_batch(hocrfp, annotated_texts,
+                                   es_whitespace_fixup_required, pre_tag,
+                                   post_tag, replace_with_final_tags)
+
+    with HocrDocument(hocrfp, lookup_table) as doc:
+        return _find_matches_batch(doc, annotated_texts,
+                                   es_whitespace_fixup_required, pre_tag,
+                                   post_tag, replace_with_final_tags)
+
+
+def _find_matches_batch(doc, annotated_texts, es_whitespace_fixup_required,
+                        pre_tag, post_tag, replace_with_final_tags):
+    lines = []
+    for text_idx, text in enumerate(annotated_texts):
+        text_byte_count = 0
+
+        if es_whitespace_fixup_required:
+            if not text.endswith('\n'):
+                text += '\n'
+
+            text_byte_count += doc.leading_whitespace()
+
+        for line_idx, (line_byte_count, line) in enumerate(
+                _highlighted_lines(text, text_byte_count, pre_tag, post_tag)):
+            page_number = doc.page_for_text_offset(line_byte_count)
+            lines.append((len(doc) if page_number is None else page_number,
+                          text_idx, line_idx, page_number, line_byte_count,
+                          line))
+
+    # The lines of a text are in order of their offset, and so of their page,
+    # so sorting by page keeps the results of every text in order
+    lines.sort(key=lambda entry: entry[:3])
+
+    results = [[] for _ in annotated_texts]
+    for _, text_idx, _, page_number, text_byte_count, line in lines:
+        word_results = _match_line(doc, page_number, text_byte_count, line,
+                                   pre_tag, post_tag, replace_with_final_tags)
+        if word_results is not None:
+            results[text_idx].append(word_results)
+
+    return results
@@ -0,0 +1,378 @@
+"""
+Random access into gzip compressed hOCR files.
+
+Seeking in a gzip.GzipFile decompresses everything up to the new position
+(starting over from the start of the file when seeking backwards), so looking
+up pages in big compressed hOCR files is slow. A gzip index stores
+checkpoints in the compressed stream, every `span` bytes of uncompressed data,
+together with the 32KiB of uncompressed data that precedes them (the window
+that deflate can refer back to). Decompression can then start at the
+checkpoint closest to the requested offset, like zlib's examples/zran.c
+does.
+
+Only Python's zlib module is required to read from an indexed file. Building
+an index requires the zlib shared library (loaded with ctypes), since Python's
+zlib module cannot stop at deflate block boundaries.
+
+The index of `file.html.gz` is stored as `file.html.gzindex`, and
+hocr.util.open_if_required uses it automatically if it exists.
+"""
+
+import ctypes
+import io
+import os
+import struct
+import zlib
+from bisect import bisect_right
+from collections import namedtuple
+
+
+#: Default amount of uncompressed bytes between two checkpoints
+GZIP_INDEX_SPAN = 1024 * 1024
+
+#: Size of the deflate window
+WINDOW_SIZE = 32768
+
+#: Amount of compressed bytes read at a time
+GZIP_READ_SIZE = 64 * 1024
+
+GZIP_INDEX_MAGIC = b'HOCRGZI1'
+_HEADER = struct.Struct('<QQI')
+_CHECKPOINT = struct.Struct('<QQBI')
+
+#: A checkpoint: uncompressed offset, offset of the first compressed byte
+#: after the checkpoint, amount of bits of the byte before that offset that
+#: are part of the data after the checkpoint, and the window.
+GzipCheckpoint = namedtuple('GzipCheckpoint', ['uncompressed_offset',
+                                               'compressed_offset', 'bits',
+                                               'window'])
+
+
+class _ZStream(ctypes.Structure):
+    _fields_ = [('next_in', ctypes.c_void_p), ('avail_in', ctypes.c_uint),
+                ('total_in', ctypes.c_ulong),
+                ('next_out', ctypes.c_void_p), ('avail_out', ctypes.c_uint),
+                ('total_out', ctypes.c_ulong),
+                ('msg', ctypes.c_char_p), ('state', ctypes.c_void_p),
+                ('zalloc', ctypes.c_void_p), ('zfree', ctypes.c_void_p),
+                ('opaque', ctypes.c_void_p),
+                ('data_type', ctypes.c_int), ('adler', ctypes.c_ulong),
+                ('reserved', ctypes.c_ulong)]
+
+
+_Z_OK = 0
+_Z_STREAM_END = 1
+_Z_BLOCK = 5
+
+
+def _load_libz():
+    # ctypes.util runs external programs to find libraries, import it only when
+    # an index is built
+    import ctypes.util
+
+    name = ctypes.util.find_library('z') or ctypes.util.find_library('zlib1')
+    if name is None:
+        raise OSError('Could not find the zlib library')
+
+    libz = ctypes.CDLL(name)
+    libz.zlibVersion.restype = ctypes.c_char_p
+    libz.inflateInit2_.argtypes = [ctypes.POINTER(_ZStream), ctypes.c_int,
+                                   ctypes.c_char_p, ctypes.c_int]
+    libz.inflate.argtypes = [ctypes.POINTER(_ZStream), ctypes.c_int]
+    libz.inflateEnd.argtypes = [ctypes.POINTER(_ZStream)]
+    return libz
+
+
+class GzipIndex(object):
+    """
+    Checkpoints into a gzip file, as created by build_gzip_index.
+
+    Attributes:
+
+    * `checkpoints`: list of GzipCheckpoint, sorted by offset
+    * `compressed_size`: size of the gzip file the index was built for
+    * `uncompressed_size`: size of the uncompressed data
+    """
+    def __init__(self, checkpoints, compressed_size, uncompressed_size):
+        self.checkpoints = checkpoints
+        self.compressed_size = compressed_size
+        self.uncompressed_size = uncompressed_size
+
+        self._offsets = [point.uncompressed_offset for point in checkpoints]
+
+    def checkpoint_for(self, offset):
+        """
+        Returns the last checkpoint at or before uncompressed offset `offset`.
+        """
+        return self.checkpoints[max(bisect_right(self._offsets, offset) - 1, 0)]
+
+    def save(self, fd_or_path):
+        """
+        Save the index to a file (binary).
+        """
+        if isinstance(fd_or_path, str):
+            with open(fd_or_path, 'wb') as fp:
+                return self.save(fp)
+
+        fp = fd_or_path
+        fp.write(GZIP_INDEX_MAGIC)
+        fp.write(_HEADER.pack(self.compressed_size, self.uncompressed_size,
+                              len(self.checkpoints)))
+        for point in self.checkpoints:
+            window = zlib.compress(point.window)
+            fp.write(_CHECKPOINT.pack(point.uncompressed_offset,
+                                      point.compressed_offset, point.bits,
+                                      len(window)))
+            fp.write(window)
+
+    @classmethod
+    def load(cls, fd_or_path):
+        """
+        Load an index saved with GzipIndex.save.
+        """
+        if isinstance(fd_or_path, str):
+            with open(fd_or_path, 'rb') as fp:
+                return cls.load(fp)
+
+        fp = fd_or_path
+        if fp.read(len(GZIP_INDEX_MAGIC)) != GZIP_INDEX_MAGIC:
+            raise ValueError('Not a hOCR gzip index')
+
+        compressed_size, uncompressed_size, count = \
+                _HEADER.unpack(fp.read(_HEADER.size))
+
+        checkpoints = []
+        for _ in range(count):
+            uoffset, coffset, bits, window_size = \
+                    _CHECKPOINT.unpack(fp.read(_CHECKPOINT.size))
+            window = zlib.decompress(fp.read(window_size))
+            checkpoints.append(GzipCheckpoint(uoffset, coffset, bits, window))
+
+        return cls(checkpoints, compressed_size, uncompressed_size)
+
+
+def gzip_index_path(path):
+    """
+    Returns the path of the gzip index for gzip file `path`
+    (`file.html.gz` -> `file.html.gzindex`).
+    """
+    return path + 'index'
+
+
+def build_gzip_index(path, span=GZIP_INDEX_SPAN):
+    """
+    Build a checkpoint index for a gzip file.
+
+    Args:
+
+    * path: path to the gzip file (str)
+    * (optional) span: minimum amount of uncompressed bytes between
+      checkpoints
+
+    Returns:
+
+    * GzipIndex
+    """
+    libz = _load_libz()
+
+    strm = _ZStream()
+    ret = libz.inflateInit2_(ctypes.byref(strm), 47, libz.zlibVersion(),
+                             ctypes.sizeof(_ZStream))
+    if ret != _Z_OK:
+        raise ValueError('inflateInit2 failed: %d' % ret)
+
+    window = ctypes.create_string_buffer(WINDOW_SIZE)
+    checkpoints = []
+    totin = totout = last = 0
+    ret = _Z_OK
+
+    try:
+        with open(path, 'rb') as fp:
+            while ret != _Z_STREAM_END:
+                chunk = fp.read(GZIP_READ_SIZE)
+                if not chunk:
+                    raise ValueError('Unexpected end of gzip file')
+
+                inbuf = ctypes.create_string_buffer(chunk, len(chunk))
+                strm.next_in = ctypes.addressof(inbuf)
+                strm.avail_in = len(chunk)
+
+                while strm.avail_in:
+                    if strm.avail_out == 0:
+                        strm.next_out = ctypes.addressof(window)
+                        strm.avail_out = WINDOW_SIZE
+
+                    # Stop at the end of every deflate block
+                    totin += strm.avail_in
+                    totout += strm.avail_out
+                    ret = libz.inflate(ctypes.byref(strm), _Z_BLOCK)
+                    totin -= strm.avail_in
+                    totout -= strm.avail_out
+
+                    if ret == _Z_STREAM_END:
+                        break
+                    if ret != _Z_OK:
+                        raise ValueError('inflate failed: %d' % ret)
+
+                    # At the end of a block (but not the last block)
+                    at_block_end = (strm.data_type & 128) and \
+                            not (strm.data_type & 64)
+                    if at_block_end and (totout == 0 or totout - last > span):
+                        left = strm.avail_out
+                        raw = window.raw
+                        checkpoints.append(GzipCheckpoint(
+                            totout, totin, strm.data_type & 7,
+                            raw[WINDOW_SIZE - left:] + raw[:WINDOW_SIZE - left]))
+                        last = totout
+
+            if strm.avail_in or fp.read(1):
+                raise ValueError('Gzip files with multiple members are not '
+                                 'supported')
+
+            compressed_size = fp.tell()
+    finally:
+        libz.inflateEnd(ctypes.byref(strm))
+
+    return GzipIndex(checkpoints, compressed_size, totout)
+
+
+def _shifted_chunks(fp, offset, bits):
+    # Yields the compressed data starting `bits` bits before `offset`, shifted
+    # so that the data starts at a byte boundary
+    if not bits:
+        fp.seek(offset)
+        while True:
+            chunk = fp.read(GZIP_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+    fp.seek(offset - 1)
+    prev = fp.read(1)
+    shift = 8 - bits
+    while True:
+        chunk = fp.read(GZIP_READ_SIZE)
+        if not chunk:
+            yield bytes([prev[0] >> shift])
+            return
+
+        data = prev + chunk
+        shifted = int.from_bytes(data, 'little') >> shift
+        yield shifted.to_bytes(len(data), 'little')[:len(chunk)]
+        prev = chunk[-1:]
+
+
+class IndexedGzipReader(io.RawIOBase):
+    """
+    Seekable reader for the uncompressed data of a gzip file, using a
+    GzipIndex to start decompressing close to the requested offset. Use
+    open_indexed_gzip to get a buffered version.
+
+    Args:
+
+    * path: path to the gzip file
+    * index: GzipIndex for the file
+    """
+    def __init__(self, path, index):
+        self.name = path
+        self.index = index
+        self._fp = open(path, 'rb')
+
+        self._pos = 0
+        self._decomp = None
+        self._decomp_pos = 0
+        self._chunks = None
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self._pos
+        elif whence == io.SEEK_END:
+            offset += self.index.uncompressed_size
+
+        if offset < 0:
+            raise ValueError('Negative seek position %d' % offset)
+
+        self._pos = offset
+        return self._pos
+
+    def close(self):
+        if not self.closed:
+            self._fp.close()
+        super().close()
+
+    def _restart(self):
+        point = self.index.checkpoint_for(self._pos)
+
+        if point.window:
+            self._decomp = zlib.decompressobj(-zlib.MAX_WBITS,
+                                              zdict=point.window)
+        else:
+            self._decomp = zlib.decompressobj(-zlib.MAX_WBITS)
+        self._decomp_pos = point.uncompressed_offset
+        self._chunks = _shifted_chunks(self._fp, point.compressed_offset,
+                                       point.bits)
+
+    def _inflate(self, size):
+        while not self._decomp.eof:
+            data = self._decomp.unconsumed_tail
+            if not data:
+                data = next(self._chunks, b'')
+                if not data:
+                    break
+
+            out = self._decomp.decompress(data, size)
+            if out:
+                self._decomp_pos += len(out)
+                return out
+
+        return b''
+
+    def readinto(self, b):
+        # Continue decompressing from where we are, unless there is a
+        # checkpoint closer to the requested offset
+        if self._decomp is None or self._pos < self._decomp_pos or \
+                self.index.checkpoint_for(self._pos).uncompressed_offset > \
+                self._decomp_pos:
+            self._restart()
+
+        while self._decomp_pos < self._pos:
+            if not self._inflate(min(self._pos - self._decomp_pos,
+                                     GZIP_READ_SIZE)):
+                return 0
+
+        out = self._inflate(len(b))
+        b[:len(out)] = out
+        self._pos += len(out)
+        return len(out)
+
+
+def open_indexed_gzip(path, index=None):
+    """
+    Open a gzip file for (fast) random access.
+
+    Args:
+
+    * path: path to the gzip file
+    * (optional) index: GzipIndex, loaded from gzip_index_path(path) if not
+      provided
+
+    Returns:
+
+    * Buffered binary file object
+    """
+    if index is None:
+        index = GzipIndex.load(gzip_index_path(path))
+
+    if index.compressed_size != os.path.getsize(path):
+        raise ValueError('Gzip index does not match %s' % path)
+
+    return io.BufferedReader(IndexedGzipReader(path, index))
@@ -0,0 +1,393 @@
+"""
+Highlighting of many patterns at once in (large) plaintext documents, like
+the search text of a hOCR document (see hocr-text), in the way a full-text
+search engine would highlight the matches of a query, so that the matches can
+be found with hocr.fts.
+
+The text is highlighted in a single pass, in chunks of a fixed size, so even
+whole documents with thousands of patterns are highlighted in constant memory.
+Matches are the leftmost-longest, non-overlapping matches of the patterns:
+from the start of the text, the match that starts first (and of the matches
+that start there, the longest) is highlighted, and the search continues after
+it.
+
+The patterns are combined into a single regular expression, with the patterns
+in a trie so that the regular expression engine only follows the patterns
+that match the text, or are matched by a pure Python Aho-Corasick automaton.
+The regular expression is faster, and is used by default.
+"""
+
+import codecs
+import re
+import sys
+
+
+#: Amount of characters highlighted at a time
+HIGHLIGHT_CHUNK_SIZE = 64 * 1024
+
+#: Highlighting methods
+METHODS = ('regex', 'aho-corasick')
+
+_WORD_CHAR = re.compile(r'\w')
+
+# See _get_boundary_changing_chars
+_boundary_changing_chars = None
+
+
+def _fold(text):
+    # Case folds `text`, returns the folded text and the offsets in the
+    # original text of the folded characters, which is None if every
+    # character folds to one character. The offset of characters that are
+    # not the first character of the folding of a character is -1.
+    folded = text.casefold()
+    if len(folded) == len(text):
+        return folded, None
+
+    pieces = []
+    offsets = []
+    for idx, char in enumerate(text):
+        char = char.casefold()
+        pieces.append(char)
+        offsets.append(idx)
+        offsets.extend([-1] * (len(char) - 1))
+    offsets.append(len(text))
+    return ''.join(pieces), offsets
+
+
+def _get_boundary_changing_chars():
+    # The characters around which case folding changes the word boundaries:
+    # that are word characters while the first or last character of their
+    # folding is not, or the other way around, like 'İ', which folds to 'i'
+    # and a combining dot (not a word character). Returns the characters
+    # that fold to a single character, and all of them. Found on first use,
+    # since it takes a while.
+    global _boundary_changing_chars
+
+    if _boundary_changing_chars is None:
+        single = []
+        multiple = []
+        for code in range(sys.maxunicode + 1):
+            char = chr(code)
+            folded = char.casefold()
+            if folded == char:
+                continue
+            is_word = bool(_WORD_CHAR.match(char))
+            if bool(_WORD_CHAR.match(folded[0])) != is_word or \
+                    bool(_WORD_CHAR.match(folded[-1])) != is_word:
+                if len(folded) == 1:
+                    single.append(char)
+                else:
+                    multiple.append(char)
+        _boundary_changing_chars = (single, single + multiple)
+
+    return _boundary_changing_chars
+
+
+def _trie_regex(node):
+    # Regular expression that matches the patterns in trie `node` (a dict of
+    # char -> node, with key '' if a pattern ends at the node), longest first
+    alternatives = []
+    for char in sorted(node):
+        if char:
+            alternatives.append(re.escape(char) + _trie_regex(node[char]))
+
+    if not alternatives:
+        return ''
+    if len(alternatives) == 1:
+        regex = alternatives[0]
+        if '' in node:
+            regex = '(?:' + regex + ')?'
+    else:
+        regex = '(?:' + '|'.join(alternatives) + ')'
+        if '' in node:
+            regex += '?'
+    return regex
+
+
+class Highlighter(object):
+    """
+    Highlights the matches of `patterns` in text.
+
+    Args:
+
+    * patterns: list of patterns (`str`) to highlight
+    * ignore_case: match the patterns without regard to case (with Unicode
+      case folding)
+    * whole_words: only match patterns that are not preceded or followed by
+      a word character (letters, digits and underscores)
+    * pre_tag: text to insert before every match
+    * post_tag: text to insert after every match
+    * method: `regex` or `aho-corasick`, see METHODS
+    """
+    def __init__(self, patterns, ignore_case=True, whole_words=False,
+                 pre_tag='{{{', post_tag='}}}', method='regex'):
+        if method not in METHODS:
+            raise ValueError('Unknown highlighting method: %r' % (method,))
+
+        self.ignore_case = ignore_case
+        self.whole_words = whole_words
+        self.pre_tag = pre_tag
+        self.post_tag = post_tag
+        self.method = method
+
+        if ignore_case:
+            patterns = [pattern.casefold() for pattern in patterns]
+        self.patterns = sorted(set(pattern for pattern in patterns if pattern))
+        if not self.patterns:
+            raise ValueError('No (non-empty) patterns to highlight')
+
+        self._pattern_set = set(self.patterns)
+        self.max_length = max(len(pattern) for pattern in self.patterns)
+
+        trie = {}
+        for pattern in self.patterns:
+            node = trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node[''] = True
+
+        if method == 'regex':
+            regex = _trie_regex(trie)
+            self._regex = re.compile(regex)
+            if whole_words:
+                self._word_regex = re.compile(r'(?<!\w)(?:' + regex +
+                                              r')(?!\w)')
+            self._search = self._search_regex
+        else:
+            self._build_automaton(trie)
+            self._search = self._search_automaton
+
+        if whole_words and ignore_case:
+            self._boundary_changing_chars = _get_boundary_changing_chars()
+
+    def _build_automaton(self, trie):
+        # Aho-Corasick automaton over the trie: for every state, the
+        # transitions, the failure state and the lengths of the patterns that
+        # end in the state, longest first
+        self._goto = [{}]
+        terminal = [False]
+
+        nodes = [(trie, 0)]
+        while nodes:
+            node, state = nodes.pop()
+            for char, child in node.items():
+                if char:
+                    self._goto[state][char] = len(self._goto)
+                    self._goto.append({})
+                    terminal.append('' in child)
+                    nodes.append((child, len(self._goto) - 1))
+
+        # The failure state of a state is shallower, so the states are
+        # visited breadth first
+        self._fail = [0] * len(self._goto)
+        self._out = [()] * len(self._goto)
+        depth = [0] * len(self._goto)
+        level = [0]
+        while level:
+            next_level = []
+            for state in level:
+                for char, child in self._goto[state].items():
+                    depth[child] = depth[state] + 1
+                    if state:
+                        fail = self._fail[state]
+                        while fail and char not in self._goto[fail]:
+                            fail = self._fail[fail]
+                        self._fail[child] = self._goto[fail].get(char, 0)
+                    out = (depth[child],) if terminal[child] else ()
+                    self._out[child] = out + self._out[self._fail[child]]
+                    next_level.append(child)
+            level = next_level
+
+    def _is_word_boundary(self, text, start, end):
+        return not ((start > 0 and _WORD_CHAR.match(text, start - 1)) or
+                    (end < len(text) and _WORD_CHAR.match(text, end)))
+
+    def _is_match(self, buffer, offsets, start, end):
+        # Whether `start`:`end` of the (folded) text is a match in `buffer`:
+        # it does not start or end in the middle of the folding of a
+        # character, and is a whole word in `buffer` (for whole_words)
+        if offsets is not None:
+            start, end = offsets[start], offsets[end]
+            if start == -1 or end == -1:
+                return False
+        return not self.whole_words or \
+                self._is_word_boundary(buffer, start, end)
+
+    def _longest_match_at(self, buffer, text, start, end, offsets):
+        # The end of the longest match that starts at `start` and ends before
+        # `end` (see _is_match), or None
+        for end in range(end - 1, start, -1):
+            if text[start:end] in self._pattern_set and \
+                    self._is_match(buffer, offsets, start, end):
+                return end
+        return None
+
+    def _search_regex(self, text, pos, whole_words):
+        regex = self._word_regex if whole_words else self._regex
+        match = regex.search(text, pos)
+        if match is None:
+            return None
+        return match.span()
+
+    def _search_automaton(self, text, pos, whole_words):
+        goto = self._goto
+        fail = self._fail
+        out = self._out
+        max_length = self.max_length
+
+        best = None
+        state = 0
+        for idx in range(pos, len(text)):
+            # No match that ends from here on can start at or before the
+            # best match so far
+            if best is not None and idx - max_length >= best[0]:
+                return best
+
+            char = text[idx]
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length in out[state]:
+                start = idx + 1 - length
+                if best is not None and start > best[0]:
+                    break
+                if whole_words and \
+                        not self._is_word_boundary(text, start, idx + 1):
+                    continue
+                # Starts before the best match so far, or at the same
+                # offset, but is longer
+                best = (start, idx + 1)
+                break
+
+        return best
+
+    def _highlight_buffer(self, buffer, pos, final):
+        # Highlights the matches that start at or after `pos` in `buffer`
+        # (the text before `pos` is only context). Unless this is the `final`
+        # buffer, only the matches that are certain to not change with more
+        # text are highlighted. Returns the highlighted text and the offset in
+        # `buffer` up to which it was highlighted.
+        if final:
+            safe = len(buffer)
+        else:
+            # The longest match and the character after it (for whole_words)
+            # must be in the buffer
+            safe = len(buffer) - self.max_length - 1
+
+        if self.ignore_case:
+            text, offsets = _fold(buffer)
+        else:
+            text, offsets = buffer, None
+
+        # Whole words are matched on the original text. Unless case folding
+        # changes the word boundaries, the search can check that on the
+        # folded text, otherwise the matches are checked afterwards.
+        search_whole_words = self.whole_words
+        if self.whole_words and self.ignore_case:
+            chars = self._boundary_changing_chars[offsets is not None]
+            search_whole_words = not any(char in buffer for char in chars)
+        check_matches = offsets is not None or \
+                self.whole_words and not search_whole_words
+
+        if offsets is None:
+            text_pos, text_safe = pos, safe
+        else:
+            text_pos = offsets.index(pos) if pos else 0
+            text_safe = offsets.index(safe) if safe > 0 else 0
+
+        pieces = []
+        done = pos
+        while text_pos < text_safe:
+            match = self._search(text, text_pos, search_whole_words)
+            if match is None or match[0] >= text_safe:
+                break
+            start, end = match
+
+            if check_matches and \
+                    not self._is_match(buffer, offsets, start, end):
+                # A shorter match at the same offset, or else the next match
+                end = self._longest_match_at(buffer, text, start, end,
+                                             offsets)
+                if end is None:
+                    text_pos = start + 1
+                    continue
+
+            text_pos = end
+            if offsets is not None:
+                start, end = offsets[start], offsets[end]
+
+            pieces.extend((buffer[done:start], self.pre_tag,
+                           buffer[start:end], self.post_tag))
+            done = end
+
+        end = max(safe, done)
+        pieces.append(buffer[done:end])
+        return ''.join(pieces), end
+
+    def highlight_chunks(self, chunks):
+        """
+        Highlights the text in `chunks`, an iterable of `str`.
+
+        Returns:
+
+        * Iterator over the highlighted text (`str`), in pieces
+        """
+        buffer = ''
+        pos = 0
+        for chunk in chunks:
+            buffer += chunk
+            highlighted, end = self._highlight_buffer(buffer, pos, False)
+            if highlighted:
+                yield highlighted
+            if end > 0:
+                # Keep one character as context, for whole_words
+                buffer = buffer[end - 1:]
+                pos = 1
+
+        highlighted, _ = self._highlight_buffer(buffer, pos, True)
+        if highlighted:
+            yield highlighted
+
+    def highlight(self, text):
+        """
+        Returns `text` (`str`) with the matches highlighted.
+        """
+        return ''.join(self.highlight_chunks([text]))
+
+    def highlight_file(self, fp, out, chunk_size=HIGHLIGHT_CHUNK_SIZE):
+        """
+        Highlights the UTF-8 encoded text read from `fp` (a binary file) and
+        writes it to `out` (a text file).
+
+        Args:
+
+        * fp: file to read the text from
+        * out: file to write the highlighted text to
+        * chunk_size: amount of bytes to read at a time
+        """
+        for highlighted in self.highlight_chunks(
+                _read_chunks(fp, chunk_size)):
+            out.write(highlighted)
+
+
+def _read_chunks(fp, chunk_size):
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    while True:
+        data = fp.read(chunk_size)
+        if not data:
+            break
+        yield decoder.decode(data)
+    yield decoder.decode(b'', final=True)
+
+
+def highlight_text(text, patterns, **kwargs):
+    """
+    Highlight the matches of `patterns` in `text` (`str`), see Highlighter
+    for the other arguments.
+
+    Returns:
+
+    * The highlighted text (`str`)
+    """
+    return Highlighter(patterns, **kwargs).highlight(text)
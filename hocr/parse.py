@@ -1,7 +1,12 @@
 import gzip
 import re
+import xml.parsers.expat
+from collections import namedtuple
+from functools import lru_cache
 
-from .util import open_if_required, iterparse_tags, HOCR_SCHEMA
+from . import stats
+from .util import open_if_required, iterparse_detached, HOCR_SCHEMA
+from .spatial import SpatialIndex
 
 
 WRITING_DIRECTION_UNSPECIFIED = 0
@@ -20,7 +25,107 @@ BASELINE_REGEX = re.compile(r'baseline((\s+[\d\.\-]+){2})')
 X_WCONF_REGEX = re.compile(r'x_wconf((\s+[\d\.\-]+){1})')
 X_FSIZE_REGEX = re.compile(r'x_fsize((\s+[\d\.\-]+){1})')
 
+# Matches a single property of a title (name and values), values may be quoted
+# and can then contain ';'
+TITLE_PROPERTY_REGEX = re.compile(r'([^\s;"]+)((?:\s+[^\s;"]+|\s*"[^"]*")*)\s*;?')
+TITLE_VALUE_REGEX = re.compile(r'"[^"]*"|[^\s"]+')
 
+#: Properties of a hOCR title attribute, as returned by parse_title
+TitleAttributes = namedtuple('TitleAttributes',
+                             ['bbox', 'baseline', 'x_wconf', 'x_fsize',
+                              'x_confs', 'x_bboxes', 'scan_res', 'ppageno'])
+
+
+_new_tuple = tuple.__new__
+
+
+def _split_title(title):
+    # Returns the (unquoted) values of every property of a title with quoted
+    # values, with the property name as first item
+    props = []
+    for m in TITLE_PROPERTY_REGEX.finditer(title):
+        values = [m.group(1)]
+        for value in TITLE_VALUE_REGEX.findall(m.group(2)):
+            if value[0] == '"':
+                value = value[1:-1]
+            values.append(value)
+        props.append(values)
+
+    return props
+
+
+def parse_title(title):
+    """
+    Parses a hOCR title attribute in a single pass.
+
+    Properties are separated by ';', their values by whitespace, any amount of
+    whitespace around them is allowed. Quoted values (like image paths) may
+    contain ';'.
+
+    Args:
+
+    * title: the title attribute (`str`)
+
+    Returns:
+
+    * TitleAttributes, with the following fields (None if the property is not
+      present in the title):
+
+      * `bbox`: tuple of 4 ints
+      * `baseline`: tuple of 2 floats
+      * `x_wconf`: float
+      * `x_fsize`: float
+      * `x_confs`: tuple of floats (from `x_conf` or `x_confs`)
+      * `x_bboxes`: tuple of ints, 4 per character
+      * `scan_res`: tuple of 2 ints
+      * `ppageno`: int
+    """
+    bbox = baseline = x_wconf = x_fsize = x_confs = x_bboxes = scan_res = \
+            ppageno = None
+
+    if '"' in title:
+        props = _split_title(title)
+    else:
+        props = [prop.split() for prop in title.split(';')]
+
+    for values in props:
+        if not values:
+            continue
+
+        name = values[0]
+        if name == 'bbox':
+            if len(values) == 5:
+                bbox = (int(values[1]), int(values[2]), int(values[3]),
+                        int(values[4]))
+            else:
+                bbox = tuple(map(int, values[1:5]))
+        elif name == 'x_wconf':
+            x_wconf = float(values[1])
+        elif name == 'baseline':
+            baseline = tuple(map(float, values[1:3]))
+        elif name == 'x_fsize':
+            x_fsize = float(values[1])
+        elif name == 'x_confs' or name == 'x_conf':
+            x_confs = tuple(map(float, values[1:]))
+        elif name == 'x_bboxes':
+            x_bboxes = tuple(map(int, values[1:]))
+        elif name == 'scan_res':
+            scan_res = tuple(map(int, values[1:3]))
+        elif name == 'ppageno':
+            ppageno = int(values[1])
+
+    # Skips the argument handling of the namedtuple constructor, titles are
+    # parsed for every word
+    return _new_tuple(TitleAttributes, (bbox, baseline, x_wconf, x_fsize,
+                                        x_confs, x_bboxes, scan_res, ppageno))
+
+
+# Page titles are parsed several times per page (dimensions, scan resolution,
+# ...), and tend to be identical across pages
+parse_page_title = lru_cache(maxsize=256)(parse_title)
+
+
+@stats.timed_iterator('hocr_page_iterator', stats.count_page)
 def hocr_page_iterator(fd_or_path):
     """
     Returns an iterator to iterate over a (potentially large) hOCR XML file in a
@@ -39,14 +144,12 @@ def hocr_page_iterator(fd_or_path):
     # Seek to start
     fp.seek(0)
 
+    # Pages are cleared and detached from the document once the next page is
+    # requested, which keeps memory usage constant regardless of page count
     tags = {HOCR_SCHEMA + 'div', 'div'}
-    doc = iterparse_tags(fp, tag=tags)
-    for act, elem in doc:
-        if elem.attrib['class'] == 'ocr_page':
-            page = elem
-            yield page
-
-            elem.clear()
+    match = lambda elem: elem.attrib['class'] == 'ocr_page'
+    for page in iterparse_detached(fp, tag=tags, match=match):
+        yield page
 
 
 def hocr_page_get_dimensions(hocr_page):
@@ -62,8 +165,8 @@ def hocr_page_get_dimensions(hocr_page):
 
     * (width, height): tuple of (int, int)
     """
-    pagebox = BBOX_REGEX.search(hocr_page.attrib['title']).group(1).split()
-    width, height = int(pagebox[2]), int(pagebox[3])
+    pagebox = parse_page_title(hocr_page.attrib['title']).bbox
+    width, height = pagebox[2], pagebox[3]
     return width, height
 
 
@@ -82,17 +185,16 @@ def hocr_page_get_scan_res(hocr_page):
 
     Or (None, None) if the scan_res property is not present.
     """
-    pageppi = PPI_REGEX.search(hocr_page.attrib['title'])
-    if pageppi:
-        pageppi = pageppi.group(1).split()
-        x_res, y_res = int(pageppi[0]), int(pageppi[1])
-        return (x_res, y_res)
+    scan_res = parse_page_title(hocr_page.attrib['title']).scan_res
+    if scan_res:
+        return scan_res
     else:
         return (None, None)
 
 
 # XXX: Maybe get rid of scaler here, and just move the normalisation of the
 # x_fsize to pdfrenderer.py
+@stats.timed('hocr_page_to_word_data', stats.count_word_data)
 def hocr_page_to_word_data(hocr_page, scaler=1):
     """
     Parses a single hocr_page into word data.
@@ -127,89 +229,151 @@ def hocr_page_to_word_data(hocr_page, scaler=1):
     """
     paragraphs = []
 
-    for par in hocr_page.findall('.//*[@class="ocrx_block"]') + hocr_page.findall('.//*[@class="ocr_par"]'):
-        paragraph_data = {'lines': []}
+    for par in hocr_page_get_paragraphs(hocr_page):
+        paragraphs.append(hocr_paragraph_to_word_data(par, scaler=scaler))
 
-        paragraph_writing_direction = WRITING_DIRECTION_UNSPECIFIED
-        if 'dir' in par.attrib:
-            paragraph_writing_direction = wdmap[par.attrib['dir']]
+    return paragraphs
 
-        # We assume that the direct children are all the lines
-        for line in list(par):
-            line_data = {}
 
-            linebox = BBOX_REGEX.search(line.attrib['title']).group(1).split()
-            baseline = BASELINE_REGEX.search(line.attrib['title'])
-            if baseline is not None:
-                baseline = baseline.group(1).split()
-            else:
-                baseline = [0, 0]
+def hocr_page_get_paragraphs(hocr_page, fast=False):
+    """
+    Returns the paragraph elements (`ocrx_block` and `ocr_par`) of a hocr page,
+    in the order in which hocr_page_to_word_data (or
+    hocr_page_to_word_data_fast, if `fast` is set) returns them.
 
-            linebox = [float(i) for i in linebox]
-            baseline = [float(i) for i in baseline]
+    Args:
 
-            line_data['bbox'] = linebox
-            line_data['baseline'] = baseline
+    * hocr_page: a single hocr_page as returned by hocr_page_iterator
+    * (optional) fast: use the order of hocr_page_to_word_data_fast
 
-            word_data = []
-            for word in line.findall('.//*[@class="ocrx_word"]'):
-                rawtext = ''
-                wordbased = True
-                for char in word.findall('.//*[@class="ocrx_cinfo"]'):
-                    rawtext += char.text
-                    wordbased = False
+    Returns:
 
-                if wordbased:
-                    wword = word
-                    # Words may contains additional nodes like <em>
-                    while True:
-                        children = list(wword)
-                        if len(children) == 0:
-                            break
+    * list of ElementTree.Element
+    """
+    if fast:
+        return hocr_page.findall('.//*[@class="ocr_par"]') + \
+                hocr_page.findall('.//*[@class="ocrx_block"]')
 
-                        if len(children) > 1:
-                            raise ValueError('Not character based but word has multiple children?')
+    return hocr_page.findall('.//*[@class="ocrx_block"]') + \
+            hocr_page.findall('.//*[@class="ocr_par"]')
 
-                        wword = children[0]
 
-                    rawtext = wword.text
+def hocr_paragraph_to_word_data(par, scaler=1):
+    """
+    Parses a single paragraph element into word data, see
+    hocr_page_to_word_data for the format.
 
-                    if wword.text is None:
-                        raise ValueError('Word with no text value?')
+    Args:
 
-                box = BBOX_REGEX.search(word.attrib['title']).group(1).split()
-                box = [float(i) for i in box]
+    * par: a paragraph as returned by hocr_page_get_paragraphs
+    * (optional) scaler: a scalar to scale font sizes by
 
-                conf = None
-                m = X_WCONF_REGEX.search(word.attrib['title'])
-                if m:
-                    conf = int(m.group(1).split()[0])
+    Returns:
 
-                f_sizeraw = X_FSIZE_REGEX.search(word.attrib['title'])
-                if f_sizeraw:
-                    x_fsize = float(f_sizeraw.group(1))
-                    x_fsize *= scaler
-                else:
-                    x_fsize = 0. # Will get fixed later on, in pdfrenderer at least
+    A paragraph (dict) containing a list of lines, and each line containing a
+    list of words.
+    """
+    paragraph_data = {'lines': []}
 
-                writing_direction = WRITING_DIRECTION_UNSPECIFIED
-                if 'dir' in word.attrib:
-                    writing_direction = wdmap[word.attrib['dir']]
-                else:
-                    writing_direction = paragraph_writing_direction
+    paragraph_writing_direction = WRITING_DIRECTION_UNSPECIFIED
+    if 'dir' in par.attrib:
+        paragraph_writing_direction = wdmap[par.attrib['dir']]
 
-                word_data.append({'bbox': box, 'text': rawtext, 'fontsize':
-                    x_fsize, 'writing_direction': writing_direction,
-                    'confidence': conf})
+    # We assume that the direct children are all the lines
+    for line in list(par):
+        line_data = {}
 
+        line_attrs = parse_title(line.attrib['title'])
+        linebox = [float(i) for i in line_attrs.bbox]
+        if line_attrs.baseline is not None:
+            baseline = list(line_attrs.baseline)
+        else:
+            baseline = [0., 0.]
 
-            line_data['words'] = word_data
-            #print('Line words:', word_data)
-            paragraph_data['lines'].append(line_data)
+        line_data['bbox'] = linebox
+        line_data['baseline'] = baseline
 
-        paragraphs.append(paragraph_data)
+        word_data = []
+        for word in line.findall('.//*[@class="ocrx_word"]'):
+            rawtext, box, conf, x_fsize, writing_direction = \
+                    hocr_word_attributes(word, paragraph_writing_direction,
+                                         scaler)
+
+            word_data.append({'bbox': box, 'text': rawtext, 'fontsize':
+                x_fsize, 'writing_direction': writing_direction,
+                'confidence': conf})
+
+
+        line_data['words'] = word_data
+        #print('Line words:', word_data)
+        paragraph_data['lines'].append(line_data)
+
+    return paragraph_data
+
+
+def hocr_word_attributes(word, paragraph_writing_direction=
+                         WRITING_DIRECTION_UNSPECIFIED, scaler=1):
+    """
+    Parses the text and attributes of a single word element, as used by
+    hocr_paragraph_to_word_data.
+
+    Args:
+
+    * word: an `ocrx_word` element
+    * (optional) paragraph_writing_direction: writing direction of the
+      paragraph, used if the word does not have one
+    * (optional) scaler: a scalar to scale font sizes by
+
+    Returns:
+
+    * Tuple of the text (`str`), the bounding box (list of 4 floats), the
+      confidence (`int` or None), the fontsize (`float`, or 0.) and the
+      writing direction.
+    """
+    rawtext = ''
+    wordbased = True
+    for char in word.findall('.//*[@class="ocrx_cinfo"]'):
+        rawtext += char.text
+        wordbased = False
+
+    if wordbased:
+        wword = word
+        # Words may contains additional nodes like <em>
+        while True:
+            children = list(wword)
+            if len(children) == 0:
+                break
+
+            if len(children) > 1:
+                raise ValueError('Not character based but word has multiple children?')
+
+            wword = children[0]
+
+        rawtext = wword.text
+
+        if wword.text is None:
+            raise ValueError('Word with no text value?')
+
+    word_attrs = parse_title(word.attrib['title'])
+    box = [float(i) for i in word_attrs.bbox]
+
+    conf = None
+    if word_attrs.x_wconf is not None:
+        conf = int(word_attrs.x_wconf)
+
+    if word_attrs.x_fsize is not None:
+        x_fsize = word_attrs.x_fsize * scaler
+    else:
+        x_fsize = 0. # Will get fixed later on, in pdfrenderer at least
+
+    writing_direction = WRITING_DIRECTION_UNSPECIFIED
+    if 'dir' in word.attrib:
+        writing_direction = wdmap[word.attrib['dir']]
+    else:
+        writing_direction = paragraph_writing_direction
+
+    return rawtext, box, conf, x_fsize, writing_direction
 
-    return paragraphs
 
 def hocr_page_to_photo_data(hocr_page, minimum_page_area_pct=10):
     """
@@ -228,61 +392,64 @@ def hocr_page_to_photo_data(hocr_page, minimum_page_area_pct=10):
     # Get the actual boxes from the page
     photo_boxes = []
     for photo in hocr_page.findall('.//*[@class="ocr_photo"]'):
-        box = BBOX_REGEX.search(photo.attrib['title']).group(1).split()
-        box = [float(i) for i in box]
+        box = [float(i) for i in parse_title(photo.attrib['title']).bbox]
         photo_boxes.append(box)
 
-    # Helper function to determine if there are nested boxes
-    def box_contains_box(box_a, box_b):
-        return box_a[0] <= box_b[0] and box_a[1] <= box_b[1] \
-           and box_a[2] >= box_b[2] and box_a[3] >= box_b[3]
-
     # Clean up the box data a bit
-    cleaned_photo_boxes = list(photo_boxes)
     dim = hocr_page_get_dimensions(hocr_page)
     area_page = dim[0]*dim[1]
-    for box_a in photo_boxes:
+
+    # Nested boxes are redundant
+    nested = set(SpatialIndex(photo_boxes).contained_boxes())
+
+    cleaned_photo_boxes = []
+    for idx, box in enumerate(photo_boxes):
         # Image must cover at least minimum_page_area_pct of page
-        width, height = box_a[2]-box_a[0], box_a[3]-box_a[1]
+        width, height = box[2]-box[0], box[3]-box[1]
         area_box = width*height
         if area_box < area_page*(minimum_page_area_pct/100.):
-            try:
-                cleaned_photo_boxes.remove(box_a)
-                #print("Box %s is too small, removing" % (box_a))
-            except: # Already removed
-                pass
-
-        # Nested boxes are redundant
-        for box_b in photo_boxes:
-            if box_a == box_b:
-                continue
-            if box_contains_box(box_a, box_b):
-                try:
-                    cleaned_photo_boxes.remove(box_b)
-                    #print("Box %s is fully inside box %s, removing" % (box_b, box_a))
-                except: # Already removed
-                    pass
+            continue
+
+        if idx not in nested:
+            cleaned_photo_boxes.append(box)
 
     return cleaned_photo_boxes
 
 def get_title_attrs(title):
-    # Assume Tesseract generated hOCR, where every ';' has a space after it
-    sub_title = title.split('; ')
+    """
+    Returns the bounding box (list of 4 ints) and word confidence (int) from a
+    hOCR word title, either can be None if not present.
+    """
+    # Fast path for Tesseract generated hOCR, where every ';' has a space
+    # after it, other titles are handled by parse_title
     box = None
     conf = None
+    try:
+        for subt in title.split('; '):
+            if subt[0:7] == 'x_wconf':
+                conf = int(subt[8:])
+            elif subt[0:4] == 'bbox':
+                box = [int(i) for i in subt[5:].split()]
+    except ValueError:
+        box = None
 
-    for subt in sub_title:
-        if subt[0:7] == 'x_wconf':
-            conf = int(subt[8:])
-            continue
-        if subt[0:4] == 'bbox':
-            # TODO: use int()?
-            #box = [float(i) for i in subt[i + 5:].split()]
-            box = [int(i) for i in subt[5:].split()]
-            continue
+    if box is not None and len(box) == 4 and \
+            (conf is not None or 'x_wconf' not in title):
+        return box, conf
+
+    attrs = parse_title(title)
+
+    box = attrs.bbox
+    if box is not None:
+        box = list(box)
+
+    conf = attrs.x_wconf
+    if conf is not None:
+        conf = int(conf)
 
     return box, conf
 
+@stats.timed('hocr_page_to_word_data_fast', stats.count_word_data)
 def hocr_page_to_word_data_fast(hocr_page):
     """
     Parses a single hocr_page into word data.
@@ -314,54 +481,369 @@ def hocr_page_to_word_data_fast(hocr_page):
 
     has_ocrx_cinfo = 0
 
-    for par in hocr_page.findall('.//*[@class="ocr_par"]') + hocr_page.findall('.//*[@class="ocrx_block"]'):
-        paragraph_data = {'lines': []}
+    for par in hocr_page_get_paragraphs(hocr_page, fast=True):
+        paragraph_data, has_ocrx_cinfo = \
+                _hocr_paragraph_to_word_data_fast(par, has_ocrx_cinfo)
+        paragraphs.append(paragraph_data)
+
+    return paragraphs
+
 
-        # We assume that the direct children are all the lines
+def hocr_paragraphs_cinfo_state(paragraphs):
+    """
+    hocr_page_to_word_data_fast only looks for ocrx_cinfo elements in the words
+    of a page if the first word of the page has them. Returns the state that
+    results from that check, given the paragraph elements of a page as
+    returned by hocr_page_get_paragraphs(page, fast=True), so that individual
+    paragraphs can be parsed with hocr_paragraph_to_word_data_fast.
+    """
+    for par in paragraphs:
         for line in list(par):
-            line_data = {}
+            for word in line.iterfind('.//*[@class="ocrx_word"]'):
+                if word.find('.//*[@class="ocrx_cinfo"]') is not None:
+                    return 1
+                return 2
 
-            word_data = []
-            for word in line.findall('.//*[@class="ocrx_word"]'):
-                title = word.attrib['title']
+    return 0
 
-                box, conf = get_title_attrs(title)
 
-                rawtext = ''
-                wordbased = True
-                if has_ocrx_cinfo < 2:
-                    for char in word.findall('.//*[@class="ocrx_cinfo"]'):
-                        rawtext += char.text
-                        wordbased = False
-                        has_ocrx_cinfo = 1
+def hocr_paragraph_to_word_data_fast(par, has_ocrx_cinfo):
+    """
+    Parses a single paragraph element into word data, see
+    hocr_page_to_word_data_fast for the format.
+
+    Args:
 
-                if has_ocrx_cinfo == 0:
-                    has_ocrx_cinfo = 2
+    * par: a paragraph as returned by hocr_page_get_paragraphs(page, fast=True)
+    * has_ocrx_cinfo: as returned by hocr_paragraphs_cinfo_state
 
-                if wordbased:
-                    # Words may contains additional nodes like <em>
-                    while True:
-                        children = list(word)
-                        if len(children) == 0:
-                            break
+    Returns:
 
-                        if len(children) > 1:
-                            raise ValueError('Not character based but word has multiple children?')
+    A paragraph (dict) containing a list of lines, and each line containing a
+    list of words.
+    """
+    return _hocr_paragraph_to_word_data_fast(par, has_ocrx_cinfo)[0]
 
-                        word = children[0]
 
-                    rawtext = word.text
+def _hocr_paragraph_to_word_data_fast(par, has_ocrx_cinfo):
+    paragraph_data = {'lines': []}
 
-                    if word.text is None:
-                        raise ValueError('Word with no text value?')
+    # We assume that the direct children are all the lines
+    for line in list(par):
+        line_data = {}
 
-                word_data.append({'bbox': box, 'text': rawtext,
-                                  'confidence': conf})
+        word_data = []
+        for word in line.findall('.//*[@class="ocrx_word"]'):
+            title = word.attrib['title']
 
+            box, conf = get_title_attrs(title)
 
-            line_data['words'] = word_data
-            paragraph_data['lines'].append(line_data)
+            rawtext = ''
+            wordbased = True
+            if has_ocrx_cinfo < 2:
+                for char in word.findall('.//*[@class="ocrx_cinfo"]'):
+                    rawtext += char.text
+                    wordbased = False
+                    has_ocrx_cinfo = 1
 
-        paragraphs.append(paragraph_data)
+            if has_ocrx_cinfo == 0:
+                has_ocrx_cinfo = 2
 
-    return paragraphs
+            if wordbased:
+                # Words may contains additional nodes like <em>
+                while True:
+                    children = list(word)
+                    if len(children) == 0:
+                        break
+
+                    if len(children) > 1:
+                        raise ValueError('Not character based but word has multiple children?')
+
+                    word = children[0]
+
+                rawtext = word.text
+
+                if word.text is None:
+                    raise ValueError('Word with no text value?')
+
+            word_data.append({'bbox': box, 'text': rawtext,
+                              'confidence': conf})
+
+
+        line_data['words'] = word_data
+        paragraph_data['lines'].append(line_data)
+
+    return paragraph_data, has_ocrx_cinfo
+
+
+#: Amount of bytes fed to expat at a time by the streaming parsers
+EXPAT_READ_SIZE = 64 * 1024
+
+
+class WordDataParser:
+    """
+    expat handlers that turn a hOCR byte stream into word data (as returned by
+    hocr_page_to_word_data_fast), or into page text (as returned by
+    hocr_page_text), without ever building an ElementTree for a page.
+
+    Completed pages are appended to `pages`, consumers are expected to empty
+    that list between calls to the parser. The byte offsets of the start of
+    every page, and of the closing body tag, are appended to `page_bytes`
+    (like PageFinder in hocr.text does).
+
+    If `paragraph_offsets` is set (only supported together with `text_only`),
+    a list is appended to `page_paragraphs` for every page, with an entry
+    [text_length, xml_start, xml_end, cinfo_state] for every paragraph (in the
+    order of hocr_page_to_word_data_fast).
+    text_length is the length of the text of the paragraph (including the
+    newline), xml_start and xml_end are the byte offsets of the start tag and
+    of the end tag of the paragraph, and cinfo_state is the state to pass to
+    hocr_paragraph_to_word_data_fast to parse the paragraph on its own.
+    """
+    def __init__(self, current_parser, text_only=False,
+                 paragraph_offsets=False):
+        self.parser = current_parser
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+
+        self.text_only = text_only
+        self.pages = []
+        self.page_bytes = []
+
+        self.paragraph_offsets = paragraph_offsets
+        self.page_paragraphs = []
+        # [xml_start, xml_end, cinfo_state] of the paragraphs on the current
+        # page, and of the current paragraph
+        self.par_offsets = None
+        self.block_offsets = None
+        self.offsets = None
+
+        self.depth = 0
+        self.page_depth = None
+        self.par_depth = None
+        self.line_depth = None
+
+        # See hocr_page_to_word_data_fast
+        self.has_ocrx_cinfo = 0
+
+        self.pars = None
+        self.blocks = None
+        self.lines = None
+        self.words = None
+        self.word_title = None
+
+        # Nodes of the word currently being parsed, every node is a list of
+        # [text, child_count, first_child]
+        self.word_stack = None
+        self.word_node = None
+        self.cinfo_nodes = None
+
+    def start_element(self, name, attrs):
+        self.depth += 1
+
+        if self.page_depth is None:
+            if name == 'div' and attrs.get('class') == 'ocr_page':
+                self.page_depth = self.depth
+                self.page_bytes.append(self.parser.CurrentByteIndex)
+                self.has_ocrx_cinfo = 0
+                self.pars = []
+                self.blocks = []
+                self.par_offsets = []
+                self.block_offsets = []
+            return
+
+        if self.par_depth is None:
+            cls = attrs.get('class')
+            if cls == 'ocr_par' or cls == 'ocrx_block':
+                self.par_depth = self.depth
+                self.lines = []
+                if cls == 'ocr_par':
+                    self.pars.append(self.lines)
+                else:
+                    self.blocks.append(self.lines)
+
+                if self.paragraph_offsets:
+                    self.offsets = [self.parser.CurrentByteIndex, None,
+                                    self.has_ocrx_cinfo]
+                    if cls == 'ocr_par':
+                        self.par_offsets.append(self.offsets)
+                    else:
+                        self.block_offsets.append(self.offsets)
+            return
+
+        if self.line_depth is None:
+            # We assume that the direct children are all the lines
+            if self.depth == self.par_depth + 1:
+                self.line_depth = self.depth
+                self.words = []
+                self.lines.append(self.words)
+            return
+
+        if attrs.get('class') == 'ocrx_word':
+            self.word_title = attrs.get('title', '')
+            self.word_node = [None, 0, None]
+            self.word_stack = [self.word_node]
+            self.cinfo_nodes = []
+
+            # The word handlers take over until the word element is closed,
+            # this keeps the (frequent) character data callbacks out of the
+            # page structure handling.
+            self.parser.StartElementHandler = self.word_start_element
+            self.parser.EndElementHandler = self.word_end_element
+            self.parser.CharacterDataHandler = self.word_char_data
+
+    def end_element(self, name):
+        depth = self.depth
+        self.depth -= 1
+
+        if depth == self.line_depth:
+            self.line_depth = None
+        elif depth == self.par_depth:
+            self.par_depth = None
+            if self.paragraph_offsets:
+                self.offsets[1] = self.parser.CurrentByteIndex
+        elif depth == self.page_depth:
+            self.page_depth = None
+            self.end_page()
+        elif name == 'body':
+            self.page_bytes.append(self.parser.CurrentByteIndex)
+
+    def word_start_element(self, name, attrs):
+        node = [None, 0, None]
+        parent = self.word_stack[-1]
+        if parent[1] == 0:
+            parent[2] = node
+        parent[1] += 1
+        self.word_stack.append(node)
+
+        if attrs.get('class') == 'ocrx_cinfo':
+            self.cinfo_nodes.append(node)
+
+    def word_end_element(self, name):
+        self.word_stack.pop()
+        if not self.word_stack:
+            self.parser.StartElementHandler = self.start_element
+            self.parser.EndElementHandler = self.end_element
+            self.parser.CharacterDataHandler = None
+
+            self.depth -= 1
+            self.end_word()
+
+    def word_char_data(self, data):
+        node = self.word_stack[-1]
+        # Only text before the first child is part of the element text
+        if node[1] == 0:
+            if node[0] is None:
+                node[0] = data
+            else:
+                node[0] += data
+
+    def end_word(self):
+        wordbased = True
+        if self.has_ocrx_cinfo < 2 and self.cinfo_nodes:
+            rawtext = ''.join([node[0] for node in self.cinfo_nodes
+                               if node[0] is not None])
+            wordbased = False
+            self.has_ocrx_cinfo = 1
+
+        if self.has_ocrx_cinfo == 0:
+            self.has_ocrx_cinfo = 2
+
+        if wordbased:
+            # Words may contains additional nodes like <em>
+            node = self.word_node
+            while node[1]:
+                if node[1] > 1:
+                    raise ValueError('Not character based but word has multiple children?')
+                node = node[2]
+
+            rawtext = node[0]
+            if rawtext is None:
+                raise ValueError('Word with no text value?')
+
+        if self.text_only:
+            self.words.append(rawtext)
+        else:
+            box, conf = get_title_attrs(self.word_title)
+            self.words.append({'bbox': box, 'text': rawtext,
+                               'confidence': conf})
+
+        self.word_stack = None
+        self.word_node = None
+        self.cinfo_nodes = None
+
+    def end_page(self):
+        paragraphs = self.pars + self.blocks
+        self.pars = None
+        self.blocks = None
+
+        if self.text_only:
+            # Same as hocr_page_text: words are joined by a space per
+            # paragraph, every paragraph ends with a newline.
+            par_texts = []
+            for lines in paragraphs:
+                words = []
+                for line in lines:
+                    words += line
+                par_texts.append(' '.join(words) + '\n')
+
+            self.pages.append(''.join(par_texts))
+
+            if self.paragraph_offsets:
+                offsets = self.par_offsets + self.block_offsets
+                self.page_paragraphs.append(
+                        [[len(par_text), start, end, cinfo_state]
+                         for par_text, (start, end, cinfo_state)
+                         in zip(par_texts, offsets)])
+        else:
+            self.pages.append([{'lines': [{'words': words} for words in lines]}
+                               for lines in paragraphs])
+
+
+def _expat_page_iterator(fd_or_path, text_only):
+    p = xml.parsers.expat.ParserCreate()
+    h = WordDataParser(p, text_only=text_only)
+
+    return _expat_parse_pages(fd_or_path, p, h)
+
+
+def _expat_parse_pages(fd_or_path, p, h):
+    # Feeds the file to expat parser `p` with WordDataParser `h`, yielding
+    # pages as they are completed
+    fp = open_if_required(fd_or_path)
+    fp.seek(0)
+
+    while True:
+        data = fp.read(EXPAT_READ_SIZE)
+        p.Parse(data, not data)
+
+        if h.pages:
+            pages = h.pages
+            h.pages = []
+            for page in pages:
+                yield page
+
+        if not data:
+            break
+
+
+@stats.timed_iterator('hocr_word_data_iterator', stats.count_word_data)
+def hocr_word_data_iterator(fd_or_path):
+    """
+    Returns an iterator over the word data of every page in a (potentially
+    large) hOCR XML file. This is equivalent to calling
+    hocr_page_to_word_data_fast on every page returned by hocr_page_iterator,
+    but the pages are parsed straight from the byte stream using expat, no
+    ElementTree is built.
+
+    Args:
+
+    * fd_or_path: open file to operate on, or a path (str).
+
+    Returns:
+
+    * Iterator returning the word data of a page, see
+      hocr_page_to_word_data_fast.
+    """
+    return _expat_page_iterator(fd_or_path, False)
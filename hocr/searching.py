@@ -1,30 +1,70 @@
 import json
+import re
+import struct
+import sys
+from xml.parsers import expat
+from array import array
+from collections.abc import Sequence
 
 from xml.etree import ElementTree
 
-from .util import open_if_required
-from .parse import hocr_page_iterator, hocr_page_to_word_data_fast
-from .text import hocr_get_xml_page_offsets, hocr_get_plaintext_page_offsets, \
-        hocr_page_text_from_word_data, get_paragraph_hocr_words
+from . import stats
+from .util import open_if_required, mmap_if_possible
+from .parse import hocr_word_data_iterator, WordDataParser, \
+        hocr_paragraph_to_word_data_fast, _expat_parse_pages
+from .text import hocr_page_text_from_word_data, get_paragraph_hocr_words
 
 
-def hocr_get_page_lookup_table(fd_or_path):
+PARAGRAPH_TAG_NAME_REGEX = re.compile(rb'<([^\s/>]+)')
+
+
+@stats.timed('hocr_get_page_lookup_table',
+             lambda lookup_table: {'pages': len(lookup_table)})
+def hocr_get_page_lookup_table(fd_or_path, granularity='page'):
     """
     Create lookup table for a given hOCR document. This allows for quickly
     jumping to specific XML pages.
 
+    The text offsets (as hocr_get_plaintext_page_offsets returns them) and the
+    XML offsets (as hocr_get_xml_page_offsets returns them) are determined in
+    a single pass over the document.
+
     Args:
 
     * fd_or_path: file descriptor or filepath to the hOCR file
+    * (optional) granularity: 'page' or 'paragraph', the latter adds the
+      offsets of every paragraph to the entries
 
     Returns:
 
     Lookup table (list of a list) with each list entry:
 
     * [text_start_byte, text_end_byte, xml_start_byte, xml_end_byte]
+
+    With paragraph granularity, every entry has a fifth element: a list with
+    an entry for every paragraph of the page (in the order of
+    hocr_page_to_word_data_fast):
+
+    * [text_start_byte, text_end_byte, xml_start_byte, xml_end_byte,
+      cinfo_state]
+
+    The text range of a paragraph includes its trailing newline, the XML range
+    ends at the start of the end tag of the paragraph, see
+    hocr_lookup_paragraph_by_dat.
     """
-    text_ranges = hocr_get_plaintext_page_offsets(fd_or_path)
-    xml_ranges = hocr_get_xml_page_offsets(fd_or_path)
+    if granularity not in ('page', 'paragraph'):
+        raise ValueError('Unknown granularity: %s' % granularity)
+
+    p = expat.ParserCreate()
+    h = WordDataParser(p, text_only=True,
+                       paragraph_offsets=granularity == 'paragraph')
+
+    text_bytes = [0]
+    for page_text in _expat_parse_pages(fd_or_path, p, h):
+        text_bytes.append(text_bytes[-1] + len(page_text))
+
+    text_ranges = list(zip(text_bytes[:-1], text_bytes[1:]))
+    xml_ranges = list(zip(h.page_bytes[:-1], h.page_bytes[1:]))
 
     if len(text_ranges) != len(xml_ranges):
         # Perhaps use something other than ValueError
@@ -34,6 +74,17 @@ def hocr_get_page_lookup_table(fd_or_path):
     for text, xml in zip(text_ranges, xml_ranges):
         res.append((text[0], text[1], xml[0], xml[1]))
 
+    if granularity == 'paragraph':
+        for idx, paragraphs in enumerate(h.page_paragraphs):
+            text_start = res[idx][0]
+            paragraph_entries = []
+            for text_length, xml_start, xml_end, cinfo_state in paragraphs:
+                paragraph_entries.append((text_start, text_start + text_length,
+                                          xml_start, xml_end, cinfo_state))
+                text_start += text_length
+
+            res[idx] += (paragraph_entries,)
+
     return res
 
 def hocr_lookup_by_plaintext_offset(page_lookup_data, pos_bytes_plain):
@@ -48,11 +99,19 @@ def hocr_lookup_by_plaintext_offset(page_lookup_data, pos_bytes_plain):
       hocr_get_page_lookup_table.
     * pos_bytes_plain: Offset in plaintext of the hOCR file.
     """
-    for idx, dat in enumerate(page_lookup_data):
-        tstart, tend = dat[0:2]
-        xstart, xend = dat[2:4]
-
-        if tstart <= pos_bytes_plain < tend:
+    # Binary search for the last page that starts at or before the offset
+    lo, hi = 0, len(page_lookup_data)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if pos_bytes_plain < page_lookup_data[mid][0]:
+            hi = mid
+        else:
+            lo = mid + 1
+
+    idx = lo - 1
+    if idx >= 0:
+        dat = page_lookup_data[idx]
+        if dat[0] <= pos_bytes_plain < dat[1]:
             return idx, dat
 
     return None, None
@@ -76,6 +135,74 @@ def hocr_lookup_page_by_dat(fp, dat):
     return root
 
 
+def hocr_page_by_xml_range(fp, xstart, xend):
+    """
+    Get the XML for the hOCR page that starts at byte `xstart`, where `xend` is
+    the start of the next page (or the closing body tag), as found by
+    hocr_scan_page_bytes.
+
+    Unlike hocr_lookup_page_by_dat, the whitespace between the page and
+    whatever follows it is kept as the tail of the page, like pages returned by
+    hocr_page_iterator.
+
+    Args:
+
+    * fp: file pointer to hOCR file
+    * xstart: start byte of the page
+    * xend: start byte of whatever follows the page
+
+    Returns:
+
+    * hOCR page element
+    """
+    fp.seek(xstart)
+    xml = fp.read(xend-xstart)
+    root = ElementTree.fromstring(xml)
+
+    tail = xml[xml.rfind(b'>') + 1:]
+    if tail:
+        root.tail = tail.decode('utf-8')
+
+    return root
+
+
+def hocr_lookup_paragraph_by_dat(fp, dat):
+    """
+    Get the word data for the hOCR paragraph that corresponds to the
+    paragraph lookup data `dat` (see hocr_get_page_lookup_table), without
+    parsing the rest of the page.
+
+    Args:
+
+    * fp: file pointer to hOCR file
+    * `dat`: paragraph entry of a lookup table with paragraph granularity
+
+    Returns:
+
+    * Paragraph word data, as in hocr_page_to_word_data_fast
+    """
+    xstart, xend, cinfo_state = dat[2:5]
+
+    fp.seek(xstart)
+    xml = fp.read(xend-xstart)
+    return hocr_paragraph_bytes_to_word_data(xml, cinfo_state)
+
+
+def hocr_paragraph_bytes_to_word_data(xml, cinfo_state):
+    """
+    Parses the bytes of a paragraph (from the start of its start tag up to
+    its end tag, as stored in the paragraph entries of a lookup table) into
+    word data.
+    """
+    if not len(xml):
+        # Empty element (<p/>)
+        return {'lines': []}
+
+    name = PARAGRAPH_TAG_NAME_REGEX.match(xml).group(1)
+    par = ElementTree.fromstring(bytes(xml) + b'</' + name + b'>')
+    return hocr_paragraph_to_word_data_fast(par, cinfo_state)
+
+
 def hocr_lookup_page_by_plaintext_offset(fp, page_lookup_data, pos_bytes_plain):
     """
     Get the XML for a specific hOCR page that corresponds to the plaintext
@@ -92,9 +219,106 @@ def hocr_lookup_page_by_plaintext_offset(fp, page_lookup_data, pos_bytes_plain):
     return hocr_lookup_page_by_dat(fp, dat)
 
 
+#: Magic (including the format version) of binary lookup tables
+LOOKUP_TABLE_MAGIC = b'HOCRLUT1'
+_LOOKUP_TABLE_HEADER = struct.Struct('<8sQ')
+
+
+class LookupTable(Sequence):
+    """
+    Lookup table stored as four columns of integers, as loaded from a binary
+    lookup table. Entries are tuples of (text_start_byte, text_end_byte,
+    xml_start_byte, xml_end_byte).
+
+    The columns are available as `text_starts`, `text_ends`, `xml_starts` and
+    `xml_ends`. When loaded from a (little-endian) file, they are memoryviews
+    of a memory map of the file, which can be wrapped without copying, e.g.
+    with `numpy.frombuffer(table.text_starts, dtype='<i8')`.
+
+    Binary lookup tables consist of LOOKUP_TABLE_MAGIC, the amount of pages
+    (int64), and then the four columns of int64 values, all little-endian.
+    """
+    def __init__(self, text_starts, text_ends, xml_starts, xml_ends):
+        self.text_starts = text_starts
+        self.text_ends = text_ends
+        self.xml_starts = xml_starts
+        self.xml_ends = xml_ends
+
+    def __len__(self):
+        return len(self.text_starts)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        return (self.text_starts[idx], self.text_ends[idx],
+                self.xml_starts[idx], self.xml_ends[idx])
+
+    @classmethod
+    def from_entries(cls, lookup_table):
+        """
+        Create a LookupTable from a lookup table as returned by
+        hocr_get_page_lookup_table (or loaded from JSON).
+        """
+        columns = list(zip(*lookup_table)) or [()] * 4
+        return cls(*[array('q', column) for column in columns])
+
+    @classmethod
+    def from_buffer(cls, buf):
+        """
+        Create a LookupTable from a binary lookup table (bytes-like object).
+        The columns refer to `buf` directly on little-endian machines.
+        """
+        view = memoryview(buf)
+        if len(view) < _LOOKUP_TABLE_HEADER.size:
+            raise ValueError('Binary lookup table is truncated')
+
+        magic, count = _LOOKUP_TABLE_HEADER.unpack(
+                view[:_LOOKUP_TABLE_HEADER.size])
+        if magic != LOOKUP_TABLE_MAGIC:
+            raise ValueError('Not a binary lookup table')
+
+        size = count * 8
+        if len(view) != _LOOKUP_TABLE_HEADER.size + 4 * size:
+            raise ValueError('Binary lookup table has an unexpected size')
+
+        columns = []
+        for i in range(4):
+            start = _LOOKUP_TABLE_HEADER.size + i * size
+            column = view[start:start + size]
+
+            if sys.byteorder == 'little':
+                column = column.cast('q')
+            else:
+                column = array('q', column.tobytes())
+                column.byteswap()
+
+            columns.append(column)
+
+        return cls(*columns)
+
+    def to_bytes(self):
+        """
+        Returns the binary representation of the lookup table.
+        """
+        data = [_LOOKUP_TABLE_HEADER.pack(LOOKUP_TABLE_MAGIC, len(self))]
+        for column in (self.text_starts, self.text_ends, self.xml_starts,
+                       self.xml_ends):
+            column = array('q', column)
+            if sys.byteorder != 'little':
+                column.byteswap()
+            data.append(column.tobytes())
+
+        return b''.join(data)
+
+
+@stats.timed('hocr_load_lookup_table',
+             lambda lookup_table: {'pages': len(lookup_table)})
 def hocr_load_lookup_table(path):
     """
-    Load lookup table from JSON.
+    Load lookup table from JSON, or from the binary format written by
+    hocr_save_lookup_table_binary (detected automatically). Binary tables are
+    memory mapped if possible.
 
     Args:
 
@@ -105,9 +329,18 @@ def hocr_load_lookup_table(path):
     * Lookup table
     """
     fp = open_if_required(path)
-    return json.loads(fp.read().decode('utf-8'))
+    magic = fp.read(len(LOOKUP_TABLE_MAGIC))
+
+    if magic == LOOKUP_TABLE_MAGIC:
+        buf = mmap_if_possible(fp)
+        if buf is None:
+            buf = magic + fp.read()
+        return LookupTable.from_buffer(buf)
 
+    return json.loads((magic + fp.read()).decode('utf-8'))
 
+
+@stats.timed('hocr_save_lookup_table')
 def hocr_save_lookup_table(lookup_table, fd_or_path):
     """
     Save lookup table to JSON.
@@ -119,7 +352,29 @@ def hocr_save_lookup_table(lookup_table, fd_or_path):
     """
     if isinstance(fd_or_path, str):
         fd_or_path = open(fd_or_path, 'w+')
-    json.dump(lookup_table, fd_or_path)
+    json.dump([list(dat) for dat in lookup_table], fd_or_path)
+
+
+@stats.timed('hocr_save_lookup_table_binary')
+def hocr_save_lookup_table_binary(lookup_table, fd_or_path):
+    """
+    Save lookup table in the binary format (see LookupTable).
+
+    Args:
+
+    * lookup_table: Lookup table as returned by hocr_get_page_lookup_table or
+      hocr_load_lookup_table
+    * fd_or_path: File to save to (opened in binary mode)
+    """
+    if not isinstance(lookup_table, LookupTable):
+        if any(len(dat) > 4 for dat in lookup_table):
+            raise ValueError('Lookup tables with paragraph granularity can '
+                             'not be stored in the binary format')
+        lookup_table = LookupTable.from_entries(lookup_table)
+
+    if isinstance(fd_or_path, str):
+        fd_or_path = open(fd_or_path, 'wb+')
+    fd_or_path.write(lookup_table.to_bytes())
 
 
 def hocr_get_fts_text(fd_or_path):
@@ -136,8 +391,7 @@ def hocr_get_fts_text(fd_or_path):
     Repeatedly yields a tuple of (``str``, ``list of int``),
     page text and a list of word confidences on the page.
     """
-    for page in hocr_page_iterator(fd_or_path):
-        word_data = hocr_page_to_word_data_fast(page)
+    for word_data in hocr_word_data_iterator(fd_or_path):
         page_text = hocr_page_text_from_word_data(word_data)
 
         confs = []
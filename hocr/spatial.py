@@ -0,0 +1,257 @@
+"""
+Spatial index over the bounding boxes on a hOCR page.
+
+Finding the words (or photos) in a part of a page otherwise means checking the
+bounding box of every single word, which adds up on dense pages (newspapers
+can have tens of thousands of words per page) when many regions are queried.
+SpatialIndex puts the boxes in a uniform grid of cells, so that a query only
+has to look at the boxes in the cells that overlap the query.
+
+Boxes are sequences of four numbers (x0, y0, x1, y1), like the `bbox` of the
+word data returned by hocr_page_to_word_data or the rows of PageWords.bbox.
+"""
+
+from heapq import nsmallest
+from math import ceil, hypot, sqrt
+
+
+def box_contains_box(box_a, box_b):
+    """
+    Returns True if box `box_b` is entirely inside (or equal to) box `box_a`.
+    """
+    return box_a[0] <= box_b[0] and box_a[1] <= box_b[1] \
+        and box_a[2] >= box_b[2] and box_a[3] >= box_b[3]
+
+
+def box_intersects_box(box_a, box_b):
+    """
+    Returns True if boxes `box_a` and `box_b` overlap or touch.
+    """
+    return box_a[0] <= box_b[2] and box_b[0] <= box_a[2] \
+        and box_a[1] <= box_b[3] and box_b[1] <= box_a[3]
+
+
+def _box_distance(box, x, y):
+    dx = max(box[0] - x, 0, x - box[2])
+    dy = max(box[1] - y, 0, y - box[3])
+    return hypot(dx, dy)
+
+
+class SpatialIndex(object):
+    """
+    Uniform grid index over a list of bounding boxes.
+
+    Args:
+
+    * boxes: sequence of boxes (x0, y0, x1, y1), for example a list of word
+      bounding boxes or the PageWords.bbox array
+    * (optional) cell_size: width and height of a grid cell. If not
+      provided, it is picked so that there are about four boxes per cell.
+
+    All queries return indices into `boxes`, in ascending order unless noted
+    otherwise.
+    """
+    def __init__(self, boxes, cell_size=None):
+        if hasattr(boxes, 'tolist'):
+            boxes = boxes.tolist()
+        self.boxes = [tuple(box) for box in boxes]
+
+        if self.boxes:
+            self.x0 = min(box[0] for box in self.boxes)
+            self.y0 = min(box[1] for box in self.boxes)
+            x1 = max(box[2] for box in self.boxes)
+            y1 = max(box[3] for box in self.boxes)
+        else:
+            self.x0 = self.y0 = x1 = y1 = 0
+
+        if cell_size is None:
+            cell_size = 2 * sqrt((x1 - self.x0) * (y1 - self.y0) /
+                             max(len(self.boxes), 1))
+        self.cell_size = max(cell_size, 1)
+
+        self.columns = max(int(ceil((x1 - self.x0) / self.cell_size)), 1)
+        self.rows = max(int(ceil((y1 - self.y0) / self.cell_size)), 1)
+        self._cells = [[] for _ in range(self.columns * self.rows)]
+
+        cells = self._cells
+        columns = self.columns
+        for idx, box in enumerate(self.boxes):
+            c0, r0, c1, r1 = self._cell_range(box)
+            if c0 == c1 and r0 == r1:
+                cells[r0 * columns + c0].append(idx)
+                continue
+
+            for row in range(r0, r1 + 1):
+                offset = row * columns
+                for column in range(c0, c1 + 1):
+                    cells[offset + column].append(idx)
+
+    @classmethod
+    def from_word_data(cls, word_data, cell_size=None):
+        """
+        Create an index over the words in `word_data` (as returned by
+        hocr_page_to_word_data or hocr_page_to_word_data_fast). The position
+        of word `idx` in the word data is available as `index.words[idx]`, a
+        tuple of (paragraph index, line index, word index).
+        """
+        boxes = []
+        words = []
+        for par_idx, paragraph in enumerate(word_data):
+            for line_idx, line in enumerate(paragraph['lines']):
+                for word_idx, word in enumerate(line['words']):
+                    boxes.append(word['bbox'])
+                    words.append((par_idx, line_idx, word_idx))
+
+        index = cls(boxes, cell_size)
+        index.words = words
+        return index
+
+    def __len__(self):
+        return len(self.boxes)
+
+    def _cell(self, x, y):
+        column = int((x - self.x0) // self.cell_size)
+        row = int((y - self.y0) // self.cell_size)
+        return (min(max(column, 0), self.columns - 1),
+                min(max(row, 0), self.rows - 1))
+
+    def _cell_range(self, box):
+        c0, r0 = self._cell(min(box[0], box[2]), min(box[1], box[3]))
+        c1, r1 = self._cell(max(box[0], box[2]), max(box[1], box[3]))
+        return c0, r0, c1, r1
+
+    def _candidates(self, box):
+        c0, r0, c1, r1 = self._cell_range(box)
+        if c0 == c1 and r0 == r1:
+            return self._cells[r0 * self.columns + c0]
+
+        candidates = set()
+        for row in range(r0, r1 + 1):
+            offset = row * self.columns
+            for column in range(c0, c1 + 1):
+                candidates.update(self._cells[offset + column])
+        return candidates
+
+    def words_in_box(self, box):
+        """
+        Returns the indices of the boxes that are entirely inside `box`.
+        """
+        boxes = self.boxes
+        return sorted(idx for idx in self._candidates(box)
+                      if box_contains_box(box, boxes[idx]))
+
+    def words_intersecting(self, box):
+        """
+        Returns the indices of the boxes that overlap or touch `box`.
+        """
+        boxes = self.boxes
+        return sorted(idx for idx in self._candidates(box)
+                      if box_intersects_box(box, boxes[idx]))
+
+    def nearest_words(self, x, y, count=1):
+        """
+        Returns the indices of the `count` boxes closest to point (x, y),
+        closest first. The distance to a box is the distance to its closest
+        edge (0 for boxes that contain the point); ties are broken by index.
+        """
+        count = min(count, len(self.boxes))
+        if count <= 0:
+            return []
+
+        column, row = self._cell(x, y)
+        seen = set()
+        found = []
+
+        radius = 0
+        while True:
+            # Visit the ring of cells at distance `radius` from the start cell
+            for r in range(max(row - radius, 0),
+                           min(row + radius, self.rows - 1) + 1):
+                offset = r * self.columns
+                on_edge = abs(r - row) == radius
+                for c in range(max(column - radius, 0),
+                               min(column + radius, self.columns - 1) + 1):
+                    if not on_edge and abs(c - column) != radius:
+                        continue
+                    for idx in self._cells[offset + c]:
+                        if idx not in seen:
+                            seen.add(idx)
+                            distance = _box_distance(self.boxes[idx], x, y)
+                            found.append((distance, idx))
+
+            # Boxes not seen yet are at least radius * cell_size away (and
+            # could have a lower index at exactly that distance)
+            done = radius >= max(column, self.columns - 1 - column,
+                                 row, self.rows - 1 - row)
+            if len(found) >= count:
+                nearest = nsmallest(count, found)
+                if done or nearest[-1][0] < radius * self.cell_size:
+                    return [idx for _, idx in nearest]
+            elif done:
+                return [idx for _, idx in sorted(found)]
+
+            radius += 1
+
+    def contained_boxes(self):
+        """
+        Returns the indices of the boxes that are entirely inside another box
+        of the index. Boxes with exactly the same coordinates do not count as
+        containing each other.
+        """
+        boxes = self.boxes
+        contained = []
+        for idx, box in enumerate(boxes):
+            for other in self._candidates(box):
+                if boxes[other] != box and \
+                        box_contains_box(boxes[other], box):
+                    contained.append(idx)
+                    break
+        return contained
+
+
+def word_data_in_box(word_data, box, intersecting=False, index=None):
+    """
+    Crop word data to a region of the page.
+
+    Args:
+
+    * word_data: as returned by hocr_page_to_word_data or
+      hocr_page_to_word_data_fast
+    * box: the region (x0, y0, x1, y1)
+    * (optional) intersecting: also keep words that are only partially inside
+      the region
+    * (optional) index: SpatialIndex.from_word_data(word_data), to query the
+      same page repeatedly
+
+    Returns:
+
+    * Word data with only the words in the region. Lines and paragraphs
+      without any words left are removed. Can be passed to
+      hocr_page_text_from_word_data to get the text of the region.
+    """
+    if index is None:
+        index = SpatialIndex.from_word_data(word_data)
+
+    if intersecting:
+        keep = index.words_intersecting(box)
+    else:
+        keep = index.words_in_box(box)
+
+    cropped = []
+    last_par = last_line = None
+    for idx in keep:
+        par_idx, line_idx, word_idx = index.words[idx]
+        if par_idx != last_par:
+            paragraph = dict(word_data[par_idx])
+            paragraph['lines'] = []
+            cropped.append(paragraph)
+            last_par, last_line = par_idx, None
+        if line_idx != last_line:
+            line = dict(word_data[par_idx]['lines'][line_idx])
+            line['words'] = []
+            paragraph['lines'].append(line)
+            last_line = line_idx
+        line['words'].append(
+                word_data[par_idx]['lines'][line_idx]['words'][word_idx])
+
+    return cropped
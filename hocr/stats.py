@@ -0,0 +1,368 @@
+"""
+Timers and counters for the stages of the tools: reading (and decompressing)
+the input, parsing pages, extracting word data, creating lookup tables,
+serialising pages and writing the output.
+
+Collecting statistics is disabled by default, and is enabled by setting the
+`HOCR_STATS` environment variable, or with the `--stats` option of the tools.
+Both take the file to write the report to, or `-` (or `1`) for standard
+error. Setting `HOCR_STATS` to an empty string or `0` leaves collecting
+statistics disabled. The report is written as JSON when the process exits,
+with the `time` spent, the amount of `calls` and counters like the amount of
+`pages`, `words`, `chars` and `bytes` for every stage, and the total `time`
+since collecting statistics was enabled. The time of a stage includes the
+time of the stages it uses, e.g. the time of `hocr_page_iterator` includes
+the time spent reading the input.
+
+When disabled, the instrumented functions only check the `enabled` flag once
+per call.
+
+Statistics of worker processes (for tools with a `--jobs` option) are not
+collected.
+
+The jobs of hocr-batch are run inside a tool_run context, so the `--stats`
+option of a job only covers that job, and its report is written when the job
+ends (also in worker processes).
+"""
+
+import functools
+import io
+import os
+import sys
+import time
+
+
+STATS_ENVIRONMENT_VARIABLE = 'HOCR_STATS'
+
+#: Whether statistics are collected
+enabled = False
+
+_output = None
+_start_time = None
+# Whether a tool is run inside a tool_run context
+_in_tool_run = False
+# Stage name -> [calls, time, counters]
+_stages = {}
+
+
+def enable(output='-'):
+    """
+    Start collecting statistics, and write them to `output` (file name, or
+    `-` for standard error) when the process exits.
+    """
+    global enabled, _output, _start_time
+
+    if _in_tool_run:
+        # The report is written by tool_run
+        _start_time = time.perf_counter()
+    elif not enabled:
+        import atexit
+        atexit.register(write_report)
+        _start_time = time.perf_counter()
+
+    enabled = True
+    _output = output
+
+
+def reset():
+    """
+    Stop collecting statistics and discard the statistics collected so far.
+    """
+    global enabled, _output
+
+    enabled = False
+    _output = None
+    _stages.clear()
+
+
+class tool_run(object):
+    """
+    Context manager for running a tool in a process that runs other things
+    too, like a hocr-batch job. If the tool enables collecting statistics,
+    they only cover the tool run, and the report is written when the context
+    exits (with `sys.argv` of the tool) instead of when the process exits.
+    Statistics collected by the process itself are kept, and include the
+    stages of the tool run.
+    """
+    def __enter__(self):
+        global _output, _in_tool_run
+
+        self.saved = (enabled, _output, _start_time, dict(_stages))
+        _stages.clear()
+        _output = None
+        _in_tool_run = True
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        global enabled, _output, _start_time, _in_tool_run
+
+        _in_tool_run = False
+        try:
+            if _output is not None:
+                write_report()
+        finally:
+            run_stages = dict(_stages)
+            enabled, _output, _start_time, stages = self.saved
+            _stages.clear()
+            _stages.update(stages)
+
+            if enabled:
+                for stage, (calls, elapsed, counters) in run_stages.items():
+                    entry = _stages.setdefault(stage, [0, 0.0, {}])
+                    entry[0] += calls
+                    entry[1] += elapsed
+                    for name, value in counters.items():
+                        entry[2][name] = entry[2].get(name, 0) + value
+
+
+def add(stage, elapsed=0.0, counts=None):
+    """
+    Add a call of `stage` that took `elapsed` seconds, and add `counts`
+    (`dict`) to the counters of the stage.
+    """
+    try:
+        entry = _stages[stage]
+    except KeyError:
+        entry = _stages[stage] = [0, 0.0, {}]
+
+    entry[0] += 1
+    entry[1] += elapsed
+    if counts:
+        counters = entry[2]
+        for name, value in counts.items():
+            counters[name] = counters.get(name, 0) + value
+
+
+class timer(object):
+    """
+    Context manager that adds the time spent in its body to `stage`. Counts
+    can be added to `counts` (`dict`) in the body.
+    """
+    def __init__(self, stage, **counts):
+        self.stage = stage
+        self.counts = counts
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        add(self.stage, time.perf_counter() - self.start, self.counts)
+
+
+def timed(stage, counts=None):
+    """
+    Decorator that times every call of the function as `stage`, if
+    statistics are enabled.
+
+    Args:
+
+    * stage: name of the stage (`str`)
+    * counts: function that returns the counts (`dict`) for the value
+      returned by the function
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            add(stage, time.perf_counter() - start,
+                counts(result) if counts else None)
+            return result
+        return wrapper
+    return decorator
+
+
+def _timed_iterator(stage, iterator, counts):
+    iterator = iter(iterator)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            add(stage, time.perf_counter() - start)
+            return
+        add(stage, time.perf_counter() - start,
+            counts(item) if counts else None)
+        yield item
+
+
+def timed_iterator(stage, counts=None):
+    """
+    Decorator for functions that return an iterator, that times the
+    iteration as `stage`, if statistics are enabled. Every item counts as a
+    call.
+
+    Args:
+
+    * stage: name of the stage (`str`)
+    * counts: function that returns the counts (`dict`) for an item
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            return _timed_iterator(stage, func(*args, **kwargs), counts)
+        return wrapper
+    return decorator
+
+
+def count_page(page):
+    return {'pages': 1}
+
+
+def count_word_data(word_data):
+    """
+    Returns the counts for the word data of a page, as returned by
+    hocr_page_to_word_data.
+    """
+    words = chars = 0
+    for paragraph in word_data:
+        for line in paragraph['lines']:
+            words += len(line['words'])
+            for word in line['words']:
+                chars += len(word['text'])
+    return {'pages': 1, 'words': words, 'chars': chars}
+
+
+def count_text(text):
+    return {'pages': 1, 'chars': len(text)}
+
+
+class _TimedReader(io.BufferedReader):
+    def read(self, *args):
+        if not enabled:
+            return super().read(*args)
+        start = time.perf_counter()
+        data = super().read(*args)
+        add('read', time.perf_counter() - start, {'bytes': len(data)})
+        return data
+
+    def readinto(self, b):
+        if not enabled:
+            return super().readinto(b)
+        start = time.perf_counter()
+        n = super().readinto(b)
+        add('read', time.perf_counter() - start, {'bytes': n or 0})
+        return n
+
+
+def open_timed(path):
+    """
+    Open a (uncompressed) file for reading, timing the reads as stage
+    `read`.
+    """
+    return _TimedReader(io.FileIO(path, 'rb'))
+
+
+# See _get_timed_gzip_file_class
+_TimedGzipFile = None
+
+
+def _get_timed_gzip_file_class():
+    # The class is created on first use, to keep this module quick to import
+    global _TimedGzipFile
+
+    if _TimedGzipFile is None:
+        import gzip
+
+        class TimedGzipFile(gzip.GzipFile):
+            def read(self, *args):
+                if not enabled:
+                    return super().read(*args)
+                start = time.perf_counter()
+                data = super().read(*args)
+                add('gzip', time.perf_counter() - start,
+                    {'bytes': len(data)})
+                return data
+
+            def readinto(self, b):
+                if not enabled:
+                    return super().readinto(b)
+                start = time.perf_counter()
+                n = super().readinto(b)
+                add('gzip', time.perf_counter() - start, {'bytes': n or 0})
+                return n
+
+        _TimedGzipFile = TimedGzipFile
+
+    return _TimedGzipFile
+
+
+def open_timed_gzip(path):
+    """
+    Open a gzip compressed file for reading, timing the reads (including
+    decompression) as stage `gzip`.
+    """
+    return _get_timed_gzip_file_class()(path, 'rb')
+
+
+def report():
+    """
+    Returns the statistics collected so far (`dict`).
+    """
+    stages = {}
+    for stage, (calls, elapsed, counters) in sorted(_stages.items()):
+        stages[stage] = dict(calls=calls, time=elapsed, **counters)
+
+    result = {
+        'tool': os.path.basename(sys.argv[0]) if sys.argv else None,
+        'argv': sys.argv[1:],
+        'time': time.perf_counter() - _start_time if _start_time else 0.0,
+        'stages': stages,
+    }
+
+    try:
+        import resource
+    except ImportError:
+        pass
+    else:
+        # Kilobytes on Linux, bytes on macOS
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        result['peak_rss'] = peak_rss if sys.platform == 'darwin' \
+                else peak_rss * 1024
+
+    return result
+
+
+def write_report():
+    """
+    Write the report to the output given to enable.
+    """
+    if not enabled:
+        return
+
+    import json
+    data = json.dumps(report(), sort_keys=True) + '\n'
+    if _output in ('-', '1'):
+        sys.stderr.write(data)
+        sys.stderr.flush()
+    else:
+        with open(_output, 'w') as fp:
+            fp.write(data)
+
+
+def add_stats_argument(parser):
+    """
+    Add the `--stats` option to argparse parser `parser`, which enables
+    collecting statistics.
+    """
+    import argparse
+
+    class StatsAction(argparse.Action):
+        def __call__(self, parser, namespace, values, option_string=None):
+            setattr(namespace, self.dest, values)
+            enable(values)
+
+    parser.add_argument('--stats', help='Write timings and counters of the '
+                        'processing stages as JSON to FILE (default: '
+                        'standard error) on exit', nargs='?', const='-',
+                        default=None, metavar='FILE', action=StatsAction)
+
+
+if os.environ.get(STATS_ENVIRONMENT_VARIABLE, '') not in ('', '0'):
+    enable(os.environ[STATS_ENVIRONMENT_VARIABLE])
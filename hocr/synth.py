@@ -0,0 +1,369 @@
+"""
+Generation of synthetic hOCR documents, for load testing the tools on
+documents of any size without needing real items, see hocr-synth.
+
+The documents look like (character based) Tesseract output: every page has a
+number of text blocks with one paragraph each, made up of lines of words, and
+optionally a page number at the bottom. Some pages are plates with only
+photos (ocr_photo) on them, which do not have (or advance) a page number.
+
+Every page is generated from its own random number generator, seeded with the
+seed of the document and the index of the page, so a document is the same for
+the same seed and options.
+"""
+
+import random
+
+from .version import __version__
+from .writer import HocrWriter, escape_cdata
+
+
+SYNTH_PAGE_WIDTH = 2000
+SYNTH_PAGE_HEIGHT = 3000
+SYNTH_MARGIN = 100
+
+#: Width of a character in pixels
+SYNTH_CHAR_WIDTH = 25
+#: Space between words, in pixels
+SYNTH_WORD_SPACING = 20
+#: Maximum height of a line, in pixels
+SYNTH_LINE_HEIGHT = 50
+
+SYNTH_CONFIDENCE_DISTRIBUTIONS = ('normal', 'uniform', 'bimodal')
+
+#: Words the text is made of. Includes punctuation, accented characters and
+#: characters that have to be escaped.
+SYNTH_WORDS = (
+    'the', 'of', 'and', 'to', 'a', 'in', 'that', 'was', 'he', 'it', 'his',
+    'is', 'with', 'as', 'for', 'had', 'at', 'by', 'on', 'not', 'be', 'from',
+    'but', 'which', 'have', 'all', 'were', 'they', 'this', 'one', 'are',
+    'their', 'an', 'there', 'been', 'so', 'we', 'her', 'would', 'when',
+    'English', 'Illustrated', 'Magazine', 'London', 'December', 'Christmas',
+    'country', 'church', 'garden', 'village', 'river', 'morning', 'evening',
+    'picture', 'portrait', 'chapter', 'story', 'history', 'ancient', 'little',
+    'great', 'old', 'new', 'good', 'upon', 'into', 'very', 'more', 'could',
+    'said', 'made', 'time', 'house', 'water', 'himself', 'herself', 'without',
+    'naïve', 'café', 'Ünïcødé', 'façade', 'rôle', 'Müller', '"quoted"',
+    "it's", 'well-known', '&c.', 'A&B', '<sic>', '1884,', '(see', 'page)',
+    'said:', 'again;', 'end.', 'What?', 'Yes!',
+)
+
+#: Right-to-left words
+SYNTH_RTL_WORDS = (
+    'שלום', 'עולם', 'ספר', 'מים', 'בית', 'مرحبا', 'كتاب', 'مدينة', 'بيت',
+    'ماء',
+)
+
+# Character confidence is the word confidence plus one of these
+_CHAR_CONFIDENCE_JITTER = tuple((i * 37 % 41) - 20 for i in range(97))
+
+
+def _clip_confidence(conf):
+    return min(max(conf, 0), 100)
+
+
+class HocrSynthesizer(object):
+    """
+    Generates synthetic hOCR pages and documents.
+
+    Args:
+
+    * seed: seed of the random number generators (`int`)
+    * words_per_page: amount of words on a page with text, not counting the
+      page number
+    * words_per_paragraph: amount of words per paragraph (text block)
+    * chars: write the characters of every word in ocrx_cinfo elements (like
+      Tesseract character based hOCR), if False, only write words.
+    * confidence: distribution of the word confidences, `normal` (around
+      `confidence_mean`, with standard deviation `confidence_stddev`),
+      `uniform` (anywhere from 0 to 100) or `bimodal` (like `normal`, but
+      with a fifth of the words around 20).
+    * confidence_mean: see `confidence`
+    * confidence_stddev: see `confidence`
+    * rtl_fraction: fraction of the words that are right-to-left words
+    * photo_fraction: fraction of the pages that are plates, with only photos
+      on them
+    * page_number_start: page number of the first page (that is not a plate),
+      None for no page numbers.
+    * page_number_fraction: fraction of the pages with a page number that
+      show it, the other pages are numbered but do not show it (like page
+      numbers OCR missed).
+    """
+    def __init__(self, seed=0, words_per_page=300, words_per_paragraph=60,
+                 chars=True, confidence='normal', confidence_mean=85,
+                 confidence_stddev=10, rtl_fraction=0.02, photo_fraction=0.05,
+                 page_number_start=1, page_number_fraction=0.95):
+        if confidence not in SYNTH_CONFIDENCE_DISTRIBUTIONS:
+            raise ValueError('Unknown confidence distribution: %r' %
+                             confidence)
+        if words_per_page < 0 or words_per_paragraph < 1:
+            raise ValueError('Invalid amount of words')
+
+        self.seed = seed
+        self.words_per_page = words_per_page
+        self.words_per_paragraph = words_per_paragraph
+        self.chars = chars
+        self.confidence = confidence
+        self.confidence_mean = confidence_mean
+        self.confidence_stddev = confidence_stddev
+        self.rtl_fraction = rtl_fraction
+        self.photo_fraction = photo_fraction
+        self.page_number_start = page_number_start
+        self.page_number_fraction = page_number_fraction
+
+    def _random(self, page_idx):
+        return random.Random('%d:%d' % (self.seed, page_idx))
+
+    def is_plate(self, page_idx):
+        """
+        Returns whether page `page_idx` is a plate (has only photos).
+        """
+        if not self.photo_fraction:
+            return False
+        return self._random(page_idx).random() < self.photo_fraction
+
+    def header(self):
+        """
+        Returns the header of a document (`bytes`), up to and including the
+        `<body>` tag.
+        """
+        return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"\n'
+                '    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">\n'
+                ' <head>\n'
+                '  <title></title>\n'
+                '  <meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+                '  <meta name=\'ocr-system\' content=\'hocr-synth %s\' />\n'
+                '  <meta name=\'ocr-capabilities\' content=\'ocr_page ocr_carea ocr_par ocr_line ocrx_word%s\'/>\n'
+                ' </head>\n'
+                ' <body>\n' % (__version__,
+                               ' ocrx_cinfo' if self.chars else '')
+                ).encode('utf-8')
+
+    def footer(self):
+        """
+        Returns the footer of a document (`bytes`), starting with the
+        `</body>` tag.
+        """
+        return b' </body>\n</html>\n'
+
+    def _word_confidence(self, rng):
+        if self.confidence == 'uniform':
+            return rng.randint(0, 100)
+        if self.confidence == 'bimodal' and rng.random() < 0.2:
+            return int(_clip_confidence(rng.gauss(20, 10)))
+        return int(_clip_confidence(rng.gauss(self.confidence_mean,
+                                              self.confidence_stddev)))
+
+    def _word(self, rng, word_id, text, x, y, line_height, conf, rtl=False):
+        width = len(text) * SYNTH_CHAR_WIDTH
+        out = ['      <span class="ocrx_word" id="%s" title="bbox %d %d %d %d; '
+               'x_wconf %d; x_fsize %d"%s>' % (
+                   word_id, x, y, x + width, y + line_height, conf,
+                   rng.randint(8, 46), ' dir="rtl"' if rtl else '')]
+
+        if self.chars:
+            jitter = rng.randrange(len(_CHAR_CONFIDENCE_JITTER))
+            for idx, char in enumerate(text):
+                char_x = x + idx * SYNTH_CHAR_WIDTH
+                char_conf = _clip_confidence(conf + _CHAR_CONFIDENCE_JITTER[
+                        (jitter + idx) % len(_CHAR_CONFIDENCE_JITTER)] +
+                        (idx * 0.3183))
+                out.append('<span class="ocrx_cinfo" title="x_bboxes %d %d %d '
+                           '%d; x_conf %.4f">%s</span>' % (
+                               char_x, y, char_x + SYNTH_CHAR_WIDTH,
+                               y + line_height, char_conf,
+                               escape_cdata(char)))
+        else:
+            out.append(escape_cdata(text))
+
+        out.append('</span>\n')
+        return ''.join(out)
+
+    def _line(self, line_id, y, line_height, words, line_class='ocr_line'):
+        # `words` is a list of (x, width, serialised word)
+        right = words[-1][0] + words[-1][1] if words else SYNTH_MARGIN
+        return ('     <span class="%s" id="%s" title="bbox %d %d %d %d; '
+                'baseline 0 -%d; x_size %d; x_descenders %d; '
+                'x_ascenders %d">\n%s     </span>\n' % (
+                    line_class, line_id, SYNTH_MARGIN, y, right,
+                    y + line_height, line_height // 5, line_height,
+                    line_height // 5, line_height // 4,
+                    ''.join(word for _, _, word in words)))
+
+    def _layout(self, rng):
+        # Returns the paragraphs of the page, as lists of lines, which are
+        # lists of (text, rtl)
+        max_width = SYNTH_PAGE_WIDTH - 2 * SYNTH_MARGIN
+
+        paragraphs = []
+        remaining = self.words_per_page
+        while remaining > 0:
+            count = min(remaining, self.words_per_paragraph)
+            remaining -= count
+
+            lines = [[]]
+            width = 0
+            for _ in range(count):
+                if self.rtl_fraction and rng.random() < self.rtl_fraction:
+                    word = (rng.choice(SYNTH_RTL_WORDS), True)
+                else:
+                    word = (rng.choice(SYNTH_WORDS), False)
+
+                word_width = len(word[0]) * SYNTH_CHAR_WIDTH
+                if lines[-1] and width + word_width > max_width:
+                    lines.append([])
+                    width = 0
+                lines[-1].append(word)
+                width += word_width + SYNTH_WORD_SPACING
+            paragraphs.append(lines)
+
+        return paragraphs
+
+    def page(self, page_idx, page_number=None):
+        """
+        Generate a page.
+
+        Args:
+
+        * page_idx: index of the page in the document (zero based)
+        * page_number: page number shown on the page, None for no page number
+
+        Returns:
+
+        * The page (`bytes`, UTF-8 encoded), an ocr_page div followed by a
+          newline
+        """
+        rng = self._random(page_idx)
+        plate = self.photo_fraction and rng.random() < self.photo_fraction
+
+        out = ['<div class="ocr_page" id="page_%d" title="image &quot;'
+               'p%d.png&quot;; bbox 0 0 %d %d; ppageno %d; scan_res 300 300">'
+               '\n' % (page_idx + 1, page_idx, SYNTH_PAGE_WIDTH,
+                       SYNTH_PAGE_HEIGHT, page_idx)]
+
+        if plate:
+            for photo_idx in range(rng.randint(1, 3)):
+                left = rng.randint(SYNTH_MARGIN, SYNTH_PAGE_WIDTH // 2)
+                top = rng.randint(SYNTH_MARGIN, SYNTH_PAGE_HEIGHT // 2)
+                out.append('   <div class="ocr_photo" id="photo_%d_%d" '
+                           'title="bbox %d %d %d %d"></div>\n' % (
+                               page_idx, photo_idx, left, top,
+                               rng.randint(left + 1, SYNTH_PAGE_WIDTH -
+                                           SYNTH_MARGIN),
+                               rng.randint(top + 1, SYNTH_PAGE_HEIGHT -
+                                           SYNTH_MARGIN)))
+            out.append('  </div>\n')
+            return ''.join(out).encode('utf-8')
+
+        paragraphs = self._layout(rng)
+
+        # Scale the lines so that all of them (and the gaps between the
+        # paragraphs and the page number) fit on the page
+        line_count = sum(len(lines) for lines in paragraphs)
+        available = SYNTH_PAGE_HEIGHT - 2 * SYNTH_MARGIN
+        pitch = min(SYNTH_LINE_HEIGHT + 10,
+                    available // max(line_count + len(paragraphs) + 2, 1))
+        line_height = max(pitch - pitch // 6, 1)
+
+        y = SYNTH_MARGIN
+        for par_idx, lines in enumerate(paragraphs):
+            top = y
+            par = []
+            for line_idx, line in enumerate(lines):
+                x = SYNTH_MARGIN
+                words = []
+                for word_idx, (text, rtl) in enumerate(line):
+                    word_id = 'word_%d_%d_%d_%d' % (page_idx, par_idx,
+                                                    line_idx, word_idx)
+                    word = self._word(rng, word_id, text, x, y, line_height,
+                                      self._word_confidence(rng), rtl)
+                    width = len(text) * SYNTH_CHAR_WIDTH
+                    words.append((x, width, word))
+                    x += width + SYNTH_WORD_SPACING
+                par.append(self._line('line_%d_%d_%d' % (page_idx, par_idx,
+                                                         line_idx),
+                                      y, line_height, words))
+                y += pitch
+            bbox = '%d %d %d %d' % (SYNTH_MARGIN, top,
+                                    SYNTH_PAGE_WIDTH - SYNTH_MARGIN, y)
+            out.append('   <div class="ocr_carea" id="block_%d_%d" '
+                       'title="bbox %s">\n'
+                       '    <p class="ocr_par" id="par_%d_%d" lang="eng" '
+                       'title="bbox %s">\n%s    </p>\n   </div>\n' % (
+                           page_idx, par_idx, bbox, page_idx, par_idx, bbox,
+                           ''.join(par)))
+            y += pitch
+
+        if page_number is not None:
+            text = str(page_number)
+            y = SYNTH_PAGE_HEIGHT - SYNTH_MARGIN - line_height
+            x = (SYNTH_PAGE_WIDTH - len(text) * SYNTH_CHAR_WIDTH) // 2
+            word = self._word(rng, 'word_%d_pageno' % page_idx, text, x, y,
+                              line_height, int(_clip_confidence(
+                                  rng.gauss(90, 5))))
+            line = self._line('line_%d_pageno' % page_idx, y, line_height,
+                              [(x, len(text) * SYNTH_CHAR_WIDTH, word)],
+                              'ocr_header')
+            bbox = '%d %d %d %d' % (x, y, x + len(text) * SYNTH_CHAR_WIDTH,
+                                    y + line_height)
+            out.append('   <div class="ocr_carea" id="block_%d_pageno" '
+                       'title="bbox %s">\n'
+                       '    <p class="ocr_par" id="par_%d_pageno" lang="eng" '
+                       'title="bbox %s">\n%s    </p>\n   </div>\n' % (
+                           page_idx, bbox, page_idx, bbox, line))
+
+        out.append('  </div>\n')
+        return ''.join(out).encode('utf-8')
+
+    def pages(self, count):
+        """
+        Generate the pages of a document.
+
+        Args:
+
+        * count: amount of pages
+
+        Returns:
+
+        * Iterator over the pages (`bytes`), see `page`
+        """
+        page_number = self.page_number_start
+        for page_idx in range(count):
+            if self.is_plate(page_idx):
+                yield self.page(page_idx)
+                continue
+
+            shown = None
+            if page_number is not None:
+                rng = self._random(-1 - page_idx)
+                if rng.random() < self.page_number_fraction:
+                    shown = page_number
+                page_number += 1
+            yield self.page(page_idx, shown)
+
+    def write(self, out, count):
+        """
+        Write a document with `count` pages to binary file `out`.
+        """
+        with HocrWriter(out, self.header(), self.footer(),
+                        indent=b'  ') as writer:
+            for page in self.pages(count):
+                writer.write_page_bytes(page)
+
+
+def hocr_synth_pages(count, seed=0, **kwargs):
+    """
+    Generate synthetic hOCR pages, see HocrSynthesizer for the arguments.
+
+    Args:
+
+    * count: amount of pages
+    * seed: seed of the random number generators
+
+    Returns:
+
+    * Iterator over the pages (`bytes`)
+    """
+    return HocrSynthesizer(seed, **kwargs).pages(count)
@@ -1,7 +1,10 @@
+import re
 import xml.parsers.expat
+from bisect import bisect_right
 
-from .util import open_if_required
-from .parse import hocr_page_to_word_data_fast, hocr_page_iterator
+from . import stats
+from .util import open_if_required, mmap_if_possible
+from .parse import hocr_page_to_word_data_fast, _expat_page_iterator
 
 
 def hocr_paragraph_text(paragraph):
@@ -81,6 +84,106 @@ def hocr_page_text(page):
     return hocr_page_text_from_word_data(word_data)
 
 
+@stats.timed_iterator('hocr_page_text_iterator', stats.count_text)
+def hocr_page_text_iterator(fd_or_path):
+    """
+    Returns an iterator over the text of every page in a (potentially large)
+    hOCR XML file. The text is the same as returned by hocr_page_text, but the
+    pages are parsed straight from the byte stream using expat, no ElementTree
+    is built.
+
+    Args:
+
+    * fd_or_path: open file to operate on, or a path (str).
+
+    Returns:
+
+    * Iterator returning page contents (`str`)
+    """
+    return _expat_page_iterator(fd_or_path, True)
+
+
+class ParagraphTextIndex(object):
+    """
+    Text offsets of the paragraphs of a page, and of the words in them, to
+    find the paragraph (or words) at a text offset with a binary search.
+
+    Offsets are relative to the start of the page text (as hocr_page_text
+    returns it), where every paragraph is followed by a newline. Paragraphs
+    are only parsed (and their text built) as far as needed to find an
+    offset.
+
+    Args:
+
+    * paragraphs: sequence of paragraphs (word data) of the page, like
+      HocrPageView.paragraphs
+    """
+    def __init__(self, paragraphs):
+        self.paragraphs = paragraphs
+        #: Text of the paragraphs indexed so far, see hocr_paragraph_text
+        self.texts = []
+        #: Offset of the end of every paragraph indexed so far, including its
+        #: newline
+        self.ends = []
+        self._word_offsets = {}
+
+    def _extend(self):
+        text = hocr_paragraph_text(self.paragraphs[len(self.texts)])
+        self.texts.append(text)
+        self.ends.append((self.ends[-1] if self.ends else 0) + len(text) + 1)
+
+    def find(self, offset):
+        """
+        Returns the index of the paragraph that contains text offset `offset`,
+        or None if the offset is past the end of the page.
+        """
+        while not self.ends or self.ends[-1] <= offset:
+            if len(self.texts) >= len(self.paragraphs):
+                return None
+            self._extend()
+
+        return bisect_right(self.ends, offset)
+
+    def text(self, idx):
+        """
+        Returns the text of paragraph `idx`, see hocr_paragraph_text.
+        """
+        while len(self.texts) <= idx:
+            self._extend()
+        return self.texts[idx]
+
+    def word_offsets(self, idx):
+        """
+        Returns the words of paragraph `idx` (see get_paragraph_hocr_words),
+        and the start and end offsets of every word in the paragraph text, as
+        a tuple of three lists.
+        """
+        offsets = self._word_offsets.get(idx)
+        if offsets is None:
+            words = get_paragraph_hocr_words(self.paragraphs[idx])
+            offsets = (words,) + get_word_offsets(words)
+            self._word_offsets[idx] = offsets
+        return offsets
+
+
+def get_word_offsets(words):
+    """
+    Returns the start and end offsets of `words` in the text of their
+    paragraph (words are separated by a single space), as a tuple of two
+    lists.
+    """
+    starts = []
+    ends = []
+    offset = 0
+    for word in words:
+        starts.append(offset)
+        offset += len(word['text'])
+        ends.append(offset)
+        # Add + 1 for the space after a word
+        offset += 1
+    return starts, ends
+
+
 def get_paragraph_hocr_words(paragraph):
     """
     Find all the words in a hOCR paragraph.
@@ -120,12 +223,151 @@ class PageFinder:
             self.page_bytes.append(self.parser.CurrentByteIndex)
 
 
+DIV_START_TAG_REGEX = re.compile(rb'<div((?:\s+[^\s=/>]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*/?>')
+ATTRIBUTE_REGEX = re.compile(rb'([^\s=/>]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\')')
+
+#: Amount of bytes read at a time when scanning streams that can't be mmap'd
+PAGE_SCAN_READ_SIZE = 1024 * 1024
+
+
+class UnusualLayoutError(ValueError):
+    """
+    Raised by hocr_scan_page_bytes when the document can not reliably be
+    scanned without parsing it.
+    """
+
+
+def _scan_chunks(fp):
+    # Yields (data, offset of data in the file, end of the part of data that is
+    # complete, final)
+    mm = mmap_if_possible(fp)
+    if mm is not None:
+        with mm:
+            yield mm, 0, len(mm), True
+        return
+
+    fp.seek(0)
+    offset = 0
+    data = b''
+    while True:
+        chunk = fp.read(PAGE_SCAN_READ_SIZE)
+        data += chunk
+        if not chunk:
+            yield data, offset, len(data), True
+            return
+
+        # Markup can not contain a '<', so everything before the last '<' is
+        # complete
+        end = data.rfind(b'<')
+        if end <= 0:
+            continue
+
+        yield data, offset, end, False
+
+        offset += end
+        data = data[end:]
+
+
+def hocr_scan_page_bytes(fd_or_path):
+    """
+    Finds the bytes where pages start, and the final body segment to denote the
+    end of the last page, by scanning the raw bytes of a hOCR file rather than
+    parsing it. Plain files are mmap'd.
+
+    The scanner only understands the layout that hOCR producers generate
+    (pages are `div` elements with a `class` of `ocr_page`). It raises
+    UnusualLayoutError if the document contains comments or CDATA sections,
+    'ocr_page' anywhere but in the class attribute of a page, or not exactly
+    one closing body tag. Use hocr_get_xml_page_offsets for a version that
+    falls back to a parse.
+
+    Args:
+
+    * fd_or_path: hOCR file to operate on, or a path (str).
+
+    Returns:
+
+    * Iterator over byte offsets, yielding the start of every page and then the
+      start of the closing body tag.
+    """
+    fp = open_if_required(fd_or_path)
+
+    in_body = False
+    body_end = None
+
+    for data, offset, end, final in _scan_chunks(fp):
+        pos = 0
+        if not in_body:
+            pos = data.find(b'<body', 0, end)
+            if pos == -1:
+                if final:
+                    raise UnusualLayoutError('No body element found')
+                continue
+            in_body = True
+
+        # Comments and CDATA sections can contain markup that is not actually
+        # part of the document
+        if data.find(b'<!--', pos, end) != -1 or \
+                data.find(b'<![CDATA[', pos, end) != -1:
+            raise UnusualLayoutError('Comment or CDATA section found')
+
+        page_bytes = []
+
+        idx = data.find(b'ocr_page', pos, end)
+        while idx != -1:
+            # Every occurrence of ocr_page must be the class of a div
+            tag_start = data.rfind(b'<', pos, idx)
+            tag = None
+            if tag_start != -1:
+                tag = DIV_START_TAG_REGEX.match(data, tag_start)
+
+            if tag is None or tag.end() <= idx:
+                raise UnusualLayoutError('ocr_page found outside of a div '
+                                         'at byte %d' % (offset + idx))
+
+            classes = [attr.group(2) if attr.group(2) is not None
+                       else attr.group(3)
+                       for attr in ATTRIBUTE_REGEX.finditer(tag.group(1))
+                       if attr.group(1) == b'class']
+            if classes != [b'ocr_page'] or \
+                    tag.group(1).count(b'ocr_page') != 1:
+                raise UnusualLayoutError('Unexpected page element at byte %d'
+                                         % (offset + tag_start))
+
+            page_bytes.append(offset + tag_start)
+            idx = data.find(b'ocr_page', tag.end(), end)
+
+        idx = data.find(b'</body', pos, end)
+        while idx != -1:
+            if body_end is not None:
+                raise UnusualLayoutError('Multiple closing body tags')
+            body_end = offset + idx
+            idx = data.find(b'</body', idx + 1, end)
+
+        if page_bytes and body_end is not None and page_bytes[-1] > body_end:
+            raise UnusualLayoutError('Page found after the closing body tag')
+
+        for page_byte in page_bytes:
+            yield page_byte
+
+        if final:
+            if body_end is None:
+                raise UnusualLayoutError('No closing body tag found')
+
+            yield body_end
+
+
+@stats.timed('hocr_get_xml_page_offsets',
+             lambda offsets: {'pages': len(offsets)})
 def hocr_get_xml_page_offsets(fd_or_path):
     """
     Builds a list of start and end bytes for each ocr_page element in the XML
     file.  This can be used to construct a "lookup" table, together with
     hocr_get_plaintext_page_offsets.
 
+    The page boundaries are found with hocr_scan_page_bytes, falling back to
+    parsing the document with expat if the document layout is unusual.
+
     Args:
 
     * fd_or_path: hOCR file to operate on, or a path (str).
@@ -135,13 +377,18 @@ def hocr_get_xml_page_offsets(fd_or_path):
     element in the XML file.
     """
     xml_file = open_if_required(fd_or_path)
-    xml_file.seek(0)
 
-    p = xml.parsers.expat.ParserCreate()
-    h = PageFinder(p)
-    p.ParseFile(xml_file)
+    try:
+        page_bytes = list(hocr_scan_page_bytes(xml_file))
+    except UnusualLayoutError:
+        xml_file.seek(0)
 
-    page_boundaries = list(zip(h.page_bytes[:-1], h.page_bytes[1:]))
+        p = xml.parsers.expat.ParserCreate()
+        h = PageFinder(p)
+        p.ParseFile(xml_file)
+        page_bytes = h.page_bytes
+
+    page_boundaries = list(zip(page_bytes[:-1], page_bytes[1:]))
 
     return page_boundaries
 
@@ -162,15 +409,12 @@ def hocr_get_plaintext_page_offsets(fd_or_path):
     a hOCR file. The start and ends bytes point to the position of the text as
     extracted from the page in the XML file.
     """
-    page_it = hocr_page_iterator(fd_or_path)
-
     page_bytes = []
     cursor = 0
 
     page_bytes.append(0)
 
-    for page in page_it:
-        page_text = hocr_page_text(page)
+    for page_text in hocr_page_text_iterator(fd_or_path):
         cursor += len(page_text)
         page_bytes.append(cursor)
 
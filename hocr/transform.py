@@ -0,0 +1,196 @@
+"""
+Streaming transformations of hOCR documents.
+
+The transformations here rewrite a hOCR document straight from the expat
+events of the input, without building an ElementTree for (a page of) the
+document, so they run in constant memory, regardless of page size.
+"""
+
+import xml.parsers.expat
+
+from . import stats
+from .util import open_if_required, get_header_footer, \
+        register_and_nuke_xhtml_namespace
+from .writer import escape_cdata, escape_attrib
+
+
+#: Amount of bytes read from the input at a time
+TRANSFORM_READ_SIZE = 64 * 1024
+
+#: Amount of characters of output that is collected before it is written
+TRANSFORM_WRITE_SIZE = 64 * 1024
+
+
+def _start_tag(name, attrs):
+    # The attributes are in document order, like in ElementTree
+    tag = '<' + name
+    for key, value in attrs.items():
+        if key == 'xmlns' or key.startswith('xmlns:'):
+            continue
+        tag += ' %s="%s"' % (key, escape_attrib(value))
+    return tag + '>'
+
+
+class CharFolder:
+    """
+    expat handlers that write the pages of a character-based hOCR document
+    (with ocrx_cinfo elements) as a word-based hOCR document: the ocrx_cinfo
+    elements in every ocrx_word are replaced by their combined text. Words
+    without ocrx_cinfo elements are written as they are.
+
+    Every page is written (UTF-8 encoded) to `out`, preceded by a space, in
+    the same way ElementTree would serialise it. Anything outside of the pages
+    is not written.
+    """
+    def __init__(self, current_parser, out):
+        self.parser = current_parser
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self.start_element
+        self.parser.EndElementHandler = self.end_element
+        self.parser.CharacterDataHandler = self.character_data
+
+        self.out = out
+        self.pieces = []
+        self.size = 0
+
+        self.depth = 0
+        self.page_depth = None
+        self.in_tail = False
+
+        # Start tag, content and text of the ocrx_cinfo elements of the word
+        # that is being parsed
+        self.word_depth = None
+        self.word_start = None
+        self.word_pieces = None
+        self.word_chars = None
+        self.char_depth = None
+        self.char_text_done = False
+
+    def write(self, s):
+        self.pieces.append(s)
+        self.size += len(s)
+        if self.size > TRANSFORM_WRITE_SIZE:
+            self.flush()
+
+    def flush(self):
+        self.out.write(''.join(self.pieces).encode('utf-8'))
+        self.pieces = []
+        self.size = 0
+
+    def start_element(self, name, attrs):
+        self.depth += 1
+        self.in_tail = False
+
+        if self.page_depth is None:
+            if name == 'div' and attrs.get('class') == 'ocr_page':
+                self.page_depth = self.depth
+                self.write(' ' + _start_tag(name, attrs))
+            return
+
+        if self.word_depth is None:
+            if attrs.get('class') == 'ocrx_word':
+                self.word_depth = self.depth
+                self.word_start = _start_tag(name, attrs)
+                self.word_pieces = []
+                self.word_chars = None
+            else:
+                self.write(_start_tag(name, attrs))
+            return
+
+        if self.depth == self.word_depth + 1 and \
+                attrs.get('class') == 'ocrx_cinfo':
+            self.char_depth = self.depth
+            self.char_text_done = False
+            # The content of the word is replaced, stop collecting it
+            self.word_chars = self.word_chars or []
+            self.word_pieces = None
+        elif self.char_depth is not None and \
+                self.depth == self.char_depth + 1:
+            self.char_text_done = True
+
+        if self.word_pieces is not None:
+            self.word_pieces.append(_start_tag(name, attrs))
+
+    def end_element(self, name):
+        depth = self.depth
+        self.depth -= 1
+
+        if self.page_depth is None:
+            self.in_tail = False
+            return
+
+        if self.word_depth is not None:
+            if depth == self.char_depth:
+                self.char_depth = None
+
+            if depth != self.word_depth:
+                if self.word_pieces is not None:
+                    self.word_pieces.append('</' + name + '>')
+                return
+
+            self.word_depth = None
+            if self.word_chars is None:
+                self.write(self.word_start + ''.join(self.word_pieces) +
+                           '</' + name + '>')
+            else:
+                self.write(self.word_start +
+                           escape_cdata(''.join(self.word_chars)) +
+                           '</' + name + '>')
+            self.word_pieces = None
+            self.word_chars = None
+            return
+
+        self.write('</' + name + '>')
+
+        if depth == self.page_depth:
+            self.page_depth = None
+            # The whitespace after the page is part of the page
+            self.in_tail = True
+
+    def character_data(self, data):
+        if self.page_depth is None:
+            if self.in_tail:
+                self.write(escape_cdata(data))
+            return
+
+        if self.word_depth is not None:
+            if self.depth == self.char_depth and not self.char_text_done:
+                # Only the text before the first child of the ocrx_cinfo
+                # element, like its .text in ElementTree
+                self.word_chars.append(data)
+            elif self.word_pieces is not None:
+                self.word_pieces.append(escape_cdata(data))
+            return
+
+        self.write(escape_cdata(data))
+
+
+@stats.timed('fold_chars')
+def fold_chars(fd_or_path, out):
+    """
+    Convert a character-based hOCR document (with ocrx_cinfo elements) into a
+    word-based hOCR document, in a streaming manner.
+
+    Args:
+
+    * fd_or_path: hOCR file to operate on, or a path (str).
+    * out: binary file to write the resulting document to
+    """
+    register_and_nuke_xhtml_namespace()
+
+    fp = open_if_required(fd_or_path)
+    top, bottom = get_header_footer(fp)
+    out.write(top)
+
+    fp.seek(0)
+    p = xml.parsers.expat.ParserCreate()
+    h = CharFolder(p, out)
+
+    while True:
+        data = fp.read(TRANSFORM_READ_SIZE)
+        p.Parse(data, not data)
+        if not data:
+            break
+
+    h.flush()
+    out.write(bottom)
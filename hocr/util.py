@@ -1,7 +1,12 @@
 import gzip
 import io
+import mmap
+import os
 from xml.etree import ElementTree
 
+from . import stats
+
+
 #: Contains the HOCR schema
 HOCR_SCHEMA = '{http://www.w3.org/1999/xhtml}'
 
@@ -19,6 +24,49 @@ def iterparse_tags(fp, tag=None, events=None):
         yield act, elem
 
 
+def iterparse_detached(fp, tag=None, match=None):
+    """
+    Iterate over the (`end` events of the) elements in `fp` that have a tag in
+    `tag` and for which `match(elem)` is true, in a streaming manner.
+
+    Once the consumer requests the next element, the previous element is
+    cleared and removed from its parent, so that the tree built by the parser
+    does not keep growing with the amount of elements parsed. This means that
+    an element is only valid until the next element is requested.
+    """
+    doc = ElementTree.iterparse(fp, events=('start', 'end'))
+
+    root = None
+    parent = None
+
+    for act, elem in doc:
+        if act == 'start':
+            if root is None:
+                root = elem
+            continue
+
+        if tag is not None and elem.tag not in tag:
+            continue
+        if match is not None and not match(elem):
+            continue
+
+        yield elem
+
+        elem.clear()
+
+        # Typically all elements share the same parent (e.g. body), so only
+        # look for the parent if the element is not part of the previous one
+        if parent is None or elem not in parent:
+            parent = None
+            for candidate in root.iter():
+                if elem in candidate:
+                    parent = candidate
+                    break
+
+        if parent is not None:
+            parent.remove(elem)
+
+
 def elem_tostring(elem, xml_declaration=None, short_empty_elements=False):
     s = ElementTree.tostring(elem, method='xml',
                              encoding='UTF-8',
@@ -29,11 +77,22 @@ def elem_tostring(elem, xml_declaration=None, short_empty_elements=False):
 def open_if_required(fd_or_path):
     """
     Opens a file if `fd_or_path` is a `str`, otherwise returns `fd_or_path`.
-    If `fd_or_path` ends with `.gz`, uses `gzip.open`.
+    If `fd_or_path` ends with `.gz`, uses `gzip.open`, or
+    hocr.gzindex.open_indexed_gzip if there is a gzip index for the file.
     """
     if isinstance(fd_or_path, str):
         if fd_or_path.endswith('.gz'):
-            xml_file = gzip.open(fd_or_path, 'rb')
+            # Only needed for compressed files
+            from .gzindex import gzip_index_path, open_indexed_gzip
+
+            if os.path.exists(gzip_index_path(fd_or_path)):
+                xml_file = open_indexed_gzip(fd_or_path)
+            elif stats.enabled:
+                xml_file = stats.open_timed_gzip(fd_or_path)
+            else:
+                xml_file = gzip.open(fd_or_path, 'rb')
+        elif stats.enabled:
+            xml_file = stats.open_timed(fd_or_path)
         else:
             xml_file = open(fd_or_path, 'rb')
     else:
@@ -42,6 +101,153 @@ def open_if_required(fd_or_path):
     return xml_file
 
 
+def mmap_if_possible(fp):
+    """
+    Memory maps the file behind `fp` (read only), if it is a regular file.
+
+    Args:
+
+    * fp: Open file descriptor
+
+    Returns:
+
+    * mmap.mmap object, or None if `fp` is compressed, has no file descriptor
+      (e.g. io.BytesIO) or is empty
+    """
+    if isinstance(fp, gzip.GzipFile):
+        return None
+
+    try:
+        return mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def read_package_data(name):
+    """
+    Reads a data file that is installed with the hocr package.
+
+    Args:
+
+    * name: path of the file in the hocr package, e.g.
+      `data/abbyy-lang-map.csv`
+
+    Returns:
+
+    * The contents of the file (`bytes`)
+    """
+    # Imported here, as importlib.resources takes a while to import
+    try:
+        from importlib.resources import files
+    except ImportError:
+        # Python < 3.9
+        import pkgutil
+        return pkgutil.get_data('hocr', name)
+
+    path = files('hocr')
+    for part in name.split('/'):
+        path = path.joinpath(part)
+    return path.read_bytes()
+
+
+#: Amount of bytes copied at a time by copy_byte_range if it cannot use
+#: os.sendfile
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def copy_byte_range(src, dst, start, end):
+    """
+    Copies bytes `start` up to `end` of file `src` to file `dst`.
+
+    If both files have a file descriptor, and `src` is not compressed, the
+    data is copied with os.sendfile, without passing through Python (`dst` is
+    flushed first). Otherwise, `src` is read in chunks.
+
+    Args:
+
+    * src: Open file descriptor to copy from, must be seekable
+    * dst: Open file descriptor to write to
+    * start: offset of the first byte to copy
+    * end: offset after the last byte to copy
+    """
+    count = end - start
+
+    if hasattr(os, 'sendfile') and not isinstance(src, gzip.GzipFile):
+        try:
+            src_fd = src.fileno()
+            dst_fd = dst.fileno()
+        except (AttributeError, OSError, ValueError):
+            src_fd = dst_fd = None
+
+        if src_fd is not None:
+            dst.flush()
+            try:
+                while count > 0:
+                    sent = os.sendfile(dst_fd, src_fd, start, count)
+                    if not sent:
+                        break
+                    start += sent
+                    count -= sent
+            except OSError:
+                # Not supported for these files, copy the rest below
+                pass
+
+    if count > 0:
+        src.seek(start)
+    while count > 0:
+        data = src.read(min(count, COPY_CHUNK_SIZE))
+        if not data:
+            break
+        dst.write(data)
+        count -= len(data)
+
+
+#: Amount of tasks per worker process that process_map keeps in flight
+PROCESS_MAP_TASKS_PER_WORKER = 4
+
+
+def process_map(func, tasks, workers):
+    """
+    Calls `func` for every task in `workers` worker processes, like
+    map(func, *zip(*tasks)) would in this process. At most
+    PROCESS_MAP_TASKS_PER_WORKER tasks per worker are in flight at a time, so
+    that memory use does not depend on the amount of tasks.
+
+    `func` is pickled to send it to the workers, so it has to be defined in a
+    module (not in the script that is run, which hocr-batch runs as
+    `__main__`).
+
+    Args:
+
+    * func: function to call
+    * tasks: iterable of tuples of arguments for `func`
+    * workers: amount of worker processes
+
+    Returns:
+
+    * Iterator over the return values of `func`, in the order of `tasks`
+    """
+    # Imported here, since it takes a while to import
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        tasks = iter(tasks)
+
+        while True:
+            while len(pending) < workers * PROCESS_MAP_TASKS_PER_WORKER:
+                args = next(tasks, None)
+                if args is None:
+                    break
+                pending.append(executor.submit(func, *args))
+
+            if not pending:
+                break
+
+            yield pending.popleft().result()
+
+
 def get_ocr_system(fd):
     """
     Read the ocr-system meta tag from a new file descriptor containing a hOCR
@@ -0,0 +1,130 @@
+"""
+Lazy views on hOCR pages.
+
+hocr_page_to_word_data parses every paragraph, line and word of a page up
+front, even if the caller only looks at a single paragraph. HocrPageView parses
+the page on demand instead: paragraphs are only turned into word data when
+they are accessed, and every result is memoized.
+"""
+
+from collections.abc import Sequence
+
+from .parse import hocr_page_get_paragraphs, hocr_paragraph_to_word_data, \
+        hocr_paragraph_to_word_data_fast, hocr_paragraphs_cinfo_state, \
+        parse_page_title
+from .text import hocr_page_text_from_word_data, ParagraphTextIndex
+
+
+class LazyParagraphs(Sequence):
+    """
+    Sequence of paragraphs (word data) of a page, a paragraph is only parsed
+    when it is accessed for the first time.
+    """
+    def __init__(self, paragraph_elements, parse):
+        self._elements = paragraph_elements
+        self._parse = parse
+        self._paragraphs = [None] * len(paragraph_elements)
+
+    def __len__(self):
+        return len(self._elements)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        paragraph = self._paragraphs[idx]
+        if paragraph is None:
+            paragraph = self._parse(self._elements[idx])
+            self._paragraphs[idx] = paragraph
+
+        return paragraph
+
+
+class HocrPageView(object):
+    """
+    Lazy, memoized view on a hOCR page.
+
+    Args:
+
+    * hocr_page: a single hocr_page as returned by hocr_page_iterator
+    * (optional) fast: return word data in the format (and order) of
+      hocr_page_to_word_data_fast instead of hocr_page_to_word_data
+    * (optional) scaler: a scalar to scale font sizes by, ignored if `fast` is
+      set
+
+    Attributes (all computed when first accessed):
+
+    * `paragraphs`: sequence of paragraphs, `view.paragraphs[-1]` only parses
+      the last paragraph
+    * `lines`: list of all the lines on the page
+    * `words`: list of all the words on the page
+    * `text`: page text, as returned by hocr_page_text
+    * `text_index`: ParagraphTextIndex of the paragraphs
+    * `bbox`: bounding box of the page (tuple of 4 ints)
+
+    The page element must not be modified (or cleared) while the view is in
+    use.
+    """
+    def __init__(self, hocr_page, fast=False, scaler=1):
+        self.page = hocr_page
+        self.fast = fast
+        self.scaler = scaler
+
+        self._paragraphs = None
+        self._lines = None
+        self._words = None
+        self._text = None
+        self._text_index = None
+
+    @property
+    def paragraphs(self):
+        if self._paragraphs is None:
+            elements = hocr_page_get_paragraphs(self.page, fast=self.fast)
+
+            if self.fast:
+                cinfo_state = hocr_paragraphs_cinfo_state(elements)
+                parse = lambda par: hocr_paragraph_to_word_data_fast(par,
+                                                                     cinfo_state)
+            else:
+                parse = lambda par: hocr_paragraph_to_word_data(par,
+                                                                self.scaler)
+
+            self._paragraphs = LazyParagraphs(elements, parse)
+
+        return self._paragraphs
+
+    @property
+    def lines(self):
+        if self._lines is None:
+            self._lines = []
+            for paragraph in self.paragraphs:
+                self._lines += paragraph['lines']
+
+        return self._lines
+
+    @property
+    def words(self):
+        if self._words is None:
+            self._words = []
+            for line in self.lines:
+                self._words += line['words']
+
+        return self._words
+
+    @property
+    def text(self):
+        if self._text is None:
+            self._text = hocr_page_text_from_word_data(self.paragraphs)
+
+        return self._text
+
+    @property
+    def text_index(self):
+        if self._text_index is None:
+            self._text_index = ParagraphTextIndex(self.paragraphs)
+
+        return self._text_index
+
+    @property
+    def bbox(self):
+        return parse_page_title(self.page.attrib['title']).bbox
@@ -0,0 +1,278 @@
+"""
+Writing of hOCR documents.
+
+The tools that write hOCR documents write a header, a number of pages and a
+footer. The pages are serialised here straight to UTF-8 encoded bytes, without
+the XHTML namespace declaration that ElementTree would add to a page, so they
+do not have to be decoded, searched for the declaration and encoded again.
+"""
+
+from . import stats
+from .util import elem_tostring, copy_byte_range
+
+
+#: Amount of bytes that are collected before they are written to the output
+WRITER_BUFFER_SIZE = 1024 * 1024
+
+XHTML_NAMESPACE = 'http://www.w3.org/1999/xhtml'
+XML_NAMESPACE = 'http://www.w3.org/XML/1998/namespace'
+
+
+def escape_cdata(text):
+    """
+    Escape text for use in XML content, in the same way as ElementTree (and
+    xml.sax.saxutils.escape) does.
+    """
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text
+
+
+def escape_attrib(text):
+    """
+    Escape text for use in a (double quoted) XML attribute value, in the same
+    way as ElementTree does.
+    """
+    text = escape_cdata(text)
+    if '"' in text:
+        text = text.replace('"', '&quot;')
+    if '\r' in text:
+        text = text.replace('\r', '&#13;')
+    if '\n' in text:
+        text = text.replace('\n', '&#10;')
+    if '\t' in text:
+        text = text.replace('\t', '&#09;')
+    return text
+
+
+class _ForeignNamespaceError(ValueError):
+    pass
+
+
+def _local_name(name):
+    if not isinstance(name, str):
+        # Comments and processing instructions
+        raise _ForeignNamespaceError(name)
+
+    if name[:1] != '{':
+        return name
+
+    uri, local = name[1:].split('}', 1)
+    if uri == XHTML_NAMESPACE:
+        return local
+    if uri == XML_NAMESPACE:
+        return 'xml:' + local
+
+    # ElementTree would have to declare this namespace
+    raise _ForeignNamespaceError(name)
+
+
+def _serialize(elem, append, names, short_empty_elements):
+    tag = elem.tag
+    try:
+        name = names[tag]
+    except KeyError:
+        name = names[tag] = _local_name(tag)
+
+    start = '<' + name
+    for key, value in elem.attrib.items():
+        try:
+            key = names[key]
+        except KeyError:
+            key = names[key] = _local_name(key)
+        start += ' %s="%s"' % (key, escape_attrib(value))
+
+    text = elem.text
+    if text or len(elem) or not short_empty_elements:
+        append(start + '>')
+        if text:
+            append(escape_cdata(text))
+        for child in elem:
+            _serialize(child, append, names, short_empty_elements)
+        append('</' + name + '>')
+    else:
+        append(start + ' />')
+
+    if elem.tail:
+        append(escape_cdata(elem.tail))
+
+
+@stats.timed('hocr_page_to_bytes',
+             lambda data: {'pages': 1, 'bytes': len(data)})
+def hocr_page_to_bytes(page, short_empty_elements=False):
+    """
+    Serialise a hOCR page (or any other element) like elem_tostring would,
+    but without the XHTML namespace declaration.
+
+    Elements and attributes in the XHTML namespace are written without a
+    namespace prefix. Pages that contain elements from other namespaces (or
+    comments) are serialised by ElementTree instead.
+
+    Args:
+
+    * page: a single hOCR page as returned by hocr_page_iterator
+    * short_empty_elements: write empty elements as `<br />`
+
+    Returns:
+
+    * The page, including its tail (`bytes`, UTF-8 encoded)
+    """
+    pieces = []
+    try:
+        _serialize(page, pieces.append, {}, short_empty_elements)
+    except _ForeignNamespaceError:
+        s = elem_tostring(page,
+                          short_empty_elements=short_empty_elements)
+        s = s.decode('utf-8')
+        s = s.replace(' xmlns="%s"' % XHTML_NAMESPACE, '')
+        return s.encode('utf-8')
+
+    return ''.join(pieces).encode('utf-8')
+
+
+class HocrWriter(object):
+    """
+    Writes a hOCR document, consisting of a header, pages and a footer, to a
+    binary file. Everything is collected in a buffer of `buffer_size` bytes
+    before it is written to `out`, and the byte range of every page in the
+    output is recorded in `page_offsets`.
+
+    Every page is preceded by `indent`, except for the first page, which is
+    preceded by `first_indent` (if set).
+
+    Can be used as a context manager, which writes the header on entry and
+    the footer on exit::
+
+        with HocrWriter(sys.stdout.buffer, top, bottom) as writer:
+            for page in hocr_page_iterator(filename):
+                writer.write_page(page)
+    """
+    def __init__(self, out, header=b'', footer=b'', indent=b' ',
+                 first_indent=None, buffer_size=WRITER_BUFFER_SIZE):
+        self.out = out
+        self.header = header
+        self.footer = footer
+        self.indent = indent
+        self.first_indent = first_indent
+        self.buffer_size = buffer_size
+
+        self.buffer = bytearray()
+        #: Amount of bytes written so far
+        self.offset = 0
+        #: (start, end) of every page written, not including the indentation
+        self.page_offsets = []
+
+    def __enter__(self):
+        self.write_header()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.flush()
+
+    def write(self, data):
+        """
+        Write `data` (`bytes`) to the output.
+        """
+        self.buffer += data
+        self.offset += len(data)
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered data to the output.
+        """
+        if self.buffer:
+            if stats.enabled:
+                with stats.timer('write', bytes=len(self.buffer)):
+                    self.out.write(self.buffer)
+            else:
+                self.out.write(self.buffer)
+            self.buffer = bytearray()
+
+    def write_header(self):
+        self.write(self.header)
+
+    def write_footer(self):
+        self.write(self.footer)
+
+    def close(self):
+        """
+        Write the footer and flush the buffer. Does not close the output.
+        """
+        self.write_footer()
+        self.flush()
+
+    def _write_indent(self):
+        if self.first_indent is not None and not self.page_offsets:
+            self.write(self.first_indent)
+        else:
+            self.write(self.indent)
+
+    def write_page_bytes(self, data):
+        """
+        Write a serialised page.
+
+        Args:
+
+        * data: the page (`bytes`)
+
+        Returns:
+
+        * The amount of bytes of the page (`int`)
+        """
+        self._write_indent()
+        start = self.offset
+        self.write(data)
+        self.page_offsets.append((start, self.offset))
+        return self.offset - start
+
+    def write_page(self, page, short_empty_elements=False):
+        """
+        Serialise a page with hocr_page_to_bytes and write it.
+
+        Args:
+
+        * page: a single hOCR page as returned by hocr_page_iterator
+        * short_empty_elements: write empty elements as `<br />`
+
+        Returns:
+
+        * The amount of bytes of the page (`int`)
+        """
+        return self.write_page_bytes(
+                hocr_page_to_bytes(page, short_empty_elements))
+
+    def write_page_range(self, fd, start, end):
+        """
+        Copy a page byte for byte from file `fd`, see copy_byte_range.
+
+        Args:
+
+        * fd: file to copy the page from
+        * start: start of the page in `fd`
+        * end: end of the page in `fd`
+
+        Returns:
+
+        * The amount of bytes of the page (`int`)
+        """
+        self._write_indent()
+        self.flush()
+        if stats.enabled:
+            with stats.timer('write', bytes=end - start):
+                copy_byte_range(fd, self.out, start, end)
+        else:
+            copy_byte_range(fd, self.out, start, end)
+
+        page_start = self.offset
+        self.offset += end - start
+        self.page_offsets.append((page_start, self.offset))
+        return end - start
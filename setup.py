@@ -21,11 +21,13 @@ setup(name='archive-hocr-tools',
                'bin/hocr-text', 'bin/fts-text-annotate',
                'bin/fts-text-match', 'bin/hocr-lookup-check',
                'bin/hocr-lookup-create', 'bin/hocr-lookup-reconstruct',
+               'bin/hocr-lookup-convert',
                'bin/hocr-text-paragraphs', 'bin/hocr-extract-page',
                'bin/abbyy-to-hocr', 'bin/hocr-split-pages',
                'bin/hocr-flatten-pages', 'bin/hocr-confidence-filter',
                'bin/hocr-to-epub', 'bin/pdf-to-hocr',
-               'bin/hocr-pagenumbers', 'bin/hocr-to-daisy'],
+               'bin/hocr-pagenumbers', 'bin/hocr-to-daisy',
+               'bin/hocr-batch', 'bin/hocr-synth'],
       classifiers=[
           'Development Status :: 3 - Alpha',
           'Intended Audience :: Developers',
@@ -39,6 +41,8 @@ setup(name='archive-hocr-tools',
           'daisy': ['archive-ocr-tools==1.0.4', 'ebooklib==0.17.1'],
           'epub': ['ebooklib==0.17.1', 'internetarchive-deriver-module', 'archive-ocr-tools==1.0.4'],
           'pdf': ['PyMuPDF==1.22.5', 'numpy==1.21.3'],
+          'columnar': ['numpy>=1.21.3'],
+          'filter': ['numpy>=1.21.3'],
           'pagenumber': ['viterbi-trellis==0.0.3', 'roman>=3.3', 'numpy>=1.21.3', 'scikit-learn>=1.2.2'],
       },
       package_data={'hocr': ['data/*', 'daisy/*']})
@@ -0,0 +1,107 @@
+import pytest
+from subprocess import run, check_output, PIPE
+from os.path import dirname, join
+
+import gzip
+import json
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+@pytest.mark.parametrize('workers', [1, 2])
+def test_hocr_batch(sim_hocr_file, workers):
+    sim_hocr_file = str(sim_hocr_file)
+    basedir = dirname(sim_hocr_file)
+
+    jobs = [
+        {'id': 'text', 'tool': 'hocr-text', 'args': ['-f', sim_hocr_file],
+         'stdout': join(basedir, 'batch-%d.txt' % workers)},
+        {'id': 'lookup', 'tool': 'hocr-lookup-create',
+         'args': ['-f', sim_hocr_file],
+         'stdout': join(basedir, 'batch-%d.json' % workers)},
+        {'id': 'missing', 'tool': 'hocr-text',
+         'args': ['-f', join(basedir, 'does-not-exist.html')]},
+        {'id': 'usage', 'tool': 'hocr-extract-page',
+         'args': ['-f', sim_hocr_file]},
+        {'id': 'invalid', 'tool': '../hocr-text', 'args': []},
+    ]
+    manifest = ''.join(json.dumps(job) + '\n' for job in jobs)
+
+    p = run(['hocr-batch', '-j', str(workers)], input=manifest.encode('utf-8'),
+            stdout=PIPE, stderr=PIPE)
+    assert p.returncode == 1
+
+    reports = [json.loads(line) for line in p.stdout.splitlines()]
+    assert [report['id'] for report in reports] == \
+            ['text', 'lookup', 'missing', 'usage', 'invalid']
+    assert [report['status'] for report in reports] == \
+            ['ok', 'ok', 'error', 'error', 'error']
+    assert reports[3]['exit_code'] == 2
+    assert 'FileNotFoundError' in reports[2]['error']
+
+    for job in jobs[:2]:
+        with open(job['stdout'], 'rb') as fp:
+            assert fp.read() == check_output([job['tool']] + job['args'])
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+@pytest.mark.parametrize('workers', [1, 2])
+def test_hocr_batch_stats(sim_hocr_file, workers):
+    sim_hocr_file = str(sim_hocr_file)
+    basedir = dirname(sim_hocr_file)
+    report_files = [join(basedir, 'batch-stats-%d-%d.json' % (workers, idx))
+                    for idx in range(2)]
+
+    # Every job with --stats gets its own report, of just that job
+    jobs = [
+        {'tool': 'hocr-text', 'args': ['-f', sim_hocr_file, '--stats',
+                                       report_files[0]]},
+        {'tool': 'hocr-lookup-create', 'args': ['-f', sim_hocr_file]},
+        {'tool': 'hocr-text', 'args': ['-f', sim_hocr_file, '--stats',
+                                       report_files[1]]},
+    ]
+    manifest = ''.join(json.dumps(job) + '\n' for job in jobs)
+
+    p = run(['hocr-batch', '-j', str(workers)], input=manifest.encode('utf-8'),
+            stdout=PIPE, stderr=PIPE)
+    assert p.returncode == 0
+    assert p.stderr == b''
+
+    for job, report_file in zip(jobs[::2], report_files):
+        with open(report_file) as fp:
+            report = json.load(fp)
+        assert report['tool'] == 'hocr-text'
+        assert report['argv'] == job['args']
+        assert report['stages']['hocr_page_text_iterator']['pages'] == 30
+        assert 'hocr_get_page_lookup_table' not in report['stages']
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+@pytest.mark.parametrize('workers', [1, 2])
+def test_hocr_batch_parallel_tools(sim_hocr_file, workers):
+    # Tools that use worker processes of their own
+    pytest.importorskip('numpy')
+    basedir = dirname(str(sim_hocr_file))
+    hocr_file = join(basedir, 'batch-parallel-%d.html' % workers)
+    with gzip.open(str(sim_hocr_file), 'rb') as fp_in, \
+            open(hocr_file, 'wb') as fp_out:
+        fp_out.write(fp_in.read())
+
+    jobs = [
+        {'tool': 'hocr-combine-stream', 'args': ['-g', hocr_file, '-j', '2'],
+         'stdout': join(basedir, 'batch-combine-%d.html' % workers)},
+        {'tool': 'hocr-confidence-filter',
+         'args': ['-g', hocr_file, '-j', '2'],
+         'stdout': join(basedir, 'batch-filter-%d.html' % workers)},
+    ]
+    manifest = ''.join(json.dumps(job) + '\n' for job in jobs)
+
+    p = run(['hocr-batch', '-j', str(workers)], input=manifest.encode('utf-8'),
+            stdout=PIPE, stderr=PIPE)
+    assert p.returncode == 0, p.stderr
+
+    reports = [json.loads(line) for line in p.stdout.splitlines()]
+    assert [report['status'] for report in reports] == ['ok', 'ok']
+
+    for job in jobs:
+        with open(job['stdout'], 'rb') as fp:
+            assert fp.read() == check_output([job['tool']] + job['args'])
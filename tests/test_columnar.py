@@ -0,0 +1,30 @@
+import pytest
+
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data
+
+np = pytest.importorskip('numpy')
+from hocr.columnar import PageWords, hocr_page_to_page_words
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_page_words(sim_hocr_file):
+    for page in hocr_page_iterator(str(sim_hocr_file)):
+        word_data = hocr_page_to_word_data(page)
+        page_words = hocr_page_to_page_words(page)
+
+        words = []
+        for par_idx, par in enumerate(word_data):
+            for line in par['lines']:
+                for word in line['words']:
+                    words.append((par_idx, word))
+
+        assert len(page_words) == len(words)
+        assert page_words.paragraph_count == len(word_data)
+        for idx, (par_idx, word) in enumerate(words):
+            assert page_words.paragraph[idx] == par_idx
+            assert page_words.word(idx) == word
+
+        from_dicts = PageWords.from_word_data(word_data)
+        assert from_dicts.text_data == page_words.text_data
+        assert np.array_equal(from_dicts.bbox, page_words.bbox)
+        assert np.array_equal(from_dicts.line, page_words.line)
@@ -0,0 +1,97 @@
+import gzip
+
+import pytest
+
+from hocr.document import HocrDocument
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data_fast
+from hocr.searching import hocr_get_page_lookup_table, \
+        hocr_lookup_by_plaintext_offset
+from hocr.text import hocr_page_text
+from hocr.util import open_if_required
+
+
+@pytest.fixture(params=['gzip', 'plain'])
+def hocr_path(request, sim_hocr_file, tmp_path):
+    if request.param == 'gzip':
+        return str(sim_hocr_file)
+
+    # Uncompressed files are memory mapped
+    path = tmp_path / 'hocr.html'
+    with gzip.open(str(sim_hocr_file), 'rb') as fp:
+        path.write_bytes(fp.read())
+    return str(path)
+
+
+def test_hocr_document(hocr_path):
+    with HocrDocument(hocr_path) as doc:
+        count = 0
+        for idx, page in enumerate(hocr_page_iterator(hocr_path)):
+            assert doc.word_data(idx) == hocr_page_to_word_data_fast(page)
+            assert doc.page_text(idx) == hocr_page_text(page)
+            assert doc.page(idx).attrib == page.attrib
+            count += 1
+
+        assert len(doc) == count
+
+
+def test_hocr_document_cache(hocr_path):
+    with HocrDocument(hocr_path, cache_size=2) as doc:
+        doc.page(0)
+        doc.page_text(0)
+        doc.word_data(1)
+        doc.page(0)
+        doc.page(2)
+        doc.page(1)
+
+        assert doc.cache_info() == (2, 4, 2, 2)
+
+
+def test_hocr_document_close(hocr_path):
+    # Files opened by the document are closed with it, others are left open
+    with HocrDocument(hocr_path) as doc:
+        doc.page_text(0)
+    assert doc.fp.closed
+
+    with open_if_required(hocr_path) as fp:
+        with HocrDocument(fp) as doc:
+            doc.page_text(0)
+        assert not fp.closed
+
+    # Also when the caller still holds the page (a memoryview, if mapped)
+    with HocrDocument(hocr_path) as doc:
+        data = doc.page_bytes(0)
+    assert doc.fp.closed
+    assert bytes(data).startswith(b'<div')
+
+
+def test_hocr_document_page_for_text_offset(hocr_path):
+    lookup_table = hocr_get_page_lookup_table(hocr_path)
+    doc = HocrDocument(hocr_path, lookup_table)
+
+    for offset in range(0, lookup_table[-1][1] + 2, 97):
+        idx, _ = hocr_lookup_by_plaintext_offset(lookup_table, offset)
+        assert doc.page_for_text_offset(offset) == idx
+
+
+def test_hocr_document_text_index(hocr_path):
+    with HocrDocument(hocr_path) as doc:
+        for idx in range(len(doc)):
+            view = doc.page_view(idx)
+            text = view.text
+            text_index = view.text_index
+
+            # Every offset in the page text maps to the paragraph it is in
+            starts = [0]
+            for par_text in text.split('\n')[:-1]:
+                starts.append(starts[-1] + len(par_text) + 1)
+            for offset in range(len(text)):
+                par_idx = text_index.find(offset)
+                assert starts[par_idx] <= offset < starts[par_idx + 1]
+                assert text_index.text(par_idx) == \
+                        text[starts[par_idx]:starts[par_idx + 1] - 1]
+            assert text_index.find(len(text)) is None
+
+        leading_whitespace = ''.join(doc.page_text(idx)
+                                     for idx in range(len(doc)))
+        assert doc.leading_whitespace() == \
+                len(leading_whitespace) - len(leading_whitespace.lstrip())
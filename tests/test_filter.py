@@ -0,0 +1,122 @@
+import gzip
+
+import pytest
+
+from hocr.parse import hocr_page_iterator, hocr_page_get_scan_res, parse_title
+from hocr.util import elem_tostring, register_and_nuke_xhtml_namespace
+
+np = pytest.importorskip('numpy')
+from hocr.filter import hocr_page_filter_confidence, hocr_filter_pages
+
+
+SETTINGS = [
+    {},
+    {'avg_line_thres': 95, 'single_word_thres': 95},
+    {'avg_line_thres': 100, 'single_word_thres': 100,
+     'single_char_confidence': 95, 'char_conf_multiplier_thres': 90,
+     'average_char_conf_thres': 97, 'low_char_conf_perc_thres': 0.1},
+]
+
+
+def reference_filter(page, avg_line_thres=75, single_word_thres=75,
+                     single_char_confidence=90, average_char_conf_thres=95,
+                     char_conf_multiplier_thres=60,
+                     low_char_conf_perc_thres=0.2,
+                     filter_big_text_fontsize=None):
+    # The per word loop hocr-confidence-filter used to run
+    page_scaler = 1. if hocr_page_get_scan_res(page)[1] is not None else None
+
+    for block in page.findall("*[@class='ocr_carea']"):
+        paragraphs_removed = False
+        for par in block.findall("*[@class='ocr_par']"):
+            lines_removed = False
+            for line in list(par):
+                words_removed = 0
+                words = line.findall("*[@class='ocrx_word']")
+                word_attrs = [parse_title(word.attrib['title'])
+                              for word in words]
+                confs = []
+                one_word_big = False
+                for attrs in word_attrs:
+                    confs.append(attrs.x_wconf)
+                    if filter_big_text_fontsize and page_scaler:
+                        one_word_big = attrs.x_fsize * page_scaler > \
+                                filter_big_text_fontsize
+
+                if one_word_big or \
+                        (sum(confs) / len(confs) < avg_line_thres):
+                    for word, attrs in zip(words, word_attrs):
+                        wconf = attrs.x_wconf
+                        if not (one_word_big or wconf < single_word_thres):
+                            continue
+
+                        chars = []
+                        lower_than_thres_count = 0
+                        c = 100.
+                        big = bool(filter_big_text_fontsize and page_scaler
+                                   and attrs.x_fsize * page_scaler >
+                                   filter_big_text_fontsize)
+                        for char in word.findall('.//*[@class="ocrx_cinfo"]'):
+                            conf = parse_title(char.attrib['title']).x_confs[0]
+                            if conf < single_char_confidence:
+                                lower_than_thres_count += 1
+                            c = c * (conf / 100)
+                            chars.append(conf)
+
+                        perc = lower_than_thres_count / len(chars)
+                        avg_conf = sum(chars) / len(chars)
+                        if perc > low_char_conf_perc_thres \
+                                or avg_conf < average_char_conf_thres \
+                                or c < char_conf_multiplier_thres \
+                                or (big and wconf < 85) \
+                                or (big and len(chars) < 3):
+                            line.remove(word)
+                            words_removed += 1
+
+                if words_removed:
+                    curwords = line.findall("*[@class='ocrx_word']")
+                    if (len(words) >= 5 and
+                            words_removed / len(words) > 0.5) or \
+                            len(curwords) == 0:
+                        par.remove(line)
+                        lines_removed = True
+
+            if lines_removed and len(list(par)) == 0:
+                block.remove(par)
+                paragraphs_removed = True
+
+        if paragraphs_removed and \
+                len(block.findall("*[@class='ocr_par']")) == 0:
+            page.remove(block)
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+@pytest.mark.parametrize('settings', SETTINGS)
+def test_filter_confidence(sim_hocr_file, settings):
+    register_and_nuke_xhtml_namespace()
+
+    # Pages are only valid until the next page is requested, so filter two
+    # independent iterators side by side
+    pages = zip(hocr_page_iterator(str(sim_hocr_file)),
+                hocr_page_iterator(str(sim_hocr_file)))
+    removed = 0
+    for page, expected in pages:
+        removed += hocr_page_filter_confidence(page, **settings)
+        reference_filter(expected, **settings)
+        assert elem_tostring(page) == elem_tostring(expected)
+
+    assert removed
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_filter_pages_parallel(sim_hocr_file, tmp_path):
+    hocr_file = str(tmp_path / 'hocr.html')
+    with gzip.open(str(sim_hocr_file), 'rb') as fp:
+        with open(hocr_file, 'wb') as out:
+            out.write(fp.read())
+
+    serial = list(hocr_filter_pages([hocr_file, hocr_file], **SETTINGS[1]))
+    parallel = list(hocr_filter_pages([hocr_file, hocr_file], jobs=2,
+                                      **SETTINGS[1]))
+    assert len(serial) == 2 * len(list(hocr_page_iterator(hocr_file)))
+    assert serial == parallel
@@ -0,0 +1,56 @@
+import gzip
+import random
+import shutil
+from subprocess import check_output
+from os.path import exists
+
+import pytest
+
+from hocr.gzindex import build_gzip_index, gzip_index_path, \
+        open_indexed_gzip, IndexedGzipReader
+from hocr.util import open_if_required
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_indexed_gzip_random_access(sim_hocr_file):
+    sim_hocr_file = str(sim_hocr_file)
+    with gzip.open(sim_hocr_file, 'rb') as fp:
+        data = fp.read()
+
+    index = build_gzip_index(sim_hocr_file, span=32 * 1024)
+    assert len(index.checkpoints) > 1
+    assert index.uncompressed_size == len(data)
+
+    fp = open_indexed_gzip(sim_hocr_file, index)
+    assert fp.read() == data
+
+    rand = random.Random(0)
+    for _ in range(200):
+        start = rand.randrange(len(data))
+        size = rand.randrange(32 * 1024)
+        fp.seek(start)
+        assert fp.read(size) == data[start:start + size]
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_lookup_create_gzip_index(sim_hocr_file, tmp_path):
+    hocr_file = str(tmp_path / 'hocr.html.gz')
+    shutil.copyfile(str(sim_hocr_file), hocr_file)
+
+    lookup_table = check_output(['hocr-lookup-create', '-f', hocr_file])
+    table_file = str(tmp_path / 'table.json')
+    with open(table_file, 'wb') as f:
+        f.write(lookup_table)
+
+    extract_args = ['hocr-extract-page', '-f', hocr_file, '-p', '3',
+                    '-t', table_file]
+    expected_page = check_output(extract_args)
+
+    assert check_output(['hocr-lookup-create', '-f', hocr_file,
+                         '--gzip-index']) == lookup_table
+    assert exists(gzip_index_path(hocr_file))
+
+    fp = open_if_required(hocr_file)
+    assert isinstance(fp.raw, IndexedGzipReader)
+
+    assert check_output(extract_args) == expected_page
@@ -0,0 +1,112 @@
+import pytest
+from subprocess import check_output
+
+from hocr.highlight import Highlighter, METHODS, highlight_text
+
+
+def highlight_chunked(highlighter, text, chunk_size):
+    return ''.join(highlighter.highlight_chunks(
+        text[idx:idx + chunk_size] for idx in range(0, len(text),
+                                                    chunk_size)))
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_highlight(method):
+    text = 'The theatre of the other, there.\n'
+
+    assert highlight_text(text, ['the'], method=method) == \
+        '{{{The}}} {{{the}}}atre of {{{the}}} o{{{the}}}r, {{{the}}}re.\n'
+    assert highlight_text(text, ['the'], method=method,
+                          ignore_case=False) == \
+        'The {{{the}}}atre of {{{the}}} o{{{the}}}r, {{{the}}}re.\n'
+    assert highlight_text(text, ['the'], method=method,
+                          whole_words=True) == \
+        '{{{The}}} theatre of {{{the}}} other, there.\n'
+
+    # Leftmost-longest matches
+    assert highlight_text(text, ['the', 'theatre', 'atre of', 'there'],
+                          method=method) == \
+        '{{{The}}} {{{theatre}}} of {{{the}}} o{{{the}}}r, {{{there}}}.\n'
+    assert highlight_text(text, ['other', 'the other'], method=method,
+                          pre_tag='<b>', post_tag='</b>') == \
+        'The theatre of <b>the other</b>, there.\n'
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_highlight_case_folding(method):
+    # 'ß' folds to 'ss', matches do not end in the middle of it
+    text = 'STRASSE Straße strass'
+    assert highlight_text(text, ['strasse'], method=method) == \
+        '{{{STRASSE}}} {{{Straße}}} strass'
+    assert highlight_text(text, ['strass'], method=method) == \
+        '{{{STRASS}}}E {{{Straß}}}e {{{strass}}}'
+    assert highlight_text(text, ['stras'], method=method) == \
+        '{{{STRAS}}}SE Straße {{{stras}}}s'
+    assert highlight_text(text, ['ß', 'ss'], method=method) == \
+        'STRA{{{SS}}}E Stra{{{ß}}}e stra{{{ss}}}'
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_highlight_case_folding_whole_words(method):
+    # Word boundaries are those of the original text: 'İ' folds to 'i' and
+    # a combining dot above (not a word character), U+0345 (not a word
+    # character) folds to 'ι'
+    assert highlight_text('AİB', ['b'], method=method,
+                          whole_words=True) == 'AİB'
+    assert highlight_text('Aİ B', ['aİ', 'b'], method=method,
+                          whole_words=True) == '{{{Aİ}}} {{{B}}}'
+    assert highlight_text('a\u0345b', ['b'], method=method,
+                          whole_words=True) == 'a\u0345{{{b}}}'
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('whole_words', [False, True])
+def test_highlight_chunks(method, whole_words):
+    text = 'the theatre of the other, there, and them; ' * 50
+    patterns = ['the', 'theatre', 'other', 'them', 'f']
+    highlighter = Highlighter(patterns, method=method,
+                              whole_words=whole_words)
+
+    expected = highlighter.highlight(text)
+    assert expected.count('{{{') > 100
+    for chunk_size in (1, 2, 7, 64, len(text)):
+        assert highlight_chunked(highlighter, text, chunk_size) == expected
+
+
+def test_highlight_no_patterns():
+    with pytest.raises(ValueError):
+        Highlighter([''])
+    with pytest.raises(ValueError):
+        Highlighter(['the'], method='unknown')
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_fts_text_annotate(sim_hocr_file, tmpdir):
+    plaintext_file = str(tmpdir.join('plaintext.txt'))
+    pattern_file = str(tmpdir.join('patterns.txt'))
+
+    plaintext = check_output(['hocr-text', '-f', str(sim_hocr_file)])
+    with open(plaintext_file, 'wb') as fp:
+        fp.write(plaintext)
+    with open(pattern_file, 'w') as fp:
+        fp.write('English\nthe\n\n')
+
+    text = plaintext.decode('utf-8')
+    expected = highlight_text(text, ['English', 'the'])
+    assert expected.count('{{{') > 10
+
+    for method in METHODS:
+        assert check_output(['fts-text-annotate', '-f', plaintext_file,
+                             '-p', 'English', '-p', 'the', '--method',
+                             method]).decode('utf-8') == expected
+        assert check_output(['fts-text-annotate', '-f', plaintext_file,
+                             '--pattern-file', pattern_file,
+                             '--chunk-size', '100', '--method',
+                             method]).decode('utf-8') == expected
+
+    assert check_output(['fts-text-annotate', '-f', plaintext_file,
+                         '-p', 'the', '-w', '--case-sensitive',
+                         '--pre-tag', '<em>', '--post-tag', '</em>']
+                        ).decode('utf-8') == \
+        highlight_text(text, ['the'], whole_words=True, ignore_case=False,
+                       pre_tag='<em>', post_tag='</em>')
@@ -1,9 +1,14 @@
+import io
+
 import pytest
 from subprocess import check_output, check_call
 from os.path import dirname, join
 
 import json
 
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data
+from hocr.transform import fold_chars
+
 @pytest.mark.usefixtures('sim_hocr_file')
 
 def test_fold_chars(sim_hocr_file):
@@ -22,3 +27,30 @@ def test_fold_chars(sim_hocr_file):
 
     assert plaintext == new_plaintext
 
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_fold_chars_word_data(sim_hocr_file, tmp_path):
+    sim_hocr_file = str(sim_hocr_file)
+
+    folded = io.BytesIO()
+    fold_chars(sim_hocr_file, folded)
+    folded_file = str(tmp_path / 'folded.html')
+    with open(folded_file, 'wb') as f:
+        f.write(folded.getvalue())
+
+    # Folding a word-based document does not change the words
+    folded_again = io.BytesIO()
+    fold_chars(folded_file, folded_again)
+    folded_again_file = str(tmp_path / 'folded-again.html')
+    with open(folded_again_file, 'wb') as f:
+        f.write(folded_again.getvalue())
+
+    pages = zip(hocr_page_iterator(sim_hocr_file),
+                hocr_page_iterator(folded_file),
+                hocr_page_iterator(folded_again_file))
+    for page, folded_page, folded_again_page in pages:
+        assert not folded_page.findall(".//*[@class='ocrx_cinfo']")
+        word_data = hocr_page_to_word_data(page)
+        assert hocr_page_to_word_data(folded_page) == word_data
+        assert hocr_page_to_word_data(folded_again_page) == word_data
@@ -23,3 +23,39 @@ def test_hocr_pagenumbers(sim_hocr_file, sim_english_pagenumber_json_file):
     del new['archive-hocr-tools-version']
 
     assert old == new
+
+
+def load_hocr_pagenumbers():
+    from importlib.machinery import SourceFileLoader
+    from importlib.util import module_from_spec, spec_from_loader
+    from shutil import which
+
+    loader = SourceFileLoader('hocr_pagenumbers', which('hocr-pagenumbers'))
+    module = module_from_spec(spec_from_loader(loader.name, loader))
+    loader.exec_module(module)
+    return module
+
+
+def test_hocr_pagenumbers_content_box(tmpdir):
+    # The words after a page number on the same line are skipped, and are
+    # not part of the content box of the page
+    words = [('Hello', (100, 1000, 400, 1100)),
+             ('world', (500, 1000, 900, 1100)),
+             ('12', (1000, 1000, 1500, 1100)),
+             ('far', (1900, 1000, 1990, 1100))]
+    hocr_file = str(tmpdir.join('hocr.html'))
+    with open(hocr_file, 'w') as fp:
+        fp.write('<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+                 '<div class="ocr_page" title="bbox 0 0 2000 1200">'
+                 '<p class="ocr_par" title="bbox 100 1000 1990 1100">'
+                 '<span class="ocr_line" title="bbox 100 1000 1990 1100">')
+        for text, bbox in words:
+            fp.write('<span class="ocrx_word" title="bbox %d %d %d %d; '
+                     'x_wconf 90">%s</span>' % (bbox + (text,)))
+        fp.write('</span></p></div></body></html>')
+
+    pagenumbers = load_hocr_pagenumbers()
+    page_matches, _, page_info = pagenumbers.find_hocr_matches(hocr_file,
+                                                               None)
+    assert [match.value for match in page_matches[0]] == ['12']
+    assert page_info[0] == ([2000, 1200], [0, 0, 1500, 1100])
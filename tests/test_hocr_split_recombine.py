@@ -25,3 +25,70 @@ def test_split_combine_plaintext(sim_hocr_file):
 
     assert plaintext == new_plaintext
 
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_split_combine_raw(sim_hocr_file, tmp_path):
+    sim_hocr_file = str(sim_hocr_file)
+
+    split_pages = str(tmp_path / 'split-%06d.html')
+    split_pages_g = str(tmp_path / 'split-*.html')
+    raw_split_pages = str(tmp_path / 'raw-split-%06d.html')
+    raw_split_pages_g = str(tmp_path / 'raw-split-*.html')
+
+    check_call(['hocr-split-pages', '-f', sim_hocr_file, '-o', split_pages])
+    check_call(['hocr-split-pages', '-f', sim_hocr_file, '-o',
+                raw_split_pages, '--raw'])
+
+    # The pages are the same after they are parsed again
+    assert check_output(['hocr-combine-stream', '-g', split_pages_g]) == \
+            check_output(['hocr-combine-stream', '-g', raw_split_pages_g])
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_extract_flatten_raw(sim_hocr_file, tmp_path):
+    sim_hocr_file = str(sim_hocr_file)
+    plaintext = check_output(['hocr-text', '-f', sim_hocr_file])
+
+    flattened_file = str(tmp_path / 'flattened.html')
+    with open(flattened_file, 'wb') as f:
+        f.write(check_output(['hocr-flatten-pages', '-f', sim_hocr_file,
+                              '--raw']))
+    assert check_output(['hocr-text', '-f', flattened_file]) == plaintext
+
+    extracted = []
+    for raw in ([], ['--raw']):
+        extracted_file = str(tmp_path / ('extracted%s.html' % len(raw)))
+        with open(extracted_file, 'wb') as f:
+            f.write(check_output(['hocr-extract-page', '-f', sim_hocr_file,
+                                  '--pages', '0,2-4'] + raw))
+        extracted.append(check_output(['hocr-text', '-f', extracted_file]))
+
+    assert extracted[0] == extracted[1]
+
+    page_texts = []
+    for pageno in (0, 2, 3, 4):
+        page_file = str(tmp_path / ('page-%d.html' % pageno))
+        with open(page_file, 'wb') as f:
+            f.write(check_output(['hocr-extract-page', '-f', sim_hocr_file,
+                                  '-p', str(pageno)]))
+        page_texts.append(check_output(['hocr-text', '-f', page_file]))
+
+    assert extracted[0] == b''.join(page_texts)
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_combine_parallel(sim_hocr_file, tmp_path):
+    sim_hocr_file = str(sim_hocr_file)
+
+    split_pages = str(tmp_path / 'split-%06d.html')
+    check_call(['hocr-split-pages', '-f', sim_hocr_file, '-o', split_pages,
+                '--raw'])
+    # A file with more than one page shifts the page numbers of all the
+    # files after it
+    check_call(['cp', sim_hocr_file, str(tmp_path / 'split-000001b.html.gz')])
+
+    glob = str(tmp_path / 'split-*')
+    serial = check_output(['hocr-combine-stream', '-g', glob])
+    assert check_output(['hocr-combine-stream', '-g', glob, '-j', '3']) == \
+            serial
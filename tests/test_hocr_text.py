@@ -2,7 +2,16 @@ import pytest
 from subprocess import check_output, check_call
 from os.path import dirname, join
 
+import io
 import json
+import xml.parsers.expat
+
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data_fast, \
+        hocr_word_data_iterator
+from hocr.text import hocr_page_text_iterator, hocr_page_text, \
+        hocr_scan_page_bytes, hocr_get_xml_page_offsets, PageFinder, \
+        UnusualLayoutError
+from hocr.util import open_if_required
 
 @pytest.mark.usefixtures('sim_hocr_file')
 @pytest.mark.usefixtures('sim_hocr_file_text')
@@ -21,3 +30,64 @@ def test_hocr_text(sim_hocr_file, sim_hocr_file_text):
 
     assert prev_plaintext == plain_text
 
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_hocr_word_data_iterator(sim_hocr_file):
+    sim_hocr_file = str(sim_hocr_file)
+
+    tree_data = [hocr_page_to_word_data_fast(page) for page in
+                 hocr_page_iterator(sim_hocr_file)]
+    stream_data = list(hocr_word_data_iterator(sim_hocr_file))
+
+    assert tree_data == stream_data
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_hocr_page_text_iterator(sim_hocr_file):
+    sim_hocr_file = str(sim_hocr_file)
+
+    tree_text = [hocr_page_text(page) for page in
+                 hocr_page_iterator(sim_hocr_file)]
+    stream_text = list(hocr_page_text_iterator(sim_hocr_file))
+
+    assert tree_text == stream_text
+
+
+def expat_page_bytes(fd_or_path):
+    fp = open_if_required(fd_or_path)
+    p = xml.parsers.expat.ParserCreate()
+    h = PageFinder(p)
+    p.ParseFile(fp)
+    return h.page_bytes
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_hocr_scan_page_bytes(sim_hocr_file):
+    sim_hocr_file = str(sim_hocr_file)
+
+    assert list(hocr_scan_page_bytes(sim_hocr_file)) == \
+            expat_page_bytes(sim_hocr_file)
+
+
+COMMENTED_HOCR = b'''<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml">
+ <head><title></title></head>
+ <body>
+  <div class="ocr_page" title="bbox 0 0 100 100">
+  </div>
+  <!-- <div class="ocr_page" title="bbox 0 0 100 100"></div> -->
+  <div class='ocr_page' title="bbox 0 0 100 100"></div>
+ </body>
+</html>
+'''
+
+
+def test_hocr_scan_page_bytes_fallback():
+    with pytest.raises(UnusualLayoutError):
+        list(hocr_scan_page_bytes(io.BytesIO(COMMENTED_HOCR)))
+
+    page_bytes = expat_page_bytes(io.BytesIO(COMMENTED_HOCR))
+    assert len(page_bytes) == 3
+
+    offsets = hocr_get_xml_page_offsets(io.BytesIO(COMMENTED_HOCR))
+    assert offsets == list(zip(page_bytes[:-1], page_bytes[1:]))
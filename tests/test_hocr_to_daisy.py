@@ -1,4 +1,6 @@
 import pytest
+import zipfile
+from os.path import dirname, join
 
 from hocr.daisy.book import DaisyBook
 from hocr.daisy.util import roman_to_num
@@ -56,3 +58,18 @@ def test_add_pagetarget_handles_int_numstrs_and_roman_numerals(name, value) -> N
 def test_roman_to_num(input: str, expected: int) -> None:
     got = roman_to_num(input)
     assert got == expected
+
+
+def test_daisy_book_support_files(tmpdir) -> None:
+    # The style sheets etc. are written with the line endings of text mode
+    out_name = str(tmpdir.join("book.zip"))
+    book = DaisyBook(out_name=out_name, metadata=[{"tag": "blob"}])
+    book.z.close()
+
+    import hocr.daisy
+    daisy_files = join(dirname(hocr.daisy.__file__), "daisy_files")
+    with zipfile.ZipFile(out_name) as z:
+        for name in ["daisy.css", "daisyTransform.xsl", "dtbook-2005-3.dtd",
+                     "html.css", "resource.res"]:
+            with open(join(daisy_files, name), encoding="utf-8") as fp:
+                assert z.read(name).decode("utf-8") == fp.read()
@@ -0,0 +1,118 @@
+import io
+from subprocess import check_output, check_call
+
+import pytest
+
+from hocr.searching import hocr_get_page_lookup_table, \
+        hocr_load_lookup_table, hocr_lookup_by_plaintext_offset, \
+        hocr_save_lookup_table, LookupTable
+from hocr.text import hocr_get_plaintext_page_offsets, \
+        hocr_get_xml_page_offsets
+
+
+def linear_lookup(lookup_table, offset):
+    for idx, dat in enumerate(lookup_table):
+        if dat[0] <= offset < dat[1]:
+            return idx, dat
+
+    return None, None
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_lookup_table_convert(sim_hocr_file, tmp_path):
+    sim_hocr_file = str(sim_hocr_file)
+    json_file = str(tmp_path / 'table.json')
+    binary_file = str(tmp_path / 'table.bin')
+    json_roundtrip_file = str(tmp_path / 'table-roundtrip.json')
+
+    lookup_json = check_output(['hocr-lookup-create', '-f', sim_hocr_file])
+    with open(json_file, 'wb') as fp:
+        fp.write(lookup_json)
+
+    check_call(['hocr-lookup-convert', '-f', json_file, '-o', binary_file])
+    assert check_output(['hocr-lookup-create', '-f', sim_hocr_file,
+                         '--binary']) == open(binary_file, 'rb').read()
+
+    check_call(['hocr-lookup-convert', '-f', binary_file, '-o',
+                json_roundtrip_file, '--format', 'json'])
+    assert open(json_roundtrip_file, 'rb').read() == lookup_json
+
+    binary_table = hocr_load_lookup_table(binary_file)
+    assert isinstance(binary_table, LookupTable)
+    assert [list(dat) for dat in binary_table] == \
+            hocr_load_lookup_table(json_file)
+
+    hl_file = str(tmp_path / 'plaintext-hl.txt')
+    plaintext_file = str(tmp_path / 'plaintext.txt')
+    with open(plaintext_file, 'wb') as fp:
+        fp.write(check_output(['hocr-text', '-f', sim_hocr_file]))
+    with open(hl_file, 'wb') as fp:
+        fp.write(check_output(['fts-text-annotate', '-f', plaintext_file,
+                               '-p', 'English']))
+
+    matches = [check_output(['fts-text-match', '--hocr', sim_hocr_file,
+                             '--annotated-text', hl_file, '--table', table])
+               for table in (json_file, binary_file)]
+    assert matches[0] == matches[1]
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_hocr_lookup_by_plaintext_offset(sim_hocr_file):
+    lookup_table = hocr_get_page_lookup_table(str(sim_hocr_file))
+    binary_table = LookupTable.from_buffer(
+            LookupTable.from_entries(lookup_table).to_bytes())
+
+    for offset in range(-1, lookup_table[-1][1] + 2, 31):
+        expected = linear_lookup(lookup_table, offset)
+        assert hocr_lookup_by_plaintext_offset(lookup_table, offset) == expected
+        assert hocr_lookup_by_plaintext_offset(binary_table, offset) == expected
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+@pytest.mark.usefixtures('sim_hocr_lookup_file')
+def test_hocr_get_page_lookup_table(sim_hocr_file, sim_hocr_lookup_file):
+    sim_hocr_file = str(sim_hocr_file)
+    lookup_table = hocr_get_page_lookup_table(sim_hocr_file)
+
+    out = io.StringIO()
+    hocr_save_lookup_table(lookup_table, out)
+    with open(str(sim_hocr_lookup_file), 'rb') as fp:
+        assert out.getvalue().encode('utf-8') == fp.read()
+
+    # Same result as combining the separate text and XML offsets
+    text_ranges = hocr_get_plaintext_page_offsets(sim_hocr_file)
+    xml_ranges = hocr_get_xml_page_offsets(sim_hocr_file)
+    assert lookup_table == [text + xml for text, xml in
+                            zip(text_ranges, xml_ranges)]
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_paragraph_granularity(sim_hocr_file, tmp_path):
+    sim_hocr_file = str(sim_hocr_file)
+    page_table = hocr_get_page_lookup_table(sim_hocr_file)
+    par_table = hocr_get_page_lookup_table(sim_hocr_file,
+                                           granularity='paragraph')
+
+    assert [dat[:4] for dat in par_table] == page_table
+
+    tables = []
+    for granularity in ('page', 'paragraph'):
+        table_file = str(tmp_path / ('table-%s.json' % granularity))
+        with open(table_file, 'wb') as fp:
+            fp.write(check_output(['hocr-lookup-create', '-f', sim_hocr_file,
+                                   '--granularity', granularity]))
+        tables.append(table_file)
+
+    plaintext_file = str(tmp_path / 'plaintext.txt')
+    hl_file = str(tmp_path / 'plaintext-hl.txt')
+    with open(plaintext_file, 'wb') as fp:
+        fp.write(check_output(['hocr-text', '-f', sim_hocr_file]))
+    with open(hl_file, 'wb') as fp:
+        fp.write(check_output(['fts-text-annotate', '-f', plaintext_file,
+                               '-p', 'the']))
+
+    matches = [check_output(['fts-text-match', '--hocr', sim_hocr_file,
+                             '--annotated-text', hl_file, '--table', table])
+               for table in tables]
+    assert matches[0]
+    assert matches[0] == matches[1]
@@ -0,0 +1,95 @@
+import gc
+import io
+import tracemalloc
+
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data_fast
+
+
+HEADER = b'''<?xml version="1.0" encoding="UTF-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">
+ <head>
+  <title></title>
+ </head>
+ <body>
+'''
+
+PAGE = '''  <div class="ocr_page" id="page_{0}" title="bbox 0 0 2000 3000">
+   <div class="ocr_carea" title="bbox 100 100 1900 2900">
+    <p class="ocr_par" title="bbox 100 100 1900 200">
+     <span class="ocr_line" title="bbox 100 100 1900 200">
+      <span class="ocrx_word" title="bbox 100 100 300 200; x_wconf 90">Page</span>
+      <span class="ocrx_word" title="bbox 400 100 600 200; x_wconf 95">{0}</span>
+     </span>
+    </p>
+   </div>
+  </div>
+'''
+
+FOOTER = b''' </body>
+</html>
+'''
+
+
+class GeneratedHOCR(io.RawIOBase):
+    """
+    hOCR file with `pages` pages, generated as it is read so that the file
+    itself does not take up (traced) memory.
+    """
+    def __init__(self, pages):
+        self.pages = pages
+        self.chunks = self._chunks()
+        self.buf = b''
+
+    def _chunks(self):
+        yield HEADER
+        for i in range(self.pages):
+            yield PAGE.format(i).encode('utf-8')
+        yield FOOTER
+
+    def readable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return 0
+
+    def readinto(self, b):
+        while len(self.buf) < len(b):
+            chunk = next(self.chunks, None)
+            if chunk is None:
+                break
+            self.buf += chunk
+
+        n = min(len(b), len(self.buf))
+        b[:n] = self.buf[:n]
+        self.buf = self.buf[n:]
+        return n
+
+
+def peak_memory(pages):
+    fp = GeneratedHOCR(pages)
+
+    gc.collect()
+    tracemalloc.start()
+    count = 0
+    for page in hocr_page_iterator(fp):
+        hocr_page_to_word_data_fast(page)
+        count += 1
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert count == pages
+    return peak
+
+
+def test_hocr_page_iterator_memory():
+    # Fill module level caches (regular expressions, parsed titles) first, so
+    # that they are not counted as memory used by the iteration
+    peak_memory(1000)
+
+    small = peak_memory(100)
+    large = peak_memory(10000)
+
+    # Memory usage should not depend on the amount of pages. The 100 page
+    # document fits in fewer reads, which makes its peak a few hundred KiB
+    # lower, a retained page would cost at least 10000 * 1KiB.
+    assert large < small + 512 * 1024
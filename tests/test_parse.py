@@ -0,0 +1,35 @@
+import pytest
+
+from hocr.parse import parse_title, get_title_attrs
+
+
+@pytest.mark.parametrize(
+    ('title', 'expected'),
+    [
+        ('bbox 1 2 3 4; x_wconf 91',
+         {'bbox': (1, 2, 3, 4), 'x_wconf': 91.}),
+        # Whitespace variants
+        ('bbox 1 2 3 4;x_wconf  91 ;  baseline 0.01 -5',
+         {'bbox': (1, 2, 3, 4), 'x_wconf': 91., 'baseline': (0.01, -5.)}),
+        ('  x_fsize 12.5;', {'x_fsize': 12.5}),
+        # Character level properties, x_conf and x_confs are both accepted
+        ('x_bboxes 1 2 3 4 5 6 7 8; x_conf 99.5',
+         {'x_bboxes': (1, 2, 3, 4, 5, 6, 7, 8), 'x_confs': (99.5,)}),
+        ('x_bboxes 1 2 3 4; x_confs 90 80', {'x_bboxes': (1, 2, 3, 4),
+                                            'x_confs': (90., 80.)}),
+        # Quoted values may contain ';'
+        ('image "/tmp/a;b c.png"; bbox 0 0 10 20; ppageno 7; scan_res 300 400',
+         {'bbox': (0, 0, 10, 20), 'ppageno': 7, 'scan_res': (300, 400)}),
+    ],
+)
+def test_parse_title(title, expected):
+    attrs = parse_title(title)
+
+    for field in attrs._fields:
+        assert getattr(attrs, field) == expected.get(field)
+
+
+def test_get_title_attrs():
+    assert get_title_attrs('bbox 1 2 3 4; x_wconf 91') == ([1, 2, 3, 4], 91)
+    assert get_title_attrs('bbox 1 2 3 4;x_wconf 91') == ([1, 2, 3, 4], 91)
+    assert get_title_attrs('bbox 1 2 3 4') == ([1, 2, 3, 4], None)
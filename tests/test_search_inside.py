@@ -52,6 +52,57 @@ def test_search_inside(sim_hocr_file, sim_hocr_lookup_file, sim_hocr_searchtext_
     assert data == known_data
 
 
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_search_inside_batch(sim_hocr_file):
+    from hocr.fts import find_matches, find_matches_batch
+    from hocr.searching import hocr_load_lookup_table
+
+    sim_hocr_file = str(sim_hocr_file)
+    basedir = dirname(sim_hocr_file)
+
+    lookup_table_file = join(basedir, 'batch-table.json')
+    sim_plaintext_file = join(basedir, 'batch-plaintext.txt')
+
+    with open(lookup_table_file, 'wb+') as f:
+        f.write(check_output(['hocr-lookup-create', '-f', sim_hocr_file]))
+    with open(sim_plaintext_file, 'wb+') as f:
+        f.write(check_output(['hocr-text', '-f', sim_hocr_file]))
+
+    patterns = ['English', 'the', 'of', 'no-such-word']
+    hl_files = []
+    texts = []
+    for idx, pattern in enumerate(patterns):
+        plaintext_hl = check_output(['fts-text-annotate', '-f',
+                                     sim_plaintext_file, '-p', pattern])
+        hl_file = join(basedir, 'batch-plaintext-hl-%d.txt' % idx)
+        with open(hl_file, 'wb+') as f:
+            f.write(plaintext_hl)
+        hl_files.append(hl_file)
+        texts.append(plaintext_hl.decode('utf-8'))
+
+    lookup_table = hocr_load_lookup_table(lookup_table_file)
+    expected = [list(find_matches(lookup_table, sim_hocr_file, text))
+                for text in texts]
+    assert expected[0] == json.load(
+            open('test-files/hocr_search_sim_english_fts.json', 'r+'))
+    assert expected[-1] == []
+
+    assert find_matches_batch(lookup_table, sim_hocr_file, texts) == expected
+
+    args = ['fts-text-match', '--hocr', sim_hocr_file, '--table',
+            lookup_table_file]
+    out_files = []
+    for idx, hl_file in enumerate(hl_files):
+        out_file = join(basedir, 'batch-matches-%d.json' % idx)
+        args += ['--annotated-text', hl_file, '--output', out_file]
+        out_files.append(out_file)
+    check_call(args)
+
+    for out_file, results in zip(out_files, expected):
+        with open(out_file, 'r') as f:
+            assert [json.loads(line) for line in f] == results
+
+
 class TestMatchWords:
     def test_match_words_empty(self):
         from hocr.fts import match_words
@@ -119,3 +170,16 @@ class TestMatchWords:
             [{'text': 'Hello'}],
             [{'text': 'World'}],
         ]
+
+    def test_match_words_no_intersection(self):
+        from hocr.fts import match_words
+
+        # A match that does not intersect any word passes over all remaining
+        # words
+        hocr_words = [{'text': 'Hello'}, {'text': 'World'}, {'text': 'Bye'}]
+        assert match_words(hocr_words, [(0, 2), (20, 25), (12, 14)]) == [
+            [{'text': 'Hello'}],
+        ]
+        assert match_words(hocr_words, [(6, 7), (6, 7), (12, 14)]) == [
+            [{'text': 'World'}],
+        ]
@@ -0,0 +1,108 @@
+import random
+from xml.etree import ElementTree
+
+import pytest
+
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data_fast, \
+        hocr_page_to_photo_data
+from hocr.spatial import SpatialIndex, box_contains_box, box_intersects_box, \
+        word_data_in_box
+from hocr.text import hocr_page_text_from_word_data
+
+
+def random_boxes(rand, count, size=5000):
+    boxes = []
+    for _ in range(count):
+        x0 = rand.randrange(size)
+        y0 = rand.randrange(size)
+        boxes.append((x0, y0, x0 + rand.randrange(300),
+                      y0 + rand.randrange(80)))
+    return boxes
+
+
+def distance(box, x, y):
+    dx = max(box[0] - x, 0, x - box[2])
+    dy = max(box[1] - y, 0, y - box[3])
+    return (dx ** 2 + dy ** 2) ** 0.5
+
+
+def test_spatial_index_queries():
+    rand = random.Random(0)
+    boxes = random_boxes(rand, 2000)
+    index = SpatialIndex(boxes)
+
+    for _ in range(50):
+        query = random_boxes(rand, 1, 5500)[0]
+        assert index.words_in_box(query) == \
+                [idx for idx, box in enumerate(boxes)
+                 if box_contains_box(query, box)]
+        assert index.words_intersecting(query) == \
+                [idx for idx, box in enumerate(boxes)
+                 if box_intersects_box(query, box)]
+
+        # Also points outside of the indexed area
+        x, y = rand.randrange(-500, 6000), rand.randrange(-500, 6000)
+        expected = sorted(range(len(boxes)),
+                          key=lambda idx: (distance(boxes[idx], x, y), idx))
+        assert index.nearest_words(x, y, 5) == expected[:5]
+
+    assert index.nearest_words(0, 0, len(boxes) + 1) == \
+            sorted(range(len(boxes)),
+                   key=lambda idx: (distance(boxes[idx], 0, 0), idx))
+    assert SpatialIndex([]).nearest_words(0, 0) == []
+
+
+def test_spatial_index_contained_boxes():
+    boxes = [(0, 0, 100, 100), (10, 10, 20, 20), (10, 10, 20, 20),
+             (50, 50, 150, 150), (200, 200, 300, 300), (200, 200, 300, 300),
+             (90, 90, 100, 100)]
+    assert SpatialIndex(boxes).contained_boxes() == [1, 2, 6]
+
+
+def test_hocr_page_to_photo_data():
+    boxes = ['0 0 500 500', '10 10 200 200', '600 600 1000 1000',
+             '600 600 1000 1000', '0 0 50 50', '700 0 800 90']
+    page = ElementTree.fromstring(
+            '<div class="ocr_page" title="bbox 0 0 1000 1000">%s</div>' %
+            ''.join('<div class="ocr_photo" title="bbox %s"/>' % box
+                    for box in boxes))
+
+    assert hocr_page_to_photo_data(page) == \
+            [[0., 0., 500., 500.], [600., 600., 1000., 1000.],
+             [600., 600., 1000., 1000.]]
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_word_data_in_box(sim_hocr_file):
+    for page in hocr_page_iterator(str(sim_hocr_file)):
+        word_data = hocr_page_to_word_data_fast(page)
+        words = [word for par in word_data for line in par['lines']
+                 for word in line['words']]
+        if not words:
+            continue
+
+        index = SpatialIndex.from_word_data(word_data)
+        left = min(word['bbox'][0] for word in words)
+        right = max(word['bbox'][2] for word in words)
+        top = min(word['bbox'][1] for word in words)
+        bottom = max(word['bbox'][3] for word in words)
+        middle = (top + bottom) // 2
+
+        # Everything
+        assert word_data_in_box(word_data, (left, top, right, bottom),
+                                index=index) == \
+                [par for par in word_data if par['lines']]
+
+        # Top half of the page
+        box = (left, top, right, middle)
+        cropped = word_data_in_box(word_data, box, index=index)
+        assert [word for par in cropped for line in par['lines']
+                for word in line['words']] == \
+                [word for word in words if box_contains_box(box, word['bbox'])]
+
+        cropped = word_data_in_box(word_data, box, intersecting=True)
+        assert [word for par in cropped for line in par['lines']
+                for word in line['words']] == \
+                [word for word in words
+                 if box_intersects_box(box, word['bbox'])]
+        assert hocr_page_text_from_word_data(cropped)
@@ -0,0 +1,66 @@
+import pytest
+from subprocess import run, PIPE
+from os.path import dirname, join, realpath
+from shutil import which
+
+import re
+import sys
+
+
+#: Maximum time (in seconds) the imports of a tool may take, not counting the
+#: imports done by Python itself
+IMPORT_TIME_BUDGET = 0.1
+
+#: Modules that take a long time to import, which should only be imported
+#: when they are needed
+SLOW_MODULES = {'numpy', 'sklearn', 'viterbi_trellis', 'fitz',
+                'pkg_resources', 'urllib.request', 'multiprocessing',
+                'ctypes'}
+
+
+def get_scripts():
+    with open(join(dirname(dirname(realpath(__file__))), 'setup.py')) as fp:
+        return re.findall(r"'bin/([\w-]+)'", fp.read())
+
+
+def get_imports(args):
+    """
+    Returns the exit code of python -X importtime with `args`, and the
+    (name, depth, cumulative time) of the imports it reports.
+    """
+    p = run([sys.executable, '-X', 'importtime'] + args, stdout=PIPE,
+            stderr=PIPE, universal_newlines=True)
+
+    imports = []
+    for line in p.stderr.splitlines():
+        m = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)', line)
+        if m:
+            imports.append((m.group(3), len(m.group(2)) // 2,
+                            int(m.group(1)) / 1e6))
+
+    return p.returncode, p.stderr, imports
+
+
+@pytest.mark.parametrize('script', get_scripts())
+def test_startup(script):
+    path = which(script)
+    if path is None:
+        pytest.skip('%s is not installed' % script)
+
+    _, _, startup_imports = get_imports(['-c', 'pass'])
+    startup_modules = {name for name, _, _ in startup_imports}
+
+    returncode, stderr, imports = get_imports([path, '--help'])
+    if returncode and 'ModuleNotFoundError' in stderr:
+        pytest.skip('Optional dependencies of %s are not installed' % script)
+    assert returncode == 0
+
+    modules = {name for name, _, _ in imports} - startup_modules
+    slow = {slow_module for slow_module in SLOW_MODULES
+            for name in modules
+            if name == slow_module or name.startswith(slow_module + '.')}
+    assert not slow
+
+    import_time = sum(cumulative for name, depth, cumulative in imports
+                      if depth == 0 and name not in startup_modules)
+    assert import_time < IMPORT_TIME_BUDGET
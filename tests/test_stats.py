@@ -0,0 +1,62 @@
+import pytest
+from subprocess import run, check_output, PIPE
+from os.path import dirname, join
+
+import json
+import os
+
+from hocr import stats
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_stats(sim_hocr_file):
+    sim_hocr_file = str(sim_hocr_file)
+    basedir = dirname(sim_hocr_file)
+    report_file = join(basedir, 'stats.json')
+
+    text = check_output(['hocr-text', '-f', sim_hocr_file])
+    assert check_output(['hocr-text', '-f', sim_hocr_file, '--stats',
+                         report_file]) == text
+
+    with open(report_file) as fp:
+        report = json.load(fp)
+    assert report['tool'] == 'hocr-text'
+    assert report['stages']['hocr_page_text_iterator']['pages'] == 30
+    assert report['stages']['gzip']['bytes'] > 0
+
+    env = dict(os.environ, HOCR_STATS='-')
+    p = run(['hocr-lookup-create', '-f', sim_hocr_file], stdout=PIPE,
+            stderr=PIPE, env=env)
+    assert p.returncode == 0
+    report = json.loads(p.stderr.decode('utf-8').splitlines()[-1])
+    assert report['stages']['hocr_get_page_lookup_table']['pages'] == 30
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_stats_disabled_by_zero(sim_hocr_file, tmp_path):
+    env = dict(os.environ, HOCR_STATS='0')
+    p = run(['hocr-text', '-f', sim_hocr_file], stdout=PIPE, stderr=PIPE,
+            env=env, cwd=str(tmp_path))
+    assert p.returncode == 0
+    assert p.stdout
+    assert p.stderr == b''
+    assert not os.path.exists(os.path.join(str(tmp_path), '0'))
+
+
+def test_stats_library(sim_hocr_file):
+    stats.enable(os.devnull)
+    try:
+        words = 0
+        for page in hocr_page_iterator(str(sim_hocr_file)):
+            for par in hocr_page_to_word_data(page):
+                for line in par['lines']:
+                    words += len(line['words'])
+
+        report = stats.report()
+        assert report['stages']['hocr_page_iterator']['pages'] == 30
+        assert report['stages']['hocr_page_to_word_data']['words'] == words
+    finally:
+        stats.reset()
+
+    assert stats.report()['stages'] == {}
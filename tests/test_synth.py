@@ -0,0 +1,74 @@
+import pytest
+from subprocess import check_output, check_call
+
+import gzip
+
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data
+from hocr.synth import HocrSynthesizer, hocr_synth_pages
+
+
+def get_words(filename):
+    pages = []
+    for page in hocr_page_iterator(filename):
+        words = []
+        for par in hocr_page_to_word_data(page):
+            for line in par['lines']:
+                words.extend(word['text'] for word in line['words'])
+        pages.append(words)
+    return pages
+
+
+@pytest.mark.parametrize('chars', [True, False])
+def test_hocr_synth(tmpdir, chars):
+    synth = HocrSynthesizer(seed=3, words_per_page=50, chars=chars,
+                            photo_fraction=0.2, page_number_fraction=1)
+    filename = str(tmpdir.join('synth.html'))
+    with open(filename, 'wb') as fp:
+        synth.write(fp, 20)
+
+    pages = get_words(filename)
+    assert len(pages) == 20
+
+    page_number = 1
+    for page_idx, words in enumerate(pages):
+        if synth.is_plate(page_idx):
+            assert words == []
+        else:
+            assert len(words) == 51
+            assert words[-1] == str(page_number)
+            page_number += 1
+
+    assert list(hocr_synth_pages(20, seed=3, words_per_page=50, chars=chars,
+                                 photo_fraction=0.2,
+                                 page_number_fraction=1)) == \
+            list(synth.pages(20))
+    assert list(hocr_synth_pages(5, seed=4)) != list(hocr_synth_pages(5))
+
+
+def test_hocr_synth_cli(tmpdir):
+    filename = str(tmpdir.join('synth.html.gz'))
+    check_call(['hocr-synth', '-n', '10', '-s', '5', '-o', filename])
+    with gzip.open(filename, 'rb') as fp:
+        assert fp.read() == check_output(['hocr-synth', '-n', '10', '-s',
+                                          '5'])
+
+    word_level = check_output(['hocr-synth', '-n', '10', '-s', '5',
+                               '--word-level'])
+    assert b'ocrx_cinfo' not in word_level
+    with open(str(tmpdir.join('words.html')), 'wb') as fp:
+        fp.write(word_level)
+    assert get_words(str(tmpdir.join('words.html'))) == get_words(filename)
+
+
+def test_hocr_synth_cli_gzip_deterministic(tmpdir):
+    filename = str(tmpdir.join('synth.html.gz'))
+    outputs = []
+    for _ in range(2):
+        check_call(['hocr-synth', '-n', '3', '-s', '3', '-o', filename])
+        with open(filename, 'rb') as fp:
+            outputs.append(fp.read())
+        outputs.append(check_output(['hocr-synth', '-n', '3', '-s', '3',
+                                     '--gzip']))
+
+    assert outputs[0] == outputs[2]
+    assert outputs[1] == outputs[3]
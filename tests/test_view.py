@@ -0,0 +1,28 @@
+import pytest
+
+from hocr.parse import hocr_page_iterator, hocr_page_to_word_data, \
+        hocr_page_to_word_data_fast
+from hocr.text import hocr_page_text
+from hocr.view import HocrPageView
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_hocr_page_view(sim_hocr_file):
+    for page in hocr_page_iterator(str(sim_hocr_file)):
+        word_data = hocr_page_to_word_data(page)
+        word_data_fast = hocr_page_to_word_data_fast(page)
+
+        view = HocrPageView(page)
+        if len(word_data):
+            # Random access before anything else is parsed
+            assert view.paragraphs[-1] == word_data[-1]
+        assert list(view.paragraphs) == word_data
+        assert view.words == [word for par in word_data
+                              for line in par['lines']
+                              for word in line['words']]
+
+        view_fast = HocrPageView(page, fast=True)
+        if len(word_data_fast):
+            assert view_fast.paragraphs[-1] == word_data_fast[-1]
+        assert view_fast.paragraphs[:] == word_data_fast
+        assert view_fast.text == hocr_page_text(page)
@@ -0,0 +1,72 @@
+import io
+
+import pytest
+from xml.etree import ElementTree
+
+from hocr.parse import hocr_page_iterator
+from hocr.util import elem_tostring, get_header_footer, open_if_required, \
+        register_and_nuke_xhtml_namespace
+from hocr.writer import HocrWriter, hocr_page_to_bytes
+
+
+def triple_copy(page, short_empty_elements=False):
+    # How the tools used to serialise pages
+    s = elem_tostring(page, short_empty_elements=short_empty_elements)
+    s = s.decode('utf-8')
+    s = s.replace(' xmlns="http://www.w3.org/1999/xhtml"', '')
+    return s.encode('utf-8')
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_page_to_bytes(sim_hocr_file):
+    register_and_nuke_xhtml_namespace()
+
+    for page in hocr_page_iterator(str(sim_hocr_file)):
+        assert hocr_page_to_bytes(page) == triple_copy(page)
+        assert hocr_page_to_bytes(page, short_empty_elements=True) == \
+                triple_copy(page, short_empty_elements=True)
+
+
+def test_page_to_bytes_escaping():
+    register_and_nuke_xhtml_namespace()
+
+    xhtml = '{http://www.w3.org/1999/xhtml}'
+    page = ElementTree.Element(xhtml + 'div', attrib={
+        'class': 'ocr_page',
+        'title': 'a "b" <c> & d\te\nf',
+        '{http://www.w3.org/XML/1998/namespace}lang': 'en'})
+    page.text = '<&>"'
+    word = ElementTree.SubElement(page, xhtml + 'span')
+    word.tail = '\n & '
+    ElementTree.SubElement(page, 'br')
+    page.tail = '\n'
+
+    assert hocr_page_to_bytes(page) == triple_copy(page)
+    assert hocr_page_to_bytes(page, short_empty_elements=True) == \
+            triple_copy(page, short_empty_elements=True)
+
+    # Elements from other namespaces are left to ElementTree
+    ElementTree.SubElement(page, '{http://example.com/}foo')
+    assert hocr_page_to_bytes(page) == triple_copy(page)
+
+
+@pytest.mark.usefixtures('sim_hocr_file')
+def test_writer(sim_hocr_file):
+    register_and_nuke_xhtml_namespace()
+
+    top, bottom = get_header_footer(open_if_required(str(sim_hocr_file)))
+    out = io.BytesIO()
+    pages = []
+    with HocrWriter(out, top, bottom, first_indent=b'  ',
+                    buffer_size=1024) as writer:
+        for page in hocr_page_iterator(str(sim_hocr_file)):
+            s = triple_copy(page)
+            pages.append(s)
+            assert writer.write_page(page) == len(s)
+
+    data = out.getvalue()
+    assert data == top + b'  ' + b' '.join(pages) + bottom
+
+    assert len(writer.page_offsets) == len(pages)
+    for (start, end), s in zip(writer.page_offsets, pages):
+        assert data[start:end] == s